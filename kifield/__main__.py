@@ -7,23 +7,56 @@ from __future__ import absolute_import, division, print_function, unicode_litera
 import argparse
 import logging
 import os
-import shutil
 import sys
 
-from future import standard_library
-
-from .kifield import *
+from .memstats import format_report as format_memory_report
+from .memstats import memstats
+from .memstats import save_summary as save_memory_summary
 from .pckg_info import __version__
-
-standard_library.install_aliases()
-
+from .profiling import profiler
+from .progress import ProgressBar
+from .server import DEFAULT_SERVER_ADDRESS, send_request, serve
+from .stats import PHASES, format_report, save_summary, stats
+from .trace import save_trace, trace
 
 ###############################################################################
 # Command-line interface.
 ###############################################################################
 
 
+def serve_main(argv):
+    """Run a KiField server for the 'kifield serve' command."""
+
+    parser = argparse.ArgumentParser(
+        prog="kifield serve",
+        description=(
+            "Keep KiField and the files it parses loaded, and handle the requests "
+            "sent by 'kifield --server ADDRESS ...' commands."
+        ),
+    )
+    parser.add_argument(
+        "address",
+        nargs="?",
+        default=DEFAULT_SERVER_ADDRESS,
+        metavar="ADDRESS",
+        help=(
+            "Listen on a Unix socket path, a host:port, or a port on localhost. "
+            "(Default is {}, which only you can connect to.) There's no "
+            "authentication, so any user who can connect to a host:port or port "
+            "can read and write files as you.".format(DEFAULT_SERVER_ADDRESS)
+        ),
+    )
+    args = parser.parse_args(argv)
+
+    print("Serving KiField on {}. (Press Ctrl-C to stop.)".format(args.address))
+    serve(args.address)
+
+
 def main():
+    if sys.argv[1:2] == ["serve"]:
+        serve_main(sys.argv[2:])
+        return
+
     parser = argparse.ArgumentParser(
         description=(
             "Insert fields from spreadsheets into KiCad schematics or libraries, "
@@ -63,6 +96,7 @@ def main():
         help=(
             "Specify the names of the fields to extract and insert. "
             "Place a '/' or '~' in front of a field you wish to omit. "
+            "Names can be glob patterns like 'MPN*'. "
             "(Leave blank to extract/insert *all* fields.)"
         ),
     )
@@ -96,6 +130,110 @@ def main():
             "Disable hyphenated ranges when components are grouped, explicitly showing each component in a group."
         ),
     )
+    parser.add_argument(
+        "--jobs",
+        "-j",
+        type=int,
+        default=1,
+        metavar="N",
+        help="Process files using N worker processes. (Use 0 for one per CPU. Default is 1.)",
+    )
+    parser.add_argument(
+        "--manifest",
+        "-m",
+        type=str,
+        metavar="file",
+        help=(
+            "Record this run in a manifest file and use the record of the last run "
+            "to only update the parts that changed since then."
+        ),
+    )
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help=(
+            "Keep running and update the insertion files whenever the extraction "
+            "files change. Each file is only backed up the first time it's "
+            "changed. (Press Ctrl-C to stop.)"
+        ),
+    )
+    parser.add_argument(
+        "--server",
+        nargs="?",
+        const=DEFAULT_SERVER_ADDRESS,
+        type=str,
+        metavar="ADDRESS",
+        help=(
+            "Send the extraction and insertion to a server started with "
+            "'kifield serve [ADDRESS]' instead of doing them here. "
+            "(Default is {}.)".format(DEFAULT_SERVER_ADDRESS)
+        ),
+    )
+    parser.add_argument(
+        "--progress",
+        action="store_true",
+        help=(
+            "Show a progress bar on stderr with the files, sheets and parts done, "
+            "their rates and the estimated time left."
+        ),
+    )
+    parser.add_argument(
+        "--stats",
+        nargs="?",
+        const="",
+        metavar="file.json",
+        help=(
+            "Report the time spent in each phase of the run and for each file, "
+            "along with counts of the work done. "
+            "(Printed at the end unless a JSON file is given to store it in.)"
+        ),
+    )
+    parser.add_argument(
+        "--memstats",
+        nargs="?",
+        const="",
+        metavar="file.json",
+        help=(
+            "Report the peak and retained memory of each phase of the run and for "
+            "each file, along with the sites that held the most memory at the end "
+            "of the phase that left the most memory in use. "
+            "(Printed at the end unless a JSON file is given to store it in.)"
+        ),
+    )
+    parser.add_argument(
+        "--trace",
+        type=str,
+        metavar="file.json",
+        help=(
+            "Store a timeline of the run (including any worker processes) in the "
+            "Chrome trace-event format for viewing in Perfetto or chrome://tracing."
+        ),
+    )
+    parser.add_argument(
+        "--profile",
+        type=str,
+        metavar="file.prof",
+        help="Store a cProfile profile of the run for viewing with pstats or snakeviz.",
+    )
+    parser.add_argument(
+        "--profile-collapsed",
+        type=str,
+        metavar="file.txt",
+        help=(
+            "Sample the stack during the run and store the samples as collapsed "
+            "stacks for flamegraph.pl or speedscope."
+        ),
+    )
+    parser.add_argument(
+        "--profile-phases",
+        nargs="+",
+        choices=PHASES,
+        metavar="phase",
+        help=(
+            "Only profile these phases of the run: {}. "
+            "(Default is to profile the whole run.)".format(", ".join(PHASES))
+        ),
+    )
     parser.add_argument(
         "--debug",
         "-d",
@@ -130,12 +268,8 @@ def main():
     for file in args.insert:
         if os.path.isfile(file):
             if not args.overwrite and args.nobackup:
-                logger.critical(
-                    """File {} already exists! Use the --overwrite option to
-                    allow modifications to it or allow backups.""".format(
-                        file
-                    )
-                )
+                logger.critical("""File {} already exists! Use the --overwrite option to
+                    allow modifications to it or allow backups.""".format(file))
                 sys.exit(1)
 
     inc_fields = []
@@ -146,16 +280,113 @@ def main():
         else:
             inc_fields.append(f)
 
-    kifield(
-        extract_filenames=args.extract,
-        insert_filenames=args.insert,
-        inc_field_names=inc_fields,
-        exc_field_names=exc_fields,
-        group_components=args.group,
-        no_range=args.norange,
-        recurse=args.recurse,
-        backup=not args.nobackup,
-    )
+    def report_stats(summary):
+        if args.stats:
+            save_summary(args.stats, summary)
+        else:
+            print(format_report(summary))
+
+    def report_memstats(summary):
+        if args.memstats:
+            save_memory_summary(args.memstats, summary)
+        else:
+            print(format_memory_report(summary))
+
+    if args.server:
+        if args.profile or args.profile_collapsed:
+            logger.warning("Runs done by a server can't be profiled.")
+        if args.progress:
+            logger.warning("The progress of runs done by a server isn't shown.")
+        response = send_request(
+            args.server,
+            {
+                "command": "kifield",
+                "cwd": os.getcwd(),
+                "debug": args.debug,
+                "stats": args.stats is not None,
+                "memstats": args.memstats is not None,
+                "trace": bool(args.trace),
+                "args": dict(
+                    extract_filenames=args.extract,
+                    insert_filenames=args.insert,
+                    inc_field_names=inc_fields,
+                    exc_field_names=exc_fields,
+                    group_components=args.group,
+                    no_range=args.norange,
+                    recurse=args.recurse,
+                    backup=not args.nobackup,
+                    jobs=args.jobs,
+                    manifest_filename=args.manifest,
+                ),
+            },
+        )
+        sys.stdout.write(response["log"])
+        if response.get("stats"):
+            report_stats(response["stats"])
+        if response.get("memstats"):
+            report_memstats(response["memstats"])
+        if response.get("trace"):
+            save_trace(args.trace, response["trace"])
+        if response["error"]:
+            logger.critical(response["error"])
+            sys.exit(1)
+        return
+
+    # Import these only when the work is done here, so --version, --help and
+    # --server don't pay for loading the rest of KiField.
+    from .kifield import kifield, watch
+
+    if args.watch:
+        print(
+            "Watching {} for changes. (Press Ctrl-C to stop.)".format(
+                ", ".join(args.extract)
+            )
+        )
+        sync = watch
+    else:
+        sync = kifield
+    if args.stats is not None:
+        stats.enabled = True
+        stats.clear()
+    if args.trace:
+        trace.enabled = True
+        trace.clear()
+    profiler.deterministic = bool(args.profile)
+    profiler.sampling = bool(args.profile_collapsed)
+    profiler.phases = args.profile_phases
+    profiler.clear()
+    if args.memstats is not None:
+        memstats.enabled = True
+        memstats.clear()
+        memstats.start()
+    profiler.begin()
+    try:
+        sync(
+            extract_filenames=args.extract,
+            insert_filenames=args.insert,
+            inc_field_names=inc_fields,
+            exc_field_names=exc_fields,
+            group_components=args.group,
+            no_range=args.norange,
+            recurse=args.recurse,
+            backup=not args.nobackup,
+            jobs=args.jobs,
+            manifest_filename=args.manifest,
+            progress=ProgressBar() if args.progress else None,
+        )
+    finally:
+        profiler.end()
+        if args.memstats is not None:
+            memstats.stop()
+            report_memstats(memstats.summary())
+        if args.profile:
+            profiler.save_pstats(args.profile)
+        if args.profile_collapsed:
+            profiler.save_collapsed(args.profile_collapsed)
+        if args.stats is not None:
+            report_stats(stats.summary())
+        if args.trace:
+            trace.save(args.trace)
 
 
 ###############################################################################
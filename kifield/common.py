@@ -2,12 +2,24 @@
 
 # MIT License / Copyright (c) 2021 by Dave Vandenbout.
 
-from functools import reduce
+import importlib
+import itertools
+import locale
 import logging
+import multiprocessing
 import os
-import re
 import shutil
 import sys
+import traceback
+from pprint import pformat
+
+from .memstats import memstats
+from .prefetch import opened_files, read_file_stat
+from .profiling import profiler
+from .progress import run_progress
+from .refs import collapse, explode, quote, unquote
+from .stats import stats
+from .trace import trace
 
 USING_PYTHON2 = sys.version_info.major == 2
 USING_PYTHON3 = not USING_PYTHON2
@@ -19,11 +31,93 @@ else:
     # Python3 doesn't have basestring, so create one.
     basestring = type("")
 
+__all__ = [
+    "USING_PYTHON2",
+    "USING_PYTHON3",
+    "LazyModule",
+    "DEBUG_OVERVIEW",
+    "DEBUG_DETAILED",
+    "DEBUG_OBSESSIVE",
+    "DEBUG_SUMMARY_PARTS",
+    "DEBUG_SUMMARY_CHARS",
+    "summarize_part_fields",
+    "sexp_indent",
+    "find_by_key",
+    "get_value_by_key",
+    # Reference handling moved to refs.py but is still available from here.
+    "quote",
+    "unquote",
+    "explode",
+    "collapse",
+    "num_workers",
+    "run_jobs",
+    "backedup_files",
+    "create_backup",
+    "file_changes",
+    "record_file_change",
+    "write_file_if_changed",
+    "file_signatures",
+    "ParseCache",
+    "parse_cache",
+]
+if USING_PYTHON3:
+    __all__.append("basestring")  # Python 2 has its own.
+
+
+class LazyModule(object):
+    """
+    Stands in for a module that isn't imported until one of its attributes is used.
+
+    This keeps format backends like openpyxl and sexpdata from slowing down
+    the startup of runs that never process a file of that type.
+    """
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def __getattr__(self, attr):
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return getattr(self._module, attr)
+
 
 DEBUG_OVERVIEW = logging.DEBUG
 DEBUG_DETAILED = logging.DEBUG - 1
 DEBUG_OBSESSIVE = logging.DEBUG - 2
 
+# Limits on how much of a dictionary of part fields is shown in the debug log.
+DEBUG_SUMMARY_PARTS = 10
+DEBUG_SUMMARY_CHARS = 4000
+
+
+def summarize_part_fields(
+    part_fields_dict, max_parts=DEBUG_SUMMARY_PARTS, max_chars=DEBUG_SUMMARY_CHARS
+):
+    """Describe a dictionary of part fields for the debug log without dumping all of it.
+
+    Args:
+        part_fields_dict (dict): Dictionary of part fields keyed by part reference.
+        max_parts (int, optional): Most parts to show. Defaults to DEBUG_SUMMARY_PARTS.
+        max_chars (int, optional): Most characters to show. Defaults to DEBUG_SUMMARY_CHARS.
+
+    Returns:
+        string: Number of parts followed by the fields of the first few parts.
+    """
+
+    num_parts = len(part_fields_dict)
+    shown = {
+        ref: dict(fields)
+        for ref, fields in itertools.islice(part_fields_dict.items(), max_parts)
+    }
+    summary = "{} parts".format(num_parts)
+    if num_parts > len(shown):
+        summary += " (showing {})".format(len(shown))
+    summary += ":\n" + pformat(shown)
+    if len(summary) > max_chars:
+        summary = summary[:max_chars] + " ..."
+    return summary
+
 
 def sexp_indent(s, tab="    "):
     """Indent an S-expression string.
@@ -136,128 +230,171 @@ def get_value_by_key(key, array):
             return value
 
 
-def quote(s):
-    """
-    Returns a quoted version of string 's' if that's not already the case
-    """
-
-    if s is None:
-        return s
-
-    rx = r"^['\"](.*)['\"]$"
-
-    if re.match(rx, s) is not None:
-        return s
-    else:
-        return '"{}"'.format(s)
-
-
-def unquote(s):
-    """Remove any quote marks around a string.
+def num_workers(jobs, num_tasks):
+    """Return the number of worker processes to use for a number of tasks.
 
     Args:
-        s (string): Quoted or unquoted string.
+        jobs (int): Requested number of workers. 0 means one per CPU. None means 1.
+        num_tasks (int): Number of tasks to be done.
 
     Returns:
-        string: Unquoted string.
+        int: Number of workers (never more than the number of tasks).
     """
 
-    if not isinstance(s, basestring):
-        return s  # Not a string, so just return it.
-    try:
-        # This returns inner part of "..." or '...' strings.
-        return re.match("^(['\"])(.*)\\1$", s).group(2)
-    except (IndexError, AttributeError):
-        # No surrounding quotes, so just return string.
-        return s
+    if jobs is None or multiprocessing.current_process().daemon:
+        # Pool workers can't start pools of their own.
+        return 1
+    if jobs <= 0:
+        jobs = multiprocessing.cpu_count()
+    return max(1, min(jobs, num_tasks))
 
 
-def explode(collapsed):
-    """Explode collapsed references like 'C1-C3,C7,C10-C13' into [C1,C2,C3,C7,C10,C11,C12,C13].
+# Set in a worker process when the jobs it hasn't started yet aren't needed.
+_skip_jobs = None
 
-    Args:
-        collapsed (string): String of collapsed references.
 
-    Returns:
-        list: list of reference strings.
-    """
+def init_worker(skip_jobs):
+    """Initialize a worker process with the flag that tells it to skip the rest of its jobs."""
+    global _skip_jobs
+    _skip_jobs = skip_jobs
 
-    if collapsed == "":
-        return []
 
-    individual_refs = []
-    if isinstance(collapsed, basestring):
-        range_refs = re.split(",|;", collapsed)
-        for r in range_refs:
-            mtch = re.match(
-                r"^\s*(?P<part_prefix>\D+)(?P<range_start>\d+)\s*[-:]\s*\1(?P<range_end>\d+)\s*$",
-                r,
-            )
-            if mtch is None:
-                individual_refs.append(r.strip())
-            else:
-                part_prefix = mtch.group("part_prefix")
-                range_start = int(mtch.group("range_start"))
-                range_end = int(mtch.group("range_end"))
-                for i in range(range_start, range_end + 1):
-                    individual_refs.append(part_prefix + str(i))
+def call_job(job):
+    """Call a function in a worker process and return its result or the error it raised.
 
-    return individual_refs
+    Args:
+        job (tuple): Function, the tuple of arguments to call it with, whether
+            to record stats, whether to record a trace, the settings of the
+            profiler, whether to measure memory, and whether to count the
+            progress of the run.
 
+    Returns:
+        tuple: Result of the call (or None), the error traceback (or None),
+            the files opened for reading during the call, the stats
+            recorded during the call (or None if stats aren't enabled),
+            the trace events recorded during the call (or None if tracing
+            isn't enabled), the profile of the call (or None if profiling
+            isn't enabled), the memory stats of the call (or None if
+            memstats aren't enabled), and the sheets and bytes done during
+            the call (or None if progress isn't being reported). A job
+            that's skipped returns an error and nothing else.
+    """
 
-def collapse(individual_refs):
-    """Collapse references like [C1,C2,C3,C7,C10,C11,C12,C13] into 'C1-C3, C7, C10-C13'.
+    (
+        func,
+        args,
+        collect_stats,
+        collect_trace,
+        profiler_settings,
+        measure_memory,
+        count_progress,
+    ) = job
+    if _skip_jobs is not None and _skip_jobs.is_set():
+        return None, "Skipped", [], None, None, None, None, None
+    opened_files.clear()
+    stats.enabled = collect_stats
+    stats.clear()
+    trace.enabled = collect_trace
+    trace.clear()
+    profiler.configure(profiler_settings)
+    profiler.clear()
+    memstats.enabled = measure_memory
+    memstats.clear()
+    # The progress callback is only called by the main process.
+    if count_progress:
+        run_progress.collect()
+    else:
+        run_progress.detach()
+    if memstats.enabled:
+        memstats.start()
+    profiler.begin()
+    try:
+        result, error = func(*args), None
+    except Exception:
+        result, error = None, traceback.format_exc()
+    finally:
+        profiler.end()
+        if memstats.enabled:
+            memstats.stop()
+    job_stats = stats.snapshot() if stats.enabled else None
+    job_events = trace.snapshot() if trace.enabled else None
+    job_profile = profiler.snapshot() if profiler.enabled else None
+    job_memory = memstats.snapshot() if memstats.enabled else None
+    job_progress = run_progress.snapshot() if count_progress else None
+    return (
+        result,
+        error,
+        list(opened_files),
+        job_stats,
+        job_events,
+        job_profile,
+        job_memory,
+        job_progress,
+    )
+
+
+def run_jobs(func, arg_tuples, jobs=1):
+    """Call a function on each tuple of arguments, using a pool of worker processes if jobs > 1.
 
     Args:
-        individual_refs (string): Uncollapsed references.
-
-    Returns:
-        string: Collapsed references.
+        func (function): Module-level function to call.
+        arg_tuples (list): Tuple of arguments for each call.
+        jobs (int, optional): Number of worker processes. Defaults to 1.
+
+    Yields:
+        tuple: Result and error traceback for each call, in the same order as arg_tuples.
+            Errors are only caught when running in worker processes. The files
+            the workers opened for reading are added to opened_files, the
+            stats, trace events, profiles and memory stats they recorded are
+            merged into stats, trace, profiler and memstats, and the sheets
+            they finished are reported to run_progress. If the results
+            stop being used (like when the run is cancelled), the jobs that
+            haven't started are skipped.
     """
 
-    parts = []
-    for ref in individual_refs:
-        mtch = re.match(r"(?P<part_prefix>\D+)(?P<number>.+)", ref)
-        if mtch is not None:
-            part_prefix = mtch.group("part_prefix")
-            number = mtch.group("number")
-            try:
-                number = int(mtch.group("number"))
-            except ValueError:
-                pass
-            parts.append((part_prefix, number))
-
-    parts.sort()
-
-    def toRef(part):
-        return "{}{}".format(part[0], part[1])
-
-    def make_groups(accumulator, part):
-        prev = None
-        if len(accumulator) > 0:
-            group = accumulator[-1]
-            if len(group) > 0:
-                prev = group[-1]
-        if (prev != None) and (prev[0] == part[0]) and isinstance(prev[1], int) and ((prev[1] + 1) == part[1]):
-            group.append(part)
-            accumulator[-1] = group
-        else:
-            accumulator.append([part])
-        return accumulator
-
-    groups = reduce(make_groups, parts, [])
-    groups = map(lambda g: tuple(map(toRef, g)), groups)
-
-    collapsed = ""
-    for group in groups:
-        if (len(collapsed) > 1) and (collapsed[-2] != ","):
-            collapsed += ", "
-        if len(group) > 2:
-            collapsed += group[0] + "-" + group[-1]
-        else:
-            collapsed += ", ".join(group)
+    workers = num_workers(jobs, len(arg_tuples))
 
-    return collapsed
+    if workers <= 1:
+        for args in arg_tuples:
+            yield func(*args), None
+        return
+
+    skip_jobs = multiprocessing.Event()
+    pool = multiprocessing.Pool(workers, init_worker, (skip_jobs,))
+    try:
+        settings = (
+            stats.enabled,
+            trace.enabled,
+            profiler.settings(),
+            memstats.enabled,
+            run_progress.enabled,
+        )
+        for (
+            result,
+            error,
+            files,
+            job_stats,
+            job_events,
+            job_profile,
+            job_memory,
+            job_progress,
+        ) in pool.imap(call_job, [(func, args) + settings for args in arg_tuples]):
+            opened_files.update(files)
+            if job_stats is not None:
+                stats.merge(job_stats)
+            if job_events is not None:
+                trace.merge(job_events)
+            if job_profile is not None:
+                profiler.merge(job_profile)
+            if job_memory is not None:
+                memstats.merge(job_memory)
+            if job_progress is not None:
+                run_progress.merge(job_progress)
+            yield result, error
+    finally:
+        skip_jobs.set()
+        pool.close()
+        pool.join()
 
 
 # Stores list of file names that have been backed-up before modification.
@@ -277,13 +414,156 @@ def create_backup(file):
     if not os.path.isfile(file):
         return
 
-    index = 1  # Start with this backup file suffix.
-    while True:
-        backup_file = "{}.{}.bak".format(file, index)
-        if not os.path.isfile(backup_file):
-            # Found an unused backup file name, so make backup.
-            shutil.copy(file, backup_file)
-            break  # Backup done, so break out of loop.
-        index += 1  # Else keep looking for an unused backup file name.
+    with stats.phase("backup", file):
+        index = 1  # Start with this backup file suffix.
+        while True:
+            backup_file = "{}.{}.bak".format(file, index)
+            if not os.path.isfile(backup_file):
+                # Found an unused backup file name, so make backup.
+                shutil.copy(file, backup_file)
+                break  # Backup done, so break out of loop.
+            index += 1  # Else keep looking for an unused backup file name.
 
     backedup_files.append(file)
+    stats.count("files backed up")
+
+
+# Stores whether each file was written (True) or left untouched because its
+# contents didn't change (False).
+file_changes = {}
+
+
+def record_file_change(file, written):
+    """Record whether a file was written or left untouched.
+
+    A file that was written at any point stays recorded as written.
+
+    Args:
+        file (string): Path to file.
+        written (bool): True if the file was written.
+    """
+
+    file_changes[file] = file_changes.get(file, False) or written
+
+
+def write_file_if_changed(file, contents, backup=False, mode="w"):
+    """Back up and write a file unless it already holds exactly the same contents.
+
+    An unchanged file isn't backed-up or rewritten, so it keeps its
+    modification time. Text is compared as the bytes writing it would
+    produce, so a file that only differs in its line endings is rewritten.
+
+    Args:
+        file (string): Path to file.
+        contents (string): Contents of the file (bytes if mode is "wb").
+        backup (bool, optional): Back up the file before changing it. Defaults to False.
+        mode (string, optional): "w" for text or "wb" for bytes. Defaults to "w".
+
+    Returns:
+        bool: True if the file was written, False if it was left untouched.
+    """
+
+    if "b" not in mode:
+        # Make the bytes a text mode write would.
+        contents = contents.replace("\n", os.linesep)
+        if not isinstance(contents, bytes):
+            contents = contents.encode(locale.getpreferredencoding(False))
+
+    with stats.phase("write", file):
+        try:
+            with open(file, "rb") as fp:
+                written = fp.read() != contents
+        except IOError:
+            written = True  # Missing or unreadable, so just write it.
+
+        if written:
+            if backup:
+                create_backup(file)
+            with open(file, "wb") as fp:
+                fp.write(contents)
+
+    if written:
+        stats.count("files written")
+        stats.count("bytes written", os.path.getsize(file))
+    else:
+        stats.count("files unchanged")
+    record_file_change(file, written)
+    return written
+
+
+def file_signatures(files):
+    """Return the size and modification time of each file (or None if it's missing).
+
+    Args:
+        files (list): Paths to files.
+
+    Returns:
+        list: (file, (size, mtime)) for each file.
+    """
+
+    signatures = []
+    for file in files:
+        try:
+            signatures.append((file, read_file_stat(file)))
+        except (IOError, OSError):
+            signatures.append((file, None))
+    return signatures
+
+
+class ParseCache(object):
+    """
+    Parsed files kept in memory between runs (by watch mode and the server)
+    and reused until any of the files they came from are changed.
+
+    The keys are (kind, filename) and the files are looked up by their real
+    paths, since the server changes to each client's directory. A parsed
+    object is only reused if the names of its files still lead to the same
+    files from the current directory.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.entries = {}  # Signatures of the files, their names and the parsed object.
+
+    @staticmethod
+    def _key(key):
+        kind, filename = key
+        return kind, os.path.realpath(filename)
+
+    def take(self, key):
+        """Remove and return a parsed object, or None if it isn't cached or its files have changed.
+
+        The caller owns the object until it's stored again, so a failed update
+        never leaves a half-modified object in the cache.
+        """
+
+        try:
+            signatures, files, parsed = self.entries.pop(self._key(key))
+        except KeyError:
+            return None
+        real_files = [file for file, _ in signatures]
+        if [os.path.realpath(file) for file in files] != real_files:
+            return None  # The names lead somewhere else from this directory.
+        if file_signatures(real_files) != signatures:
+            return None
+        opened_files.update(files)  # Record the files as if they had been read.
+        return parsed
+
+    def store(self, key, parsed, files):
+        """Keep a parsed object that matches the current contents of its files (if caching is enabled)."""
+        if self.enabled:
+            real_files = [os.path.realpath(file) for file in files]
+            self.entries[self._key(key)] = (file_signatures(real_files), files, parsed)
+
+    def holds(self, filename):
+        """Return True if there's a parsed object for a file (which may have changed since)."""
+        real_file = os.path.realpath(filename)
+        return any(key[1] == real_file for key in self.entries)
+
+    def clear(self):
+        """Remove all the parsed objects."""
+        self.entries.clear()
+
+
+# Parsed files that watch mode keeps between runs.
+parse_cache = ParseCache()
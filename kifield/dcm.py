@@ -6,6 +6,10 @@
 import re
 import sys
 
+from .common import write_file_if_changed
+from .prefetch import open_input
+from .trace import traced
+
 
 class Component(object):
     def __init__(self):
@@ -69,7 +73,7 @@ class Dcm(object):
         if filename is None:
             return
 
-        with open(filename) as file:
+        with open_input(filename) as file:
             self.header = file.readline()
 
             if not self.header.startswith("EESchema-DOCLIB"):
@@ -86,7 +90,9 @@ class Dcm(object):
                 else:
                     break
 
-    def save(self, filename=None):
+    @traced("Dcm.save", file_arg=1)
+    def save(self, filename=None, backup=False):
+        """Save the descriptions in a file (unless it's unchanged) and return True if it was written."""
 
         if not filename:
             filename = self.filename
@@ -98,5 +104,4 @@ class Dcm(object):
         for c in self.components:
             to_write.extend(c.str())
 
-        with open(filename, "w") as file:
-            file.writelines(to_write)
+        return write_file_if_changed(filename, "".join(to_write), backup)
@@ -4,29 +4,53 @@
 
 from __future__ import absolute_import, division, print_function, unicode_literals
 
+import collections
 import csv
+import io
+import itertools
+import logging
 import operator
 import os
 import os.path
 import re
+import time
 from builtins import bytes, dict, int, map, open, range, str
 from copy import deepcopy
 from difflib import get_close_matches
-from pprint import pprint
-
-import openpyxl as pyxl
-from future import standard_library
+from fnmatch import fnmatchcase
 
 from .common import *
 from .dcm import Component, Dcm
-from .sch import sch_field_id_to_name, Schematic, Schematic_V6
+from .manifest import (
+    changed_parts,
+    file_hashes,
+    files_unchanged,
+    load_manifest,
+    part_hashes,
+    save_manifest,
+)
+from .parttable import PartTable
+from .prefetch import Prefetcher, open_input, opened_files
+from .progress import RunCancelled, run_progress
+from .refs import collapse, iter_refs, join_refs, quote, unquote
+from .sch import Schematic, Schematic_V6, sch_field_id_to_name
 from .schlib import SchLib, SchLib_V6
+from .stats import stats
+from .trace import trace, traced
+
+if USING_PYTHON2:
+    from future import standard_library
+
+    standard_library.install_aliases()
 
-standard_library.install_aliases()
+pyxl = LazyModule("openpyxl")
 
 
 logger = logging.getLogger("kifield")
 
+# Seconds between checks for changed files in watch mode.
+WATCH_INTERVAL = 0.25
+
 # Assign some names to the unnamed fields in a schematic or library component.
 lib_field_id_to_name = {"0": "prefix", "1": "value", "2": "footprint", "3": "datasheet"}
 lib_field_name_to_id = {v: k for k, v in lib_field_id_to_name.items()}
@@ -44,7 +68,7 @@ def csvfile_to_wb(csv_filename):
         "Converting CSV file {} into an XLSX workbook.".format(csv_filename),
     )
 
-    with open(csv_filename) as csv_file:
+    with open_input(csv_filename) as csv_file:
         dialect = csv.Sniffer().sniff(csv_file.read())
         if USING_PYTHON2:
             for attr in dir(dialect):
@@ -62,8 +86,9 @@ def csvfile_to_wb(csv_filename):
     return (wb, dialect)
 
 
-def wb_to_csvfile(wb, csv_filename, dialect):
-    """Save an openpyxl workbook as a CSV file."""
+@traced("save", file_arg=1)
+def wb_to_csvfile(wb, csv_filename, dialect, backup=False):
+    """Save an openpyxl workbook as a CSV file (unless it's unchanged) and return True if it was written."""
 
     logger.log(
         DEBUG_DETAILED,
@@ -73,10 +98,23 @@ def wb_to_csvfile(wb, csv_filename, dialect):
     mode = "w"
     if USING_PYTHON2:
         mode += "b"
-    with open(csv_filename, mode) as csv_file:
-        writer = csv.writer(csv_file, dialect=dialect, lineterminator="\n")
-        for row in ws.rows:
-            writer.writerow([cell.value for cell in row])
+        csv_file = io.BytesIO()
+    else:
+        csv_file = io.StringIO()
+    writer = csv.writer(csv_file, dialect=dialect, lineterminator="\n")
+    for row in ws.rows:
+        writer.writerow([cell.value for cell in row])
+    return write_file_if_changed(csv_filename, csv_file.getvalue(), backup, mode)
+
+
+def wb_values(wb):
+    """Return the title and cell values of each worksheet in an openpyxl workbook."""
+
+    # Empty cells are stored the same whether they hold None or "".
+    return [
+        (ws.title, [tuple(None if v == "" else v for v in row) for row in ws.values])
+        for ws in wb.worksheets
+    ]
 
 
 def group_wb(wb, no_range=False):
@@ -93,64 +131,121 @@ def group_wb(wb, no_range=False):
         # No header, so don't even try to ungroup the workbook.
         return wb
 
-    unique_rows = []
-    references = []
-    for row in values[1:]:
-        column_values = row[1:]
-        reference = row[0]
-        if column_values in unique_rows:
-            index = unique_rows.index(column_values)
-            references[index].append(reference)
-        else:
-            unique_rows.append(column_values)
-            references.append([reference])
-
-    grouped_rows = []
-    for i, ref in enumerate(references):
-        # If no_range flag, do the collapse to ensure sorting, then explode, then join to string
-        if no_range:
-            collapsed_refs = collapse(ref)
-            exploded_refs = explode(collapsed_refs)
-            joined_refs = (', ').join(exploded_refs)
-            grouped_rows.append((joined_refs,) + unique_rows[i])
-        else:
-            grouped_rows.append((collapse(ref),) + unique_rows[i])
+    # Gather the references for each unique set of column values in a single pass.
+    # The dict is keyed on the column values so each lookup is a hash, and the
+    # groups stay in the order they were first seen. The references are read the
+    # same way as when indexing them, so rows without one are left out.
+    references = {}
+    for row, ref in iter_ws_refs(ws):
+        references.setdefault(values[row - 1][1:], []).append(ref)
+
+    # If no_range flag, just sort and join the references instead of collapsing them.
+    join = join_refs if no_range else collapse
 
     grouped_wb = pyxl.Workbook()
     grouped_ws = grouped_wb.active
     grouped_ws.append(header)
 
-    for row in grouped_rows:
-        grouped_ws.append(row)
+    for column_values, refs in references.items():
+        grouped_ws.append((join(refs),) + column_values)
 
     return grouped_wb
 
 
-def ungroup_wb(wb):
-    """Ungroup lines that have collapsed references."""
-    # return wb
+def ungrouped_rows(ws, ref_col=1, min_row=2):
+    """Iterate over worksheet rows, expanding any grouped references on the fly.
 
-    ws = wb.active
-    values = tuple(ws.values)
+    A row value tuple is generated for each individual reference in the reference
+    column. Rows without a reference are skipped.
+    """
+
+    for row in ws.iter_rows(min_row=min_row, values_only=True):
+        for ref in iter_refs(row[ref_col - 1]):
+            yield row[: ref_col - 1] + (ref,) + row[ref_col:]
 
-    try:
-        header = values[0]
-    except IndexError:
-        # No header, so don't even try to ungroup the workbook.
-        return wb
 
-    ungrouped_wb = pyxl.Workbook()
-    ungrouped_ws = ungrouped_wb.active
-    ungrouped_ws.append(header)
+def iter_ws_refs(ws, ref_col=1, min_row=2):
+    """Iterate over the worksheet rows, generating (row number, part reference) pairs.
 
-    for row in values[1:]:
-        column_values = row[1:]
-        reference = row[0]
-        for ref in explode(reference):
-            ungrouped_row = ((ref,) + column_values)
-            ungrouped_ws.append(ungrouped_row)
+    The part references in each row of the reference column are exploded, so a
+    pair is generated for each individual reference in the order they appear.
+    """
+
+    ref_cells = ws.iter_rows(
+        min_row=min_row, min_col=ref_col, max_col=ref_col, values_only=True
+    )
+    for row, (refs,) in enumerate(ref_cells, min_row):
+        for ref in iter_refs(refs):
+            yield row, ref
+
+
+def index_ws_refs(ws, ref_col=1, min_row=2):
+    """Return a dict of the worksheet rows where each individual part reference is found.
+
+    The part references in each row of the reference column are exploded and the
+    row number is recorded under each of them, all in a single pass over the column.
+    The dict is ordered by the row where each reference first appears, and the
+    rows of each reference are in sheet order.
+    """
+
+    ref_rows = {}
+    for row, ref in iter_ws_refs(ws, ref_col, min_row):
+        ref_rows.setdefault(ref, []).append(row)
+    return ref_rows
+
+
+def is_grouped_index(ws, ref_rows, min_row=2):
+    """Return True if any worksheet row in the index doesn't hold exactly one part reference."""
+
+    num_rows = max(ws.max_row - min_row + 1, 0)
+    if sum(len(rows) for rows in ref_rows.values()) != num_rows:
+        return True
+    # As many references as rows, so each row holds one unless some row holds several.
+    return len(set(itertools.chain.from_iterable(ref_rows.values()))) != num_rows
+
+
+def ungroup_ws(ws, ref_col=1, min_row=2):
+    """Ungroup the rows of a worksheet in place and return the index of its part references.
+
+    The rows are expanded as they're read and written back over the rows that
+    have been read already, so only the rows pushed further down by grouped
+    references are held in memory. Rows without a reference are dropped.
+    """
+
+    ref_rows = {}
+    pending = collections.deque()  # Ungrouped rows waiting to be written.
+    write_row = min_row
+    last_row = ws.max_row
+    rows = ws.iter_rows(min_row=min_row, max_row=last_row, values_only=True)
+    for read_row, row in enumerate(rows, min_row):
+        for ref in iter_refs(row[ref_col - 1]):
+            pending.append(row[: ref_col - 1] + (ref,) + row[ref_col:])
+        # Only the rows that have been read can be overwritten.
+        while pending and (write_row <= read_row or read_row == last_row):
+            values = pending.popleft()
+            for col, value in enumerate(values, 1):
+                ws.cell(row=write_row, column=col).value = value
+            ref_rows.setdefault(values[ref_col - 1], []).append(write_row)
+            write_row += 1
+
+    # Remove the rows left over from dropping rows without references.
+    if write_row <= last_row:
+        ws.delete_rows(write_row, last_row - write_row + 1)
+    return ref_rows
+
+
+def ungroup_wb(wb, ref_col=1, min_row=2):
+    """Ungroup lines that have collapsed references.
+
+    The workbook is returned untouched if every row of its active worksheet
+    holds exactly one reference. Otherwise, the rows are ungrouped in place and
+    any rows without a reference are dropped.
+    """
 
-    return ungrouped_wb
+    ws = wb.active
+    if is_grouped_index(ws, index_ws_refs(ws, ref_col, min_row), min_row):
+        ungroup_ws(ws, ref_col, min_row)
+    return wb
 
 
 class FieldExtractionError(Exception):
@@ -196,6 +291,7 @@ def lc_get_close_matches(lbl, possibilities, num_matches=3, cutoff=0.6):
     else:
         lc_lbl = str.lower(lbl)
         lc_possibilities = [str.lower(p) for p in possibilities]
+    stats.count("fuzzy matches")
     lc_matches = get_close_matches(lc_lbl, lc_possibilities, num_matches, cutoff)
     return [possibilities[lc_possibilities.index(m)] for m in lc_matches]
 
@@ -208,45 +304,116 @@ def find_header_column(header, lbl):
     for cell in header:
         if str(cell.value).lower() == lbl_match.lower():
             logger.log(
-                DEBUG_OBSESSIVE,
-                "Found {} on header column {}.".format(lbl, cell.column),
+                DEBUG_OBSESSIVE, "Found %s on header column %s.", lbl, cell.column
             )
             return cell.column, lbl_match
     raise FindLabelError("{} not found in spreadsheet".format(lbl))
 
 
-def cull_list(fields, inc_fields=None, exc_fields=None):
-    """Update the list by keeping only items in inc_fields and deleting items in exc_fields."""
+class FieldNameMatcher(object):
+    """Match field names against a list of names or glob patterns (case-insensitive).
+
+    Exact matches are found with a set lookup first, so names with brackets
+    like '[I]manf#' match themselves. Glob patterns like 'MPN*' are tried with
+    fnmatch next, and only names that match neither fall back to fuzzy matching.
+    """
+
+    GLOB_CHARS = "*?["
+    WILDCARD_CHARS = "*?"  # Names with these are only ever used as patterns.
+
+    def __init__(self, names=None):
+        if isinstance(names, basestring):
+            names = [names]
+        try:
+            names = [n.lower() for n in names if isinstance(n, basestring)]
+        except TypeError:
+            names = []  # Not a list, so match nothing.
+        self.globs = [n for n in names if any(c in n for c in self.GLOB_CHARS)]
+        self.exact = set(names)
+        self.fuzzy = sorted(
+            n for n in self.exact if not any(c in n for c in self.WILDCARD_CHARS)
+        )
+
+    def __len__(self):
+        return len(self.exact)
+
+    def match(self, name, cutoff=0.6):
+        """Return True if the name matches any of the names or patterns."""
+        if not isinstance(name, basestring):
+            return False
+        lc_name = name.lower()
+        if lc_name in self.exact:
+            return True
+        if any(fnmatchcase(lc_name, g) for g in self.globs):
+            return True
+        stats.count("fuzzy matches")
+        return len(get_close_matches(lc_name, self.fuzzy, 1, cutoff)) > 0
+
+
+class FieldFilter(object):
+    """Decide which field names to keep, remembering the decision for each name."""
+
+    def __init__(self, inc_field_names=None, exc_field_names=None):
+        self.inc = FieldNameMatcher(inc_field_names)
+        self.exc = FieldNameMatcher(exc_field_names)
+        self.decisions = {}
+
+    def keep(self, field_name):
+        """Return True if the field is included (or there's no include list) and not excluded."""
+        try:
+            return self.decisions[field_name]
+        except KeyError:
+            keep = (len(self.inc) == 0 or self.inc.match(field_name)) and not (
+                len(self.exc) > 0 and self.exc.match(field_name)
+            )
+            self.decisions[field_name] = keep
+            return keep
+
+    def cull(self, fields):
+        """Update a list of field names in place so it only has the kept names."""
+        fields[:] = [f for f in fields if self.keep(f)]
 
-    # Remove any fields not in include list unless this list is empty, in which case keep all fields.
-    try:
-        if len(inc_fields) > 0:
-            for field in fields[:]:
-                if len(lc_get_close_matches(field, inc_fields, 1, 0.6)) == 0:
-                    fields.remove(field)
-    except TypeError:
-        # inc_fields was not a list, so do nothing to the field list.
-        pass
 
-    # Delete these fields unless list is empty, in which case delete none of them.
+# Field filters for each combination of include and exclude lists, so each is only built once.
+field_filters = {}
+
+
+def get_field_filter(inc_fields=None, exc_fields=None):
+    """Return the field filter for the include and exclude lists, building it if necessary."""
+
+    def as_key(names):
+        if isinstance(names, basestring):
+            return (names,)
+        try:
+            return tuple(names)
+        except TypeError:
+            return ()
+
+    key = (as_key(inc_fields), as_key(exc_fields))
     try:
-        if len(exc_fields) > 0:
-            for field in fields[:]:
-                if len(lc_get_close_matches(field, exc_fields, 1, 0.6)) != 0:
-                    fields.remove(field)
-    except TypeError:
-        # exc_fields was not a list, so do nothing to the field list.
-        pass
+        return field_filters[key]
+    except KeyError:
+        field_filters[key] = FieldFilter(*key)
+        return field_filters[key]
+
+
+def cull_list(fields, inc_fields=None, exc_fields=None):
+    """Update the list by keeping only items in inc_fields and deleting items in exc_fields.
+
+    Names in inc_fields and exc_fields are matched case-insensitively, can be
+    glob patterns like 'MPN*', and otherwise match if they're close enough.
+    """
+
+    get_field_filter(inc_fields, exc_fields).cull(fields)
 
 
+@traced(file_arg=None)
 def extract_part_fields_from_wb(
     wb, inc_field_names=None, exc_field_names=None, recurse=False
 ):
     """Return a dictionary of part fields extracted from an XLSX workbook."""
 
-    wb = ungroup_wb(wb)
-
-    part_fields = {}  # Start with an empty part dictionary.
+    part_fields = PartTable()  # Start with an empty part table.
 
     try:
         ws = wb.active  # Get the active worksheet from the workbook.
@@ -257,9 +424,6 @@ def extract_part_fields_from_wb(
         # Find the column with the part references.
         refs_c, refs_lbl = find_header_column(header, "refs")
 
-        # Get the list of part references.
-        refs = [r.value for r in list(ws.columns)[refs_c - 1][header_row:]]
-
         # Make a dict of spreadsheet column indexes keyed by their field name.
         field_cols = {c.value: c.column for c in header}
 
@@ -271,38 +435,36 @@ def extract_part_fields_from_wb(
         # Update the dictionary so it only has the allowed names.
         field_cols = {f: field_cols[f] for f in field_names}
 
-        # Get the field values for each part reference.
-        for row, ref in enumerate(refs, header_row + 1):
-            if ref is None:
-                continue  # Skip lines with no part reference.
-
-            # Get the field values from the row of the current part reference.
+        # Get the field values for each individual part reference. Grouped
+        # references are expanded as the rows are read, so the workbook
+        # never has to be ungrouped.
+        for row in ungrouped_rows(ws, refs_c, header_row + 1):
             field_values = {}
             for field_name, col in list(field_cols.items()):
-                value = ws.cell(row=row, column=col).value
+                value = row[col - 1]
                 if value is not None:
                     field_values[field_name] = value
                 else:
                     field_values[field_name] = ""
-
-            # Explode the part reference into its individual references and
-            # assign the field values to each part.
-            for single_ref in explode(ref):
-                part_fields[single_ref] = field_values
+            part_fields[row[refs_c - 1]] = field_values
 
     except FindLabelError:
         logger.warn("No references column found.")
         raise FieldExtractionError
 
     if logger.isEnabledFor(DEBUG_DETAILED):
-        print("Extracted Part Fields:")
-        pprint(part_fields)
+        logger.log(
+            DEBUG_DETAILED,
+            "Extracted part fields: %s",
+            summarize_part_fields(part_fields),
+        )
 
     return part_fields
 
 
+@traced()
 def extract_part_fields_from_xlsx(
-    filename, inc_field_names=None, exc_field_names=None, recurse=False
+    filename, inc_field_names=None, exc_field_names=None, recurse=False, jobs=1
 ):
     """Return a dictionary of part fields extracted from an XLSX spreadsheet."""
 
@@ -314,15 +476,18 @@ def extract_part_fields_from_xlsx(
     )
 
     try:
-        wb = pyxl.load_workbook(filename, data_only=True)
+        with open_input(filename, "rb") as xlsx_file:
+            with stats.phase("parse", filename):
+                wb = pyxl.load_workbook(xlsx_file, data_only=True)
         return extract_part_fields_from_wb(wb, inc_field_names, exc_field_names)
     except FieldExtractionError:
         logger.warn("Field extraction failed on {}.".format(filename))
     return {}
 
 
+@traced()
 def extract_part_fields_from_csv(
-    filename, inc_field_names=None, exc_field_names=None, recurse=False
+    filename, inc_field_names=None, exc_field_names=None, recurse=False, jobs=1
 ):
     """Return a dictionary of part fields extracted from a CSV spreadsheet."""
 
@@ -335,17 +500,19 @@ def extract_part_fields_from_csv(
 
     try:
         # Convert the CSV file into an XLSX workbook object and extract fields from that.
-        wb, _ = csvfile_to_wb(filename)
+        with stats.phase("parse", filename):
+            wb, _ = csvfile_to_wb(filename)
         return extract_part_fields_from_wb(wb, inc_field_names, exc_field_names)
     except FieldExtractionError:
         logger.warn("Field extraction failed on {}.".format(filename))
     return {}
 
 
-def extract_part_fields_from_sch(
-    filename, inc_field_names=None, exc_field_names=None, recurse=False, depth=0
+@traced()
+def extract_part_fields_from_sch_sheet(
+    filename, inc_field_names=None, exc_field_names=None
 ):
-    """Return a dictionary of part fields extracted from a schematic."""
+    """Return the part fields extracted from a single schematic sheet and the files of its sub-sheets."""
 
     logger.log(
         DEBUG_OVERVIEW,
@@ -354,9 +521,11 @@ def extract_part_fields_from_sch(
         ),
     )
 
-    part_fields_dict = {}  # Start with an empty part fields dictionary.
+    part_fields_dict = PartTable()  # Start with an empty part table.
 
-    sch = Schematic(filename)  # Read in the schematic.
+    with stats.phase("parse", filename):
+        sch = Schematic(filename)  # Read in the schematic.
+    stats.count("components parsed", len(sch.components))
 
     # Get all the part fields in the schematic and keep only the desired ones.
     # Remove the reference field (F0) from the list because that's used as as the dict key.
@@ -390,36 +559,104 @@ def extract_part_fields_from_sch(
             part_fields.update(part_fields_dict.get(ref, {}))
             part_fields_dict[ref] = part_fields
 
+    # Get the files of any other schematic sheets referenced by this one.
+    sheet_files = []
+    for sheet in sch.sheets:
+        for field in sheet.fields:
+            if field["id"] == "F1":
+                sheet_files.append(
+                    os.path.join(os.path.dirname(filename), unquote(field["value"]))
+                )
+                break
+
+    return part_fields_dict, sheet_files
+
+
+@traced()
+def extract_part_fields_from_sch(
+    filename,
+    inc_field_names=None,
+    exc_field_names=None,
+    recurse=False,
+    depth=0,
+    jobs=1,
+):
+    """Return a dictionary of part fields extracted from a schematic."""
+
+    part_fields_dict, sheet_files = extract_part_fields_from_sch_sheet(
+        filename, inc_field_names, exc_field_names
+    )
+
     # If this schematic references other schematic sheets, then extract the part fields from those.
-    if recurse:
-        for sheet in sch.sheets:
-            for field in sheet.fields:
-                if field["id"] == "F1":
-                    sheet_file = os.path.join(
-                        os.path.dirname(filename), unquote(field["value"])
-                    )
-                    part_fields_dict.update(
-                        extract_part_fields_from_sch(
-                            sheet_file,
-                            inc_field_names,
-                            exc_field_names,
-                            recurse,
-                            depth + 1,
-                        )
+    if recurse and num_workers(jobs, len(sheet_files)) > 1:
+        # Find and extract the sub-sheets a level of the hierarchy at a time
+        # using a pool of worker processes.
+        sheets = {filename: (PartTable(part_fields_dict), sheet_files)}
+        level = sheet_files
+        while level:
+            level = [f for f in dict.fromkeys(level) if f not in sheets]
+            results = run_jobs(
+                extract_part_fields_from_sch_sheet,
+                [(f, inc_field_names, exc_field_names) for f in level],
+                jobs,
+            )
+            next_level = []
+            for sheet_file, (sheet, error) in zip(level, results):
+                if error is not None:
+                    if not os.path.isfile(sheet_file):
+                        raise IOError("File not found: {}".format(sheet_file))
+                    raise ValueError(
+                        "Unable to extract from {}:\n{}".format(sheet_file, error)
                     )
-                    break
+                sheets[sheet_file] = sheet
+                next_level.extend(sheet[1])
+                run_progress.sheet_done(sheet_file)
+            level = next_level
+
+        # Combine the sheets in the same order as extracting them one at a time.
+        def combine_sheets(sheet_file):
+            sheet_fields_dict, sheet_files = sheets[sheet_file]
+            part_fields_dict.update(sheet_fields_dict)
+            for f in sheet_files:
+                combine_sheets(f)
+
+        for f in sheet_files:
+            combine_sheets(f)
+
+    elif recurse:
+        for sheet_file in sheet_files:
+            part_fields_dict.update(
+                extract_part_fields_from_sch(
+                    sheet_file,
+                    inc_field_names,
+                    exc_field_names,
+                    recurse,
+                    depth + 1,
+                    jobs,
+                )
+            )
+            run_progress.sheet_done(sheet_file)
 
     # Print part fields for debugging if this is the top-level sheet of the schematic.
     if depth == 0:
         if logger.isEnabledFor(DEBUG_DETAILED):
-            print("Extracted Part Fields:")
-            pprint(part_fields_dict)
+            logger.log(
+                DEBUG_DETAILED,
+                "Extracted part fields: %s",
+                summarize_part_fields(part_fields_dict),
+            )
 
     return part_fields_dict
 
 
+@traced()
 def extract_part_fields_from_sch_V6(
-    filename, inc_field_names=None, exc_field_names=None, recurse=False, depth=0
+    filename,
+    inc_field_names=None,
+    exc_field_names=None,
+    recurse=False,
+    depth=0,
+    jobs=1,
 ):
     """Return a dictionary of part fields extracted from a schematic."""
 
@@ -430,9 +667,14 @@ def extract_part_fields_from_sch_V6(
         ),
     )
 
-    part_fields_dict = {}  # Start with an empty part fields dictionary.
+    part_fields_dict = PartTable()  # Start with an empty part table.
 
-    sch = Schematic_V6(filename)  # Read in the schematic.
+    # Read in the schematic (unless it's still in memory from an earlier run).
+    sch = parse_cache.take(("sch_V6", filename))
+    if sch is None:
+        with stats.phase("parse", filename):
+            sch = Schematic_V6(filename, jobs=jobs)
+        stats.count("components parsed", len(sch.components))
 
     # Get all the part fields in the schematic and keep only the desired ones.
     # Remove the reference field (F0) from the list because that's used as as the dict key.
@@ -464,11 +706,18 @@ def extract_part_fields_from_sch_V6(
         part_fields.update(part_fields_dict.get(ref, {}))
         part_fields_dict[ref] = part_fields
 
+    parse_cache.store(
+        ("sch_V6", filename),
+        sch,
+        sorted(set(f for f, _ in sch.iter_sheets(filename))),
+    )
+
     return part_fields_dict
 
 
+@traced()
 def extract_part_fields_from_lib(
-    filename, inc_field_names=None, exc_field_names=None, recurse=False
+    filename, inc_field_names=None, exc_field_names=None, recurse=False, jobs=1
 ):
     """Return a dictionary of part fields extracted from a library."""
 
@@ -493,9 +742,11 @@ def extract_part_fields_from_lib(
         field_names.discard("")
         return list(field_names)
 
-    part_fields_dict = {}  # Start with an empty part dictionary.
+    part_fields_dict = PartTable()  # Start with an empty part table.
 
-    lib = SchLib(filename)  # Read in all the parts in the library.
+    with stats.phase("parse", filename):
+        lib = SchLib(filename)  # Read in all the parts in the library.
+    stats.count("components parsed", len(lib.components))
 
     # Get all the part fields in the schematic and keep only the desired ones.
     field_names = get_field_names_lib(lib)
@@ -526,7 +777,10 @@ def extract_part_fields_from_lib(
             # allowed fields.
             logger.log(
                 DEBUG_OBSESSIVE,
-                "Extracted library part: {} {} {}.".format(component_name, name, value),
+                "Extracted library part: %s %s %s.",
+                component_name,
+                name,
+                value,
             )
             if name in field_names:
                 part_fields[name] = value
@@ -535,14 +789,18 @@ def extract_part_fields_from_lib(
         part_fields_dict[component_name] = part_fields
 
     if logger.isEnabledFor(DEBUG_DETAILED):
-        print("Extracted Part Fields:")
-        pprint(part_fields_dict)
+        logger.log(
+            DEBUG_DETAILED,
+            "Extracted part fields: %s",
+            summarize_part_fields(part_fields_dict),
+        )
 
     return part_fields_dict
 
 
+@traced()
 def extract_part_fields_from_lib_V6(
-    filename, inc_field_names=None, exc_field_names=None, recurse=False
+    filename, inc_field_names=None, exc_field_names=None, recurse=False, jobs=1
 ):
     """Return a dictionary of part fields extracted from a KiCad V6 library."""
 
@@ -567,9 +825,14 @@ def extract_part_fields_from_lib_V6(
         field_names.discard("")
         return list(field_names)
 
-    part_fields_dict = {}  # Start with an empty part dictionary.
+    part_fields_dict = PartTable()  # Start with an empty part table.
 
-    lib = SchLib_V6(filename)  # Read in all the parts in the library.
+    # Read in all the parts in the library (unless it's still in memory from an earlier run).
+    lib = parse_cache.take(("lib_V6", filename))
+    if lib is None:
+        with stats.phase("parse", filename):
+            lib = SchLib_V6(filename)
+        stats.count("components parsed", len(lib.components))
 
     # Get all the part fields in the schematic and keep only the desired ones.
     field_names = lib.get_field_names()
@@ -586,7 +849,10 @@ def extract_part_fields_from_lib_V6(
 
             logger.log(
                 DEBUG_OBSESSIVE,
-                "Extracted library part: {} {} {}.".format(component.name, name, value),
+                "Extracted library part: %s %s %s.",
+                component.name,
+                name,
+                value,
             )
 
             # Store the field and its value if the field name is in the list of
@@ -597,15 +863,21 @@ def extract_part_fields_from_lib_V6(
         # Create a dictionary entry for this library component.
         part_fields_dict[component.name] = part_fields
 
+    parse_cache.store(("lib_V6", filename), lib, [filename])
+
     if logger.isEnabledFor(DEBUG_DETAILED):
-        print("Extracted Part Fields:")
-        pprint(part_fields_dict)
+        logger.log(
+            DEBUG_DETAILED,
+            "Extracted part fields: %s",
+            summarize_part_fields(part_fields_dict),
+        )
 
     return part_fields_dict
 
 
+@traced()
 def extract_part_fields_from_dcm(
-    filename, inc_field_names=None, exc_field_names=None, recurse=False
+    filename, inc_field_names=None, exc_field_names=None, recurse=False, jobs=1
 ):
     """Return a dictionary of part fields extracted from a part description file."""
 
@@ -616,12 +888,14 @@ def extract_part_fields_from_dcm(
         ),
     )
 
-    part_fields_dict = {}  # Start with an empty part dictionary.
+    part_fields_dict = PartTable()  # Start with an empty part table.
 
     try:
-        dcm = Dcm(filename)
+        with stats.phase("parse", filename):
+            dcm = Dcm(filename)
     except IOError:
         return part_fields_dict  # Return empty part fields dict if no DCM file found.
+    stats.count("components parsed", len(dcm.components))
 
     # Start with DCM field names and keep the desired ones.
     field_names = deepcopy(dcm_field_names)
@@ -638,9 +912,10 @@ def extract_part_fields_from_dcm(
             if value is not None:
                 logger.log(
                     DEBUG_OBSESSIVE,
-                    "Extracted part description: {} {} {}.".format(
-                        component_name, name, value
-                    ),
+                    "Extracted part description: %s %s %s.",
+                    component_name,
+                    name,
+                    value,
                 )
                 part_fields[name] = value
 
@@ -648,41 +923,124 @@ def extract_part_fields_from_dcm(
         part_fields_dict[component_name] = part_fields
 
     if logger.isEnabledFor(DEBUG_DETAILED):
-        print("Extracted Part Fields:")
-        pprint(part_fields_dict)
+        logger.log(
+            DEBUG_DETAILED,
+            "Extracted part fields: %s",
+            summarize_part_fields(part_fields_dict),
+        )
 
     return part_fields_dict
 
 
 def combine_part_field_dicts(from_dict, to_dict, do_union=True):
-    """Combine two part field dictionaries."""
+    """Combine two part field dictionaries.
+
+    The TO dictionary is updated in place and returned (a new dictionary is
+    created if it's None). Fields from the FROM dictionary overwrite those
+    in the TO dictionary. The FROM dictionary is left unchanged.
+    """
+
+    if to_dict is None:
+        to_dict = {}
+
+    # Always take all the FROM parts if there's nothing to combine them with.
+    do_union = do_union or len(to_dict) == 0
+
+    # Go through the parts in the FROM dictionary...
+    for from_ref, from_fields in from_dict.items():
+        to_fields = to_dict.get(from_ref)
+
+        # If the TO dictionary has the same part...
+        if to_fields is not None:
+            # Then insert the fields in the FROM part into the TO part.
+            to_fields.update(from_fields)
+
+        # If the FROM part isn't in the TO dictionary, but a union operation is active...
+        elif do_union:
+            # Then add a copy of the FROM part into the TO dictionary so later
+            # updates to it won't change the FROM dictionary.
+            to_dict[from_ref] = dict(from_fields)
+
+    return to_dict
+
+
+# Table of extraction functions for each file type.
+extraction_functions = {
+    ".xlsx": extract_part_fields_from_xlsx,
+    ".tsv": extract_part_fields_from_csv,
+    ".csv": extract_part_fields_from_csv,
+    ".sch": extract_part_fields_from_sch,
+    ".kicad_sch": extract_part_fields_from_sch_V6,
+    ".lib": extract_part_fields_from_lib,
+    ".kicad_sym": extract_part_fields_from_lib_V6,
+    ".dcm": extract_part_fields_from_dcm,
+}
+
+
+@traced()
+def extract_part_fields_from_file(
+    filename, inc_field_names=None, exc_field_names=None, recurse=False, jobs=1
+):
+    """Return a dictionary of part fields extracted from a single file (or None if that's not possible)."""
+
+    try:
+        logger.log(DEBUG_DETAILED, "Extracting fields from {}.".format(filename))
+
+        # Set the extraction function based on the file extension.
+        f_extension = os.path.splitext(filename)[1].lower()
+        extraction_function = extraction_functions[f_extension]
+
+    except KeyError:
+        logger.warn("Unknown file type for field extraction: {}.".format(filename))
 
-    if to_dict is None or len(to_dict) == 0:
-        comb_dict = deepcopy(from_dict)
     else:
-        comb_dict = deepcopy(to_dict)
-        to_dict_part_refs = list(to_dict.keys())
+        # Call the extraction function.
+        try:
+            with stats.phase("extract", filename):
+                return extraction_function(
+                    filename, inc_field_names, exc_field_names, recurse, jobs=jobs
+                )
 
-        # Go through the parts in the FROM dictionary...
-        for from_ref, from_fields in list(from_dict.items()):
+        except IOError:
+            logger.warn("File not found: {}.".format(filename))
 
-            # If the TO dictionary has the same part...
-            if from_ref in to_dict_part_refs:
-                # Then insert the fields in the FROM part into the TO part.
-                comb_dict[from_ref].update(from_fields)
 
-            # If the FROM part isn't in the TO dictionary, but a union operation is active...
-            elif do_union:
-                # Then add the FROM part into the TO dictionary.
-                comb_dict[from_ref] = from_fields
+def files_to_prefetch(filenames, jobs):
+    """Return the files to read ahead while files are processed one at a time."""
 
-    return comb_dict
+    if num_workers(jobs, 2) > 1:
+        # Files or their sheets may be done by worker processes, which read
+        # their own files and mustn't be forked while reader threads run.
+        return []
+    # Files parsed earlier (in watch or server mode) may not be read at all.
+    return [f for f in filenames if not parse_cache.holds(f)]
 
 
+def log_prefetch_stats(prefetcher):
+    """Log how much file reading a Prefetcher did in the background."""
+
+    if prefetcher.num_files:
+        logger.log(
+            DEBUG_OVERVIEW,
+            "Prefetched {} files ({:.1f} KB): {:.3f} s reading in the background, {:.3f} s waiting for reads.".format(
+                prefetcher.num_files,
+                prefetcher.num_bytes / 1024.0,
+                prefetcher.read_time,
+                prefetcher.wait_time,
+            ),
+        )
+
+
+@traced()
 def extract_part_fields(
-    filenames, inc_field_names=None, exc_field_names=None, recurse=False
+    filenames, inc_field_names=None, exc_field_names=None, recurse=False, jobs=1
 ):
-    """Return a dictionary of part fields extracted from a spreadsheet, part library, DCM, or schematic."""
+    """Return a dictionary of part fields extracted from a spreadsheet, part library, DCM, or schematic.
+
+    If jobs is more than 1, the files are extracted in that many worker processes
+    (0 means one per CPU). Either way, fields from later files override those
+    from earlier files.
+    """
 
     logger.log(
         DEBUG_OVERVIEW,
@@ -691,55 +1049,61 @@ def extract_part_fields(
         ),
     )
 
-    # Table of extraction functions for each file type.
-    extraction_functions = {
-        ".xlsx": extract_part_fields_from_xlsx,
-        ".tsv": extract_part_fields_from_csv,
-        ".csv": extract_part_fields_from_csv,
-        ".sch": extract_part_fields_from_sch,
-        ".kicad_sch": extract_part_fields_from_sch_V6,
-        ".lib": extract_part_fields_from_lib,
-        ".kicad_sym": extract_part_fields_from_lib_V6,
-        ".dcm": extract_part_fields_from_dcm,
-    }
-
-    part_fields_dict = {}  # Start with empty part field dictionary.
+    part_fields_dict = PartTable()  # Start with empty part table.
 
     # If extracting from only a single file, make a one-entry list.
     if type(filenames) == str:
         filenames = [filenames]
 
-    # Extract the fields from the parts in each file.
-    for f in filenames:
-        try:
-            logger.log(DEBUG_DETAILED, "Extracting fields from {}.".format(f))
-
-            # Set the extraction function based on the file extension.
-            f_extension = os.path.splitext(f)[1].lower()
-            extraction_function = extraction_functions[f_extension]
-
-        except KeyError:
-            logger.warn("Unknown file type for field extraction: {}.".format(f))
+    run_progress.begin("extract", filenames)
+
+    # Extract the fields from the parts in each file. The results come back
+    # in the same order as the files. If the files are done one at a time,
+    # the next files are read while the current one is parsed.
+    prefetch_files = files_to_prefetch(filenames, jobs)
+    failed_files = []
+    with Prefetcher(prefetch_files) as prefetcher:
+        results = run_jobs(
+            extract_part_fields_from_file,
+            [(f, inc_field_names, exc_field_names, recurse, jobs) for f in filenames],
+            jobs,
+        )
+        for f, (f_part_fields_dict, error) in zip(filenames, results):
+            prefetcher.release(f)
+            if error is not None:
+                logger.error("Field extraction failed on {}:\n{}".format(f, error))
+                failed_files.append(f)
 
-        else:
-            # Call the extraction function.
-            try:
-                f_part_fields_dict = extraction_function(
-                    f, inc_field_names, exc_field_names, recurse
-                )
+            elif f_part_fields_dict is not None:
+                # Add the extracted fields to the total part dictionary.
+                with stats.phase("combine", f):
+                    part_fields_dict = combine_part_field_dicts(
+                        f_part_fields_dict, part_fields_dict
+                    )
+            run_progress.file_done(f, len(f_part_fields_dict or {}))
+    log_prefetch_stats(prefetcher)
+    run_progress.end()
 
-            except IOError:
-                logger.warn("File not found: {}.".format(f))
+    if failed_files:
+        raise FieldExtractionError(
+            "Field extraction failed on {}.".format(", ".join(failed_files))
+        )
 
-            else:
-                # Add the extracted fields to the total part dictionary.
-                part_fields_dict = combine_part_field_dicts(
-                    f_part_fields_dict, part_fields_dict
-                )
+    if logger.isEnabledFor(DEBUG_OVERVIEW):
+        num_values, num_distinct, saved = part_fields_dict.value_stats()
+        logger.log(
+            DEBUG_OVERVIEW,
+            "Shared {} field values as {} distinct values, saving {:.1f} KB.".format(
+                num_values, num_distinct, saved / 1024.0
+            ),
+        )
 
     if logger.isEnabledFor(DEBUG_DETAILED):
-        print("Total Extracted Part Fields:")
-        pprint(part_fields_dict)
+        logger.log(
+            DEBUG_DETAILED,
+            "Total extracted part fields: %s",
+            summarize_part_fields(part_fields_dict),
+        )
 
     if part_fields_dict is None or len(part_fields_dict) == 0:
         logger.warn(
@@ -752,6 +1116,7 @@ def extract_part_fields(
     return part_fields_dict
 
 
+@traced(file_arg=None)
 def insert_part_fields_into_wb(part_fields_dict, wb, recurse=False):
     """Insert the fields in the extracted part dictionary into an XLSX workbook."""
 
@@ -768,8 +1133,6 @@ def insert_part_fields_into_wb(part_fields_dict, wb, recurse=False):
     if wb is None:
         wb = pyxl.Workbook()  # No workbook given, so create one.
 
-    wb = ungroup_wb(wb)  # Ungroup any grouped references.
-
     ws = wb.active  # Get the active sheet from the workbook.
 
     def set_cell_format(cell):
@@ -804,28 +1167,31 @@ def insert_part_fields_into_wb(part_fields_dict, wb, recurse=False):
     # Find the column with the part references.
     ref_col, _ = find_header_column(headers, id_label)
 
+    # Index the rows where each individual part reference appears, and ungroup
+    # any grouped references so each part gets a row of its own.
+    ref_rows = index_ws_refs(ws, ref_col, header_row + 1)
+    if is_grouped_index(ws, ref_rows, header_row + 1):
+        ref_rows = ungroup_ws(ws, ref_col, header_row + 1)
+
     # Add all the missing part references from the field dictionary to the worksheet.
     # That will ensure a worksheet that only had a subset of the dictionary
     # part fields will get the missing ones.
-    refs = set([])
-    for row in range(header_row + 1, ws.max_row + 1):
-        for ref in explode(ws.cell(row=row, column=ref_col).value):
-            refs.add(ref)
     row = ws.max_row + 1
     for ref in sorted(part_fields_dict.keys()):
-        if ref not in refs:
+        if ref not in ref_rows:
             cell = ws.cell(row=row, column=ref_col)
             cell.value = ref
             set_cell_format(cell)
-            refs.add(ref)
+            ref_rows[ref] = [row]
             row += 1
 
-    # Go through each row, see if any reference is in the part dictionary, and
-    # insert/overwrite fields from the dictionary.
-    for row in range(header_row + 1, ws.max_row + 1):
-        for ref in explode(ws.cell(row=row, column=ref_col).value):
+    # Go through each indexed reference, see if it is in the part dictionary, and
+    # insert/overwrite fields from the dictionary into the rows where it appears.
+    for ref, rows in ref_rows.items():
+        for row in rows:
             try:
                 fields = part_fields_dict[ref]
+                stats.count("fields matched", len(fields))
                 for field, value in fields.items():
                     # Skip None fields.
                     if value is None:
@@ -838,17 +1204,21 @@ def insert_part_fields_into_wb(part_fields_dict, wb, recurse=False):
                         cell = ws.cell(row=row, column=header_columns[header])
                         logger.log(
                             DEBUG_OBSESSIVE,
-                            "Updating {} field {} from {} to {}".format(
-                                ref, field, cell.value, value
-                            ),
+                            "Updating %s field %s from %s to %s",
+                            ref,
+                            field,
+                            cell.value,
+                            value,
                         )
                         cell.value = value
                         set_cell_format(cell)
                         logger.log(
                             DEBUG_OBSESSIVE,
-                            "Type of {} field {} containing {} is {}".format(
-                                ref, field, cell.value, cell.data_type
-                            ),
+                            "Type of %s field %s containing %s is %s",
+                            ref,
+                            field,
+                            cell.value,
+                            cell.data_type,
                         )
 
                     except IndexError:
@@ -856,9 +1226,10 @@ def insert_part_fields_into_wb(part_fields_dict, wb, recurse=False):
                         # so add a new column with the field name as the header label.
                         logger.log(
                             DEBUG_OBSESSIVE,
-                            "Adding {} field {} with value {}".format(
-                                ref, field, value
-                            ),
+                            "Adding %s field %s with value %s",
+                            ref,
+                            field,
+                            value,
                         )
                         cell = ws.cell(row=row, column=next_header_column)
                         cell.value = value
@@ -878,8 +1249,9 @@ def insert_part_fields_into_wb(part_fields_dict, wb, recurse=False):
     return wb
 
 
+@traced(file_arg=1)
 def insert_part_fields_into_xlsx(
-    part_fields_dict, filename, recurse, group_components, backup, no_range
+    part_fields_dict, filename, recurse, group_components, backup, no_range, jobs=1
 ):
     """Insert the fields in the extracted part dictionary into an XLSX spreadsheet."""
 
@@ -887,25 +1259,40 @@ def insert_part_fields_into_xlsx(
         DEBUG_OVERVIEW, "Inserting extracted fields into XLSX file {}.".format(filename)
     )
 
-    if backup:
-        create_backup(filename)
-
     # Either insert fields into an existing workbook, or use an empty one.
     try:
-        wb = pyxl.load_workbook(filename, data_only=True)
+        with open_input(filename, "rb") as xlsx_file:
+            with stats.phase("parse", filename):
+                wb = pyxl.load_workbook(xlsx_file, data_only=True)
+        orig_values = wb_values(wb)
     except IOError:
         wb = None
+        orig_values = None
 
     wb = insert_part_fields_into_wb(part_fields_dict, wb)
 
     if group_components:
-        wb = group_wb(wb, no_range)
+        with stats.phase("serialize", filename):
+            wb = group_wb(wb, no_range)
 
-    wb.save(filename)
+    # XLSX files hold timestamps, so compare the cells rather than the bytes
+    # to see if the file really has to be written.
+    if wb_values(wb) == orig_values:
+        record_file_change(filename, False)
+        return
+
+    if backup:
+        create_backup(filename)
+    with stats.phase("write", filename), trace.span("save", file=filename):
+        wb.save(filename)
+    stats.count("files written")
+    stats.count("bytes written", os.path.getsize(filename))
+    record_file_change(filename, True)
 
 
+@traced(file_arg=1)
 def insert_part_fields_into_csv(
-    part_fields_dict, filename, recurse, group_components, backup, no_range
+    part_fields_dict, filename, recurse, group_components, backup, no_range, jobs=1
 ):
     """Insert the fields in the extracted part dictionary into a CSV spreadsheet."""
 
@@ -913,12 +1300,10 @@ def insert_part_fields_into_csv(
         DEBUG_OVERVIEW, "Inserting extracted fields into CSV file {}.".format(filename)
     )
 
-    if backup:
-        create_backup(filename)
-
     # Either insert fields into an existing workbook, or use an empty one.
     try:
-        wb, dialect = csvfile_to_wb(filename)
+        with stats.phase("parse", filename):
+            wb, dialect = csvfile_to_wb(filename)
     except IOError:
         wb = None
         if os.path.splitext(filename)[-1] == ".tsv":
@@ -928,16 +1313,19 @@ def insert_part_fields_into_csv(
 
     wb = insert_part_fields_into_wb(part_fields_dict, wb)
 
-    if group_components:
-        wb = group_wb(wb, no_range)
+    with stats.phase("serialize", filename):
+        if group_components:
+            wb = group_wb(wb, no_range)
+        wb_to_csvfile(wb, filename, dialect, backup)
 
-    wb_to_csvfile(wb, filename, dialect)
 
+@traced(file_arg=1)
+def insert_part_fields_into_sch_sheet(part_fields_dict, filename, backup):
+    """Insert the fields in the extracted part dictionary into a single schematic sheet.
 
-def insert_part_fields_into_sch(
-    part_fields_dict, filename, recurse, group_components, backup, no_range
-):
-    """Insert the fields in the extracted part dictionary into a schematic."""
+    Returns the files of its sub-sheets and whether the sheet was written,
+    or None if the sheet wasn't found.
+    """
 
     logger.log(
         DEBUG_OVERVIEW,
@@ -962,10 +1350,12 @@ def insert_part_fields_into_sch(
     # Get an existing schematic or abort. (There's no way we can create
     # a viable schematic file just from part field values.)
     try:
-        sch = Schematic(filename)
+        with stats.phase("parse", filename):
+            sch = Schematic(filename)
     except IOError:
         logger.warn("Schematic file {} not found.".format(filename))
-        return
+        return None
+    stats.count("components parsed", len(sch.components))
 
     # Go through all the schematic components, replacing field values and
     # adding new fields found in the part fields dictionary.
@@ -980,6 +1370,7 @@ def insert_part_fields_into_sch(
 
             # Get the part fields for the given part reference (or an empty list).
             part_fields = part_fields_dict.get(ref, {})
+            stats.count("fields matched", len(part_fields))
 
             # Warn if the current part fields for this component don't match the
             # previous part fields (which may happen with hierarchical schematics).
@@ -1035,12 +1426,15 @@ def insert_part_fields_into_sch(
 
                     if unquote(f["name"]).lower() == field_name.lower():
                         # Update existing named field in component.
-                        logger.log(
-                            DEBUG_OBSESSIVE,
-                            "Updating {} field {} from {} to {}".format(
-                                ref, f["id"], f["ref"], quote(field_value)
-                            ),
-                        )
+                        if logger.isEnabledFor(DEBUG_OBSESSIVE):
+                            logger.log(
+                                DEBUG_OBSESSIVE,
+                                "Updating %s field %s from %s to %s",
+                                ref,
+                                f["id"],
+                                f["ref"],
+                                quote(field_value),
+                            )
                         f["ref"] = quote(field_value)
                         # Set field attributes but don't change its position.
                         if "attributes" in field_attributes:
@@ -1049,12 +1443,15 @@ def insert_part_fields_into_sch(
 
                     elif f["id"] == field_id:
                         # Update one of the default, unnamed fields in component.
-                        logger.log(
-                            DEBUG_OBSESSIVE,
-                            "Updating {} field {} from {} to {}".format(
-                                ref, f["id"], f["ref"], quote(field_value)
-                            ),
-                        )
+                        if logger.isEnabledFor(DEBUG_OBSESSIVE):
+                            logger.log(
+                                DEBUG_OBSESSIVE,
+                                "Updating %s field %s from %s to %s",
+                                ref,
+                                f["id"],
+                                f["ref"],
+                                quote(field_value),
+                            )
                         f["ref"] = quote(field_value)
                         # Set field attributes but don't change its position.
                         if "attributes" in field_attributes:
@@ -1072,12 +1469,14 @@ def insert_part_fields_into_sch(
                         new_field.update(field_attributes)  # Set field's attributes.
                         new_field.update(field_position)  # Set new field's position.
                         component.add_field(new_field)
-                        logger.log(
-                            DEBUG_OBSESSIVE,
-                            "Adding {} field {} with value {}".format(
-                                ref, component.fields[-1]["id"], quote(field_value)
-                            ),
-                        )
+                        if logger.isEnabledFor(DEBUG_OBSESSIVE):
+                            logger.log(
+                                DEBUG_OBSESSIVE,
+                                "Adding %s field %s with value %s",
+                                ref,
+                                component.fields[-1]["id"],
+                                quote(field_value),
+                            )
 
                 # Keep only default fields and named fields with non-empty values.
                 default_field_ids = sch_field_id_to_name.keys()
@@ -1093,30 +1492,90 @@ def insert_part_fields_into_sch(
                 component.fields = reorder_sch_fields(component.fields)
 
     # Save the updated schematic.
-    if backup:
-        create_backup(filename)
-    sch.save(filename)
+    with stats.phase("serialize", filename):
+        written = sch.save(filename, backup)
+
+    # Get the files of any other schematic sheets referenced by this one.
+    sheet_files = []
+    for sheet in sch.sheets:
+        # If filename includes a path, save this path to prepend below
+        if filename.count("/") > 0:
+            prepend_dir = filename.rsplit("/", 1)[0] + "/"
+        else:
+            prepend_dir = "./"
+        for field in sheet.fields:
+            if field["id"] == "F1":
+                # Prepend path for sheets which are nested more than once
+                sheet_files.append(prepend_dir + unquote(field["value"]))
+                break
+
+    return sheet_files, written
+
+
+@traced(file_arg=1)
+def insert_part_fields_into_sch(
+    part_fields_dict, filename, recurse, group_components, backup, no_range, jobs=1
+):
+    """Insert the fields in the extracted part dictionary into a schematic."""
+
+    sheet = insert_part_fields_into_sch_sheet(part_fields_dict, filename, backup)
+    if sheet is None:
+        return False
+    sheet_files = sheet[0]
 
     # If this schematic references other schematic sheets, then insert the part fields into those, too.
-    if recurse:
-        for sheet in sch.sheets:
-            # If filename includes a path, save this path to prepend below
-            if filename.count("/") > 0:
-                prepend_dir = filename.rsplit("/", 1)[0] + "/"
-            else:
-                prepend_dir = "./"
-            for field in sheet.fields:
-                if field["id"] == "F1":
-                    # Prepend path for sheets which are nested more than once
-                    sheet_file = prepend_dir + unquote(field["value"])
-                    insert_part_fields_into_sch(
-                        part_fields_dict, sheet_file, recurse, group_components, backup, no_range
+    if recurse and num_workers(jobs, len(sheet_files)) > 1:
+        # Insert into the sub-sheets a level of the hierarchy at a time using
+        # a pool of worker processes. A sheet used more than once only has to
+        # be updated once because it gets the same fields every time.
+        done = set([filename])
+        level = sheet_files
+        while level:
+            level = [f for f in dict.fromkeys(level) if f not in done]
+            done.update(level)
+            # Only back up files that haven't been backed-up already.
+            sheet_backups = [backup and f not in backedup_files for f in level]
+            results = run_jobs(
+                insert_part_fields_into_sch_sheet,
+                [(part_fields_dict, f, b) for f, b in zip(level, sheet_backups)],
+                jobs,
+            )
+            next_level = []
+            for sheet_file, backed_up, (sheet, error) in zip(
+                level, sheet_backups, results
+            ):
+                if error is not None:
+                    raise IOError(
+                        "Unable to insert into {}:\n{}".format(sheet_file, error)
                     )
-                    break
+                if sheet is None:
+                    continue  # Sheet not found.
+                files, written = sheet
+                # Record what the worker processes did to the files.
+                record_file_change(sheet_file, written)
+                if written and backed_up and sheet_file not in backedup_files:
+                    backedup_files.append(sheet_file)
+                next_level.extend(files)
+                run_progress.sheet_done(sheet_file)
+            level = next_level
+
+    elif recurse:
+        for sheet_file in sheet_files:
+            insert_part_fields_into_sch(
+                part_fields_dict,
+                sheet_file,
+                recurse,
+                group_components,
+                backup,
+                no_range,
+                jobs,
+            )
+            run_progress.sheet_done(sheet_file)
 
 
+@traced(file_arg=1)
 def insert_part_fields_into_sch_V6(
-    part_fields_dict, filename, recurse, group_components, backup, no_range
+    part_fields_dict, filename, recurse, group_components, backup, no_range, jobs=1
 ):
     """Insert the fields in the extracted part dictionary into a schematic."""
 
@@ -1125,13 +1584,20 @@ def insert_part_fields_into_sch_V6(
         "Inserting extracted fields into schematic file {}.".format(filename),
     )
 
-    # Get an existing schematic or abort. (There's no way we can create
-    # a viable schematic file just from part field values.)
-    try:
-        sch = Schematic_V6(filename)
-    except IOError:
-        logger.warn("Schematic file {} not found.".format(filename))
-        return
+    # Get an existing schematic (unless it's still in memory from the last
+    # run) or abort. (There's no way we can create a viable schematic file
+    # just from part field values.)
+    sch = parse_cache.take(("sch_V6", filename))
+    if sch is None:
+        sch = parse_cache.take(("sch_V6_inserted", filename))
+    if sch is None:
+        try:
+            with stats.phase("parse", filename):
+                sch = Schematic_V6(filename, jobs=jobs)
+        except IOError:
+            logger.warn("Schematic file {} not found.".format(filename))
+            return False
+        stats.count("components parsed", len(sch.components))
 
     # Go through all the schematic components, replacing field values and
     # adding new fields found in the part fields dictionary.
@@ -1145,6 +1611,7 @@ def insert_part_fields_into_sch_V6(
 
         # Get the part fields for the given part reference (or an empty list).
         part_fields = part_fields_dict.get(ref, {})
+        stats.count("fields matched", len(part_fields))
 
         # Warn if the current part fields for this component don't match the
         # previous part fields (which may happen with hierarchical schematics).
@@ -1185,12 +1652,16 @@ def insert_part_fields_into_sch_V6(
 
                 if f["name"].lower() == field_name.lower():
                     # Update existing named field in component.
-                    logger.log(
-                        DEBUG_OBSESSIVE,
-                        "Updating {} field {} from {} to {} with visibility {}".format(
-                            ref, f["name"], f["value"], quote(field_value), total_vis
-                        ),
-                    )
+                    if logger.isEnabledFor(DEBUG_OBSESSIVE):
+                        logger.log(
+                            DEBUG_OBSESSIVE,
+                            "Updating %s field %s from %s to %s with visibility %s",
+                            ref,
+                            f["name"],
+                            f["value"],
+                            quote(field_value),
+                            total_vis,
+                        )
                     f["value"] = field_value
                     component.set_field_value(f["name"], field_value)
                     component.set_field_visibility(f["name"], total_vis)
@@ -1200,12 +1671,15 @@ def insert_part_fields_into_sch_V6(
             else:
                 if field_value not in (None, ""):
                     # Add new named field and value to component.
-                    logger.log(
-                        DEBUG_OBSESSIVE,
-                        "Adding {} field {} with value {} with visibility {}".format(
-                            ref, field_name, quote(field_value), total_vis
-                        ),
-                    )
+                    if logger.isEnabledFor(DEBUG_OBSESSIVE):
+                        logger.log(
+                            DEBUG_OBSESSIVE,
+                            "Adding %s field %s with value %s with visibility %s",
+                            ref,
+                            field_name,
+                            quote(field_value),
+                            total_vis,
+                        )
                     component.copy_field("Reference", field_name)
                     component.set_field_value(field_name, field_value)
                     pos = component.get_field_pos(field_name)
@@ -1226,11 +1700,26 @@ def insert_part_fields_into_sch_V6(
                 component.del_field(name)
 
     # Save the updated schematic and sub-schematics (if recursing).
-    sch.save(recurse, backup, filename)
+    with stats.phase("serialize", filename):
+        sch.save(recurse, backup, filename, jobs)
+
+    # Keep the schematic in memory unless it has sub-sheets that weren't saved.
+    # A sheet used more than once is saved from its last use, so its other
+    # uses may not match the file. That's fine for the next insertion (which
+    # also saves from the last use), but not for extracting fields.
+    if recurse or not sch.children:
+        sheet_files = [f for f, _ in sch.iter_sheets(filename)]
+        unique_sheet_files = sorted(set(sheet_files))
+        if len(unique_sheet_files) == len(sheet_files):
+            key = ("sch_V6", filename)
+        else:
+            key = ("sch_V6_inserted", filename)
+        parse_cache.store(key, sch, unique_sheet_files)
 
 
+@traced(file_arg=1)
 def insert_part_fields_into_lib(
-    part_fields_dict, filename, recurse, group_components, backup, no_range
+    part_fields_dict, filename, recurse, group_components, backup, no_range, jobs=1
 ):
     """Insert the fields in the extracted part dictionary into a library."""
 
@@ -1239,16 +1728,15 @@ def insert_part_fields_into_lib(
         "Inserting extracted fields into library file {}.".format(filename),
     )
 
-    if backup:
-        create_backup(filename)
-
     # Get an existing library or abort. (There's no way we can create
     # a viable library file just from part field values.)
     try:
-        lib = SchLib(filename)
+        with stats.phase("parse", filename):
+            lib = SchLib(filename)
     except IOError:
         logger.warn("Library file {} not found.".format(filename))
-        return
+        return False
+    stats.count("components parsed", len(lib.components))
 
     # Go through all the library components, replacing field values and
     # adding new fields from the part fields dictionary.
@@ -1257,6 +1745,7 @@ def insert_part_fields_into_lib(
 
         # Get fields for the part with the same name as this component (or an empty list).
         part_fields = part_fields_dict.get(component_name, {})
+        stats.count("fields matched", len(part_fields))
 
         # Insert the fields from the part dictionary into the component fields.
         for field_name, field_value in part_fields.items():
@@ -1269,36 +1758,42 @@ def insert_part_fields_into_lib(
 
                 if unquote(f.get("fieldname", "")).lower() == field_name.lower():
                     # Update existing named field in component.
-                    logger.log(
-                        DEBUG_OBSESSIVE,
-                        "Updating {} field {} from {} to {}".format(
-                            component_name, field_name, f["name"], quote(field_value)
-                        ),
-                    )
+                    if logger.isEnabledFor(DEBUG_OBSESSIVE):
+                        logger.log(
+                            DEBUG_OBSESSIVE,
+                            "Updating %s field %s from %s to %s",
+                            component_name,
+                            field_name,
+                            f["name"],
+                            quote(field_value),
+                        )
                     f["name"] = quote(field_value)
                     break
 
                 elif str(id) == field_id:
                     if id == 0:
                         # Update the F0 field of the component.
-                        logger.log(
-                            DEBUG_OBSESSIVE,
-                            "Updating {} field {} from {} to {}".format(
+                        if logger.isEnabledFor(DEBUG_OBSESSIVE):
+                            logger.log(
+                                DEBUG_OBSESSIVE,
+                                "Updating %s field %s from %s to %s",
                                 component_name,
                                 field_id,
                                 f["reference"],
                                 quote(field_value),
-                            ),
-                        )
+                            )
                         f["reference"] = quote(field_value)
                     else:
                         # Update one of the F1, F2, or F3 fields in the component.
-                        logger.log(
-                            DEBUG_OBSESSIVE,
-                            "Updating {} field {} from {} to {}".format(
-                                component_name, field_id, f["name"], quote(field_value)
-                            ),
-                        )
+                        if logger.isEnabledFor(DEBUG_OBSESSIVE):
+                            logger.log(
+                                DEBUG_OBSESSIVE,
+                                "Updating %s field %s from %s to %s",
+                                component_name,
+                                field_id,
+                                f["name"],
+                                quote(field_value),
+                            )
                         f["name"] = quote(field_value)
                     break
 
@@ -1311,12 +1806,14 @@ def insert_part_fields_into_lib(
                     new_field["fieldname"] = quote(field_name)
                     new_field["name"] = quote(field_value)
                     component.fields.append(new_field)
-                    logger.log(
-                        DEBUG_OBSESSIVE,
-                        "Adding {} field {} with value {}".format(
-                            component_name, field_name, quote(field_value)
-                        ),
-                    )
+                    if logger.isEnabledFor(DEBUG_OBSESSIVE):
+                        logger.log(
+                            DEBUG_OBSESSIVE,
+                            "Adding %s field %s with value %s",
+                            component_name,
+                            field_name,
+                            quote(field_value),
+                        )
 
         # Remove any named fields with empty values.
         component.fields = [
@@ -1327,11 +1824,13 @@ def insert_part_fields_into_lib(
         ]
 
     # Save the updated library.
-    lib.save(filename)
+    with stats.phase("serialize", filename):
+        lib.save(filename, backup)
 
 
+@traced(file_arg=1)
 def insert_part_fields_into_lib_V6(
-    part_fields_dict, filename, recurse, group_components, backup, no_range
+    part_fields_dict, filename, recurse, group_components, backup, no_range, jobs=1
 ):
     """Insert the fields in the extracted part dictionary into a KiCad V6 library."""
 
@@ -1340,13 +1839,18 @@ def insert_part_fields_into_lib_V6(
         "Inserting extracted fields into library file {}.".format(filename),
     )
 
-    # Get an existing library or abort. (There's no way we can create
-    # a viable library file just from part field values.)
-    try:
-        lib = SchLib_V6(filename)
-    except IOError:
-        logger.warn("Library file {} not found.".format(filename))
-        return
+    # Get an existing library (unless it's still in memory from the last
+    # run) or abort. (There's no way we can create a viable library file
+    # just from part field values.)
+    lib = parse_cache.take(("lib_V6", filename))
+    if lib is None:
+        try:
+            with stats.phase("parse", filename):
+                lib = SchLib_V6(filename)
+        except IOError:
+            logger.warn("Library file {} not found.".format(filename))
+            return False
+        stats.count("components parsed", len(lib.components))
 
     # Go through all the library components, replacing field values and
     # adding new fields from the part fields dictionary.
@@ -1354,6 +1858,7 @@ def insert_part_fields_into_lib_V6(
 
         # Get fields for the part with the same name as this component (or an empty list).
         part_fields = part_fields_dict.get(component.name, {})
+        stats.count("fields matched", len(part_fields))
 
         # Insert the fields from the part dictionary into the component fields.
         for field_name, field_value in part_fields.items():
@@ -1383,12 +1888,15 @@ def insert_part_fields_into_lib_V6(
 
                 if f["name"].lower() == field_name.lower():
                     # Update existing named field in component.
-                    logger.log(
-                        DEBUG_OBSESSIVE,
-                        "Updating {} field {} from {} to {}".format(
-                            component.name, f["name"], f["value"], quote(field_value)
-                        ),
-                    )
+                    if logger.isEnabledFor(DEBUG_OBSESSIVE):
+                        logger.log(
+                            DEBUG_OBSESSIVE,
+                            "Updating %s field %s from %s to %s",
+                            component.name,
+                            f["name"],
+                            f["value"],
+                            quote(field_value),
+                        )
                     f["value"] = field_value
                     component.set_field_value(f["name"], field_value)
                     component.set_field_visibility(f["name"], total_vis)
@@ -1400,9 +1908,11 @@ def insert_part_fields_into_lib_V6(
                     # Add new named field and value to component.
                     logger.log(
                         DEBUG_OBSESSIVE,
-                        "Adding {} field {} with value {} with visibility {}".format(
-                            component.name, f["name"], f["value"], total_vis
-                        ),
+                        "Adding %s field %s with value %s with visibility %s",
+                        component.name,
+                        f["name"],
+                        f["value"],
+                        total_vis,
                     )
                     component.copy_field("Reference", field_name)
                     component.set_field_value(field_name, field_value)
@@ -1433,11 +1943,14 @@ def insert_part_fields_into_lib_V6(
                 component.del_field(name)
 
     # Save the updated library.
-    lib.save(backup, filename)
+    with stats.phase("serialize", filename):
+        lib.save(backup, filename)
+    parse_cache.store(("lib_V6", filename), lib, [filename])
 
 
+@traced(file_arg=1)
 def insert_part_fields_into_dcm(
-    part_fields_dict, filename, recurse, group_components, backup, no_range
+    part_fields_dict, filename, recurse, group_components, backup, no_range, jobs=1
 ):
     """Insert the fields in the extracted part dictionary into a DCM file."""
 
@@ -1445,9 +1958,6 @@ def insert_part_fields_into_dcm(
         DEBUG_OVERVIEW, "Inserting extracted fields into DCM file {}.".format(filename)
     )
 
-    if backup:
-        create_backup(filename)
-
     # Get the part fields from the DCM file.
     dcm_part_fields_dict = extract_part_fields_from_dcm(filename)
 
@@ -1467,32 +1977,161 @@ def insert_part_fields_into_dcm(
         dcm.components.append(cmp)
 
     # Overwrite the current DCM file with the new part fields.
-    dcm.save(filename)
+    with stats.phase("serialize", filename):
+        dcm.save(filename, backup)
 
 
-def insert_part_fields(part_fields_dict, filenames, recurse, group_components, backup, no_range):
-    """Insert part fields from a dictionary into a spreadsheet, part library, or schematic."""
+# Table of insertion functions for each file type.
+insertion_functions = {
+    ".xlsx": insert_part_fields_into_xlsx,
+    ".tsv": insert_part_fields_into_csv,
+    ".csv": insert_part_fields_into_csv,
+    ".sch": insert_part_fields_into_sch,
+    ".kicad_sch": insert_part_fields_into_sch_V6,
+    ".lib": insert_part_fields_into_lib,
+    ".kicad_sym": insert_part_fields_into_lib_V6,
+    ".dcm": insert_part_fields_into_dcm,
+}
 
-    # No files backed-up yet, so clear list of file names.
-    global backedup_files
-    backedup_files = []
+
+class FieldInsertionError(Exception):
+    pass
+
+
+@traced(file_arg=1)
+def insert_part_fields_into_file(
+    part_fields_dict, filename, recurse, group_components, backup, no_range, jobs=1
+):
+    """Insert part fields from a dictionary into a single file and return the outcome.
+
+    Returns "updated" if the file was written, "unchanged" if it already held
+    the inserted fields so it was left untouched, or "skipped" if it couldn't
+    be updated (unknown file type, missing schematic or library, or unwritable
+    file). An insertion function signals a skipped file by returning False.
+    """
+
+    try:
+        logger.log(DEBUG_DETAILED, "Inserting fields into {}.".format(filename))
+
+        # Set the insertion function based on the file extension.
+        f_extension = os.path.splitext(filename)[1].lower()
+        insertion_function = insertion_functions[f_extension]
+
+    except KeyError:
+        logger.warn("Unknown file type for field insertion: {}".format(filename))
+        return "skipped"
+
+    try:
+        with stats.phase("insert", filename):
+            inserted = insertion_function(
+                part_fields_dict,
+                filename,
+                recurse,
+                group_components,
+                backup,
+                no_range,
+                jobs=jobs,
+            )
+        if inserted is False:
+            return "skipped"
+
+    except IOError:
+        logger.warn("Unable to write to file: {}.".format(filename))
+        return "skipped"
+
+    if file_changes.get(filename, True):
+        return "updated"
+    return "unchanged"
+
+
+@traced(file_arg=1)
+def insert_part_fields_into_files(
+    part_fields_dict,
+    filenames,
+    recurse,
+    group_components,
+    backup,
+    no_range,
+    jobs=1,
+    backedup=(),
+):
+    """Insert part fields into a list of files, one after another.
+
+    Files in backedup were already backed up and aren't backed up again.
+    Returns the outcome for each file and whether each written file was
+    changed (so a worker process can report them back).
+    """
+
+    for f in backedup:
+        if f not in backedup_files:
+            backedup_files.append(f)
+
+    outcomes = [
+        insert_part_fields_into_file(
+            part_fields_dict, f, recurse, group_components, backup, no_range, jobs
+        )
+        for f in filenames
+    ]
+    return outcomes, dict(file_changes)
+
+
+def group_insertion_targets(filenames, recurse):
+    """Group the indices of files that must not be written at the same time.
+
+    A file listed more than once, a library and the description file it
+    reads, or schematics that may share sub-sheets when recursing, all end
+    up in the same group so a single worker handles them in order.
+    """
+
+    groups = []
+    group_keys = {}
+    for i, f in enumerate(filenames):
+        key = os.path.normcase(os.path.realpath(f))
+        base, ext = os.path.splitext(key)
+        if ext in (".lib", ".dcm"):
+            key = base + ".lib"  # A library reads its description file.
+        elif recurse and ext in (".sch", ".kicad_sch"):
+            key = ".sch"  # Hierarchies may overlap, so keep them together.
+        if key in group_keys:
+            groups[group_keys[key]].append(i)
+        else:
+            group_keys[key] = len(groups)
+            groups.append([i])
+    return groups
+
+
+@traced(file_arg=1)
+def insert_part_fields(
+    part_fields_dict,
+    filenames,
+    recurse,
+    group_components,
+    backup,
+    no_range,
+    jobs=1,
+    backup_record=None,
+):
+    """Insert part fields from a dictionary into a spreadsheet, part library, or schematic.
+
+    If jobs is more than 1, independent files are updated by that many worker
+    processes (0 means one per CPU). Files whose contents wouldn't change
+    are left untouched. Returns a list of (filename, outcome) for each file,
+    where outcome is "updated", "unchanged", "skipped" or "failed".
+
+    If a backup_record list is given, the files in it aren't backed up
+    again and the files backed up now are added to it. (A watch session
+    uses this to back up each file only once.)
+    """
+
+    # No files written yet, so clear the records of them. Only the files in
+    # the backup record have been backed up.
+    backedup_files[:] = backup_record or []
+    file_changes.clear()
 
     logger.log(
         DEBUG_OVERVIEW, "Inserting extracted fields into files {}.".format(filenames)
     )
 
-    # Table of insertion functions for each file type.
-    insertion_functions = {
-        ".xlsx": insert_part_fields_into_xlsx,
-        ".tsv": insert_part_fields_into_csv,
-        ".csv": insert_part_fields_into_csv,
-        ".sch": insert_part_fields_into_sch,
-        ".kicad_sch": insert_part_fields_into_sch_V6,
-        ".lib": insert_part_fields_into_lib,
-        ".kicad_sym": insert_part_fields_into_lib_V6,
-        ".dcm": insert_part_fields_into_dcm,
-    }
-
     if part_fields_dict is None or len(part_fields_dict) == 0:
         logger.warn("There are no part field values to insert!")
         return
@@ -1501,37 +2140,109 @@ def insert_part_fields(part_fields_dict, filenames, recurse, group_components, b
     if type(filenames) == str:
         filenames = [filenames]
 
-    # Insert the part fields into each file.
-    for f in filenames:
-        try:
-            logger.log(DEBUG_DETAILED, "Inserting fields into {}.".format(f))
-
-            # Set the insertion function based on the file extension.
-            f_extension = os.path.splitext(f)[1].lower()
-            insertion_function = insertion_functions[f_extension]
-
-        except KeyError:
-            logger.warn("Unknown file type for field insertion: {}".format(f))
+    run_progress.begin("insert", filenames)
 
-        else:
-            try:
-                insertion_function(
-                    part_fields_dict, f, recurse, group_components, backup, no_range
+    # Insert the part fields into each group of files. Each group is handled by
+    # a single worker so no file is ever written by two workers at once, and
+    # each file's backups are numbered in the same order as a serial run.
+    groups = group_insertion_targets(filenames, recurse)
+    # If the groups are done one at a time, read the next files while the
+    # current one is being updated.
+    prefetch_files = files_to_prefetch(
+        [filenames[i] for group in groups for i in group], jobs
+    )
+    outcomes = [None] * len(filenames)
+    failed_files = []
+    with Prefetcher(prefetch_files) as prefetcher:
+        results = run_jobs(
+            insert_part_fields_into_files,
+            [
+                (
+                    part_fields_dict,
+                    [filenames[i] for i in group],
+                    recurse,
+                    group_components,
+                    backup,
+                    no_range,
+                    jobs,
+                    list(backedup_files),
+                )
+                for group in groups
+            ],
+            jobs,
+        )
+        for group, (group_result, error) in zip(groups, results):
+            for i in group:
+                prefetcher.release(filenames[i])
+            if error is not None:
+                group_files = [filenames[i] for i in group]
+                logger.error(
+                    "Field insertion failed on {}:\n{}".format(
+                        ", ".join(group_files), error
+                    )
                 )
+                failed_files.extend(group_files)
+                group_outcomes = ["failed"] * len(group)
+            else:
+                group_outcomes, group_file_changes = group_result
+                for f, written in group_file_changes.items():
+                    record_file_change(f, written)
+            for i, outcome in zip(group, group_outcomes):
+                outcomes[i] = outcome
+                num_parts = len(part_fields_dict) if outcome != "failed" else 0
+                run_progress.file_done(filenames[i], num_parts)
+    log_prefetch_stats(prefetcher)
+    run_progress.end()
+
+    # Every file written with backups on was backed up first (maybe by a worker).
+    if backup:
+        for f, written in file_changes.items():
+            if written and f not in backedup_files:
+                backedup_files.append(f)
+    if backup_record is not None:
+        backup_record[:] = backedup_files
+
+    report = list(zip(filenames, outcomes))
+    for f, outcome in report:
+        logger.log(DEBUG_OVERVIEW, "Insertion into {}: {}.".format(f, outcome))
+    num_untouched = sum(1 for written in file_changes.values() if not written)
+    num_written = len(file_changes) - num_untouched
+    logger.log(
+        DEBUG_OVERVIEW,
+        "Wrote {} file{} and left {} unchanged file{} untouched.".format(
+            num_written,
+            "" if num_written == 1 else "s",
+            num_untouched,
+            "" if num_untouched == 1 else "s",
+        ),
+    )
+
+    if failed_files:
+        raise FieldInsertionError(
+            "Field insertion failed on {}.".format(", ".join(failed_files))
+        )
 
-            except IOError:
-                logger.warn("Unable to write to file: {}.".format(f))
+    return report
 
 
 def clean_part_fields(part_fields_dict):
     """Clean field values (i.e., remove or replace any newlines with spaces.)"""
+
+    def clean(v):
+        v = re.sub("[\n\r]+$", "", str(v))  # Remove newlines at end of field.
+        return re.sub("[\n\r]+", " ", v)  # Replace newlines within field.
+
+    if isinstance(part_fields_dict, PartTable):
+        # Clean an entire column of the table at a time.
+        part_fields_dict.map_values(clean)
+        return
+
     for part, fields in part_fields_dict.items():
         for k, v in fields.items():
-            v = re.sub("[\n\r]+$", "", str(v))  # Remove newlines at end of field.
-            fields[k] = re.sub("[\n\r]+", " ", v)  # Replace newlines within field.
+            fields[k] = clean(v)
 
 
-def kifield(
+def sync_part_fields(
     extract_filenames,
     insert_filenames,
     inc_field_names=None,
@@ -1539,18 +2250,238 @@ def kifield(
     recurse=False,
     group_components=False,
     backup=True,
-    no_range=False
+    no_range=False,
+    jobs=1,
+    manifest=None,
+    backup_record=None,
 ):
-    """Extract fields from a set of files and insert them into another set of files."""
+    """Extract fields from a set of files and insert them into another set of files.
+
+    The manifest of the last run (if there is one) records the hashes of the
+    files that were read and written, and of the fields of each part. If it
+    was made with the same files and options, nothing is done if none of those
+    files changed. Otherwise, if the inserted-into files weren't changed
+    since, only the parts whose fields changed are inserted.
+
+    Files in the backup_record list aren't backed up again (see
+    insert_part_fields()).
+
+    Returns the manifest of this run.
+    """
+
+    # If extracting from or inserting into a single file, make a one-entry list.
+    if type(extract_filenames) == str:
+        extract_filenames = [extract_filenames]
+    if type(insert_filenames) == str:
+        insert_filenames = [insert_filenames]
+
+    # Only use the manifest of the last run if it was done with the same files and options.
+    options = {
+        "extract": list(extract_filenames),
+        "insert": list(insert_filenames),
+        "inc_field_names": list(inc_field_names or []),
+        "exc_field_names": list(exc_field_names or []),
+        "recurse": recurse,
+        "group_components": group_components,
+        "no_range": no_range,
+    }
+    if manifest is not None and manifest.get("options") != options:
+        manifest = None
+    targets_unchanged = manifest is not None and files_unchanged(manifest["targets"])
+    if targets_unchanged and files_unchanged(manifest["inputs"]):
+        logger.log(DEBUG_OVERVIEW, "Nothing changed since the last run.")
+        return manifest
 
     # Extract a dictionary of part field values from a set of files.
+    opened_files.clear()
     part_fields_dict = extract_part_fields(
-        extract_filenames, inc_field_names, exc_field_names, recurse
+        extract_filenames, inc_field_names, exc_field_names, recurse, jobs
     )
-
-    clean_part_fields(part_fields_dict)
+    input_hashes = file_hashes(opened_files)
+
+    with stats.phase("clean"):
+        clean_part_fields(part_fields_dict)
+
+    # If the files being inserted into still hold the fields from the last
+    # run, then only the parts whose fields changed need to be inserted.
+    insert_fields_dict = part_fields_dict
+    if targets_unchanged and part_fields_dict:
+        changed_refs = changed_parts(part_fields_dict, manifest["parts"])
+        logger.log(
+            DEBUG_OVERVIEW,
+            "{} of {} parts changed since the last run.".format(
+                len(changed_refs), len(part_fields_dict)
+            ),
+        )
+        insert_fields_dict = PartTable()
+        for ref in changed_refs:
+            insert_fields_dict[ref] = part_fields_dict[ref]
 
     # Insert entries from the dictionary into these files.
-    insert_part_fields(
-        part_fields_dict, insert_filenames, recurse, group_components, backup, no_range
-    )
+    opened_files.clear()
+    if insert_fields_dict is part_fields_dict or insert_fields_dict:
+        insert_part_fields(
+            insert_fields_dict,
+            insert_filenames,
+            recurse,
+            group_components,
+            backup,
+            no_range,
+            jobs,
+            backup_record,
+        )
+        target_files = opened_files.union(insert_filenames)
+    else:
+        target_files = manifest["targets"]  # Nothing inserted, so nothing changed.
+
+    return {
+        "options": options,
+        "inputs": input_hashes,
+        "parts": part_hashes(part_fields_dict or {}),
+        "targets": file_hashes(target_files),
+    }
+
+
+def kifield(
+    extract_filenames,
+    insert_filenames,
+    inc_field_names=None,
+    exc_field_names=None,
+    recurse=False,
+    group_components=False,
+    backup=True,
+    no_range=False,
+    jobs=1,
+    manifest_filename=None,
+    progress=None,
+    cancel=None,
+):
+    """Extract fields from a set of files and insert them into another set of files.
+
+    Files are processed by jobs worker processes if jobs is more than 1
+    (0 means one per CPU).
+
+    If a manifest file is given, the run is recorded in it and the record
+    of the last run is used to skip whatever hasn't changed since then.
+
+    If a progress callback is given, it's called with a Progress object as
+    files and sheets are done. If a cancel flag (like a threading.Event) is
+    given, setting it stops the run with a RunCancelled exception the next
+    time a file is done.
+    """
+
+    manifest = None
+    if manifest_filename:
+        manifest = load_manifest(manifest_filename)
+
+    run_progress.attach(progress, cancel)
+    try:
+        manifest = sync_part_fields(
+            extract_filenames,
+            insert_filenames,
+            inc_field_names,
+            exc_field_names,
+            recurse,
+            group_components,
+            backup,
+            no_range,
+            jobs,
+            manifest,
+        )
+    finally:
+        run_progress.detach()
+
+    if manifest_filename:
+        save_manifest(manifest_filename, manifest)
+
+
+def watch(
+    extract_filenames,
+    insert_filenames,
+    inc_field_names=None,
+    exc_field_names=None,
+    recurse=False,
+    group_components=False,
+    backup=True,
+    no_range=False,
+    jobs=1,
+    manifest_filename=None,
+    interval=WATCH_INTERVAL,
+    progress=None,
+    cancel=None,
+):
+    """Keep inserting fields extracted from a set of files into another set of files whenever they change.
+
+    The files are polled every interval seconds. Parsed schematics and
+    libraries are kept in memory between runs, and only the parts whose
+    fields changed are inserted. Each file is backed up (if backup is True)
+    only the first time it's changed, not on every run. Stops on a keyboard
+    interrupt, or with a RunCancelled exception when the cancel flag is set.
+    The progress of each run is reported to the progress callback.
+    """
+
+    backup_record = []  # Files backed up during this session.
+    manifest = None
+    if manifest_filename:
+        manifest = load_manifest(manifest_filename)
+
+    parse_cache.enabled = True
+    run_progress.attach(progress, cancel)
+    try:
+        while True:
+            start = time.time()
+            try:
+                manifest = sync_part_fields(
+                    extract_filenames,
+                    insert_filenames,
+                    inc_field_names,
+                    exc_field_names,
+                    recurse,
+                    group_components,
+                    backup,
+                    no_range,
+                    jobs,
+                    manifest,
+                    backup_record,
+                )
+            except RunCancelled:
+                raise
+            except Exception as e:
+                # Keep watching. (A file may have been caught half-written.)
+                logger.error("Unable to sync fields: {}".format(e))
+            else:
+                logger.log(
+                    DEBUG_OVERVIEW,
+                    "Synced fields in {:.3f} s.".format(time.time() - start),
+                )
+                if manifest_filename:
+                    save_manifest(manifest_filename, manifest)
+
+            # Wait until a file changes and then stops changing.
+            watched_files = set(extract_filenames) | set(insert_filenames)
+            if manifest is not None:
+                watched_files.update(manifest["inputs"], manifest["targets"])
+            watched_files = sorted(watched_files)
+            signatures = file_signatures(watched_files)
+            while True:
+                time.sleep(interval)
+                run_progress.check_cancelled()
+                new_signatures = file_signatures(watched_files)
+                if new_signatures != signatures:
+                    signatures = new_signatures
+                    break
+            while True:
+                time.sleep(interval)
+                run_progress.check_cancelled()
+                new_signatures = file_signatures(watched_files)
+                if new_signatures == signatures:
+                    break
+                signatures = new_signatures
+
+    except KeyboardInterrupt:
+        pass
+
+    finally:
+        run_progress.detach()
+        parse_cache.enabled = False
+        parse_cache.clear()
@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+
+# MIT License / Copyright (c) 2021 by Dave Vandenbout.
+
+"""
+Manifests that record what a run of KiField read and wrote so the next run
+can skip whatever hasn't changed.
+"""
+
+import hashlib
+import io
+import json
+
+# Bump this if the manifest contents change so old manifests are ignored.
+MANIFEST_VERSION = 1
+
+
+def file_hash(filename):
+    """Return a hash of the contents of a file.
+
+    Args:
+        filename (string): File to hash.
+
+    Returns:
+        string: Hex digest of the file contents, or None if it can't be read.
+    """
+
+    digest = hashlib.sha1()
+    try:
+        with io.open(filename, "rb") as fp:
+            for block in iter(lambda: fp.read(1 << 16), b""):
+                digest.update(block)
+    except (IOError, OSError):
+        return None
+    return digest.hexdigest()
+
+
+def file_hashes(filenames):
+    """Return a dict of the hash of each file keyed by file name."""
+    return {f: file_hash(f) for f in filenames}
+
+
+def part_hash(fields):
+    """Return a hash of the field names and values of a part."""
+    fields_json = json.dumps(dict(fields.items()), sort_keys=True, default=repr)
+    return hashlib.sha1(fields_json.encode("utf-8")).hexdigest()
+
+
+def part_hashes(part_fields_dict):
+    """Return a dict of the hash of each part's fields keyed by part reference."""
+    return {ref: part_hash(fields) for ref, fields in part_fields_dict.items()}
+
+
+def files_unchanged(hashes):
+    """Return True if every file still has the hash it had when it was recorded."""
+    return all(file_hash(f) == h for f, h in hashes.items())
+
+
+def changed_parts(part_fields_dict, hashes):
+    """Return the references of parts whose fields are new or different from their recorded hashes.
+
+    Args:
+        part_fields_dict (dict): Part fields keyed by part reference.
+        hashes (dict): Recorded hash of each part's fields.
+
+    Returns:
+        list: References of the changed parts in the same order as part_fields_dict.
+    """
+
+    return [
+        ref
+        for ref, fields in part_fields_dict.items()
+        if hashes.get(ref) != part_hash(fields)
+    ]
+
+
+def load_manifest(filename):
+    """Return the manifest stored in a file, or None if there isn't a usable one."""
+
+    try:
+        with io.open(filename, "r", encoding="utf-8") as fp:
+            manifest = json.load(fp)
+    except (IOError, OSError, ValueError):
+        return None
+    if not isinstance(manifest, dict) or manifest.get("version") != MANIFEST_VERSION:
+        return None
+    return manifest
+
+
+def save_manifest(filename, manifest):
+    """Store a manifest in a file."""
+
+    manifest = dict(manifest, version=MANIFEST_VERSION)
+    with io.open(filename, "w", encoding="utf-8") as fp:
+        fp.write(json.dumps(manifest, indent=1, sort_keys=True, ensure_ascii=False))
@@ -0,0 +1,270 @@
+# -*- coding: utf-8 -*-
+
+# MIT License / Copyright (c) 2021 by Dave Vandenbout.
+
+"""
+Measuring the memory allocated in each phase of a KiField run with tracemalloc.
+"""
+
+import io
+import json
+
+# Number of files listed under each phase and allocation sites in the report.
+REPORT_FILES = 5
+REPORT_SITES = 10
+
+# Memory in use at the end of a phase has to grow by this factor before the
+# allocation sites are looked at again.
+SITES_GROWTH = 1.1
+
+MB = 1024.0 * 1024.0
+
+
+class MemStats(object):
+    """
+    Peak and retained memory of each phase of a run (for each file) and the
+    sites that had allocated the most memory at the end of the phase that
+    left the most memory in use. (The sites aren't looked at during a phase,
+    so memory that a phase frees before it ends never shows up in them.)
+
+    The peak of a phase is the most memory in use while it ran, and its
+    retained memory is the memory still in use when it ended, both over the
+    memory in use when it started. Unlike the times in Stats, the memory of
+    a phase includes the phases nested inside it. The memory is traced with
+    tracemalloc while enabled is True and start() has been called.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.clear()
+
+    def clear(self):
+        """Forget everything recorded so far."""
+        self.memory = {}  # [calls, peak, retained] keyed by (phase, file).
+        self.sites = []  # (site, size, blocks) of the largest allocations.
+        self.peak = 0
+        self.retained = 0
+        self._stack = []  # [memory at start, peak so far] of each phase in progress.
+        self._sites_size = 0
+        self._start = 0
+        self._tracing = False
+
+    def start(self):
+        """Start tracing memory allocations for the run (if they aren't already)."""
+
+        import tracemalloc
+
+        self._tracing = not tracemalloc.is_tracing()
+        if self._tracing:
+            tracemalloc.start()
+        self._start = tracemalloc.get_traced_memory()[0]
+
+    def stop(self):
+        """Stop tracing memory allocations (if start() began tracing them)."""
+
+        import tracemalloc
+
+        current, peak = tracemalloc.get_traced_memory()
+        self.peak = max(self.peak, peak - self._start)
+        self.retained = current - self._start
+        if self._tracing:
+            tracemalloc.stop()
+            self._tracing = False
+
+    def start_phase(self):
+        """Start measuring the memory of a phase."""
+
+        import tracemalloc
+
+        current, peak = tracemalloc.get_traced_memory()
+        # The peak is about to be reset, so remember it for the run and the enclosing phase.
+        self.peak = max(self.peak, peak - self._start)
+        if self._stack:
+            self._stack[-1][1] = max(self._stack[-1][1], peak)
+        try:
+            tracemalloc.reset_peak()
+        except AttributeError:
+            pass  # Before Python 3.9, so the peak of a phase can include earlier peaks.
+        self._stack.append([current, current])
+
+    def end_phase(self, key):
+        """Record the memory of a phase (keyed by (phase, file)) when it ends."""
+
+        import tracemalloc
+
+        current, peak = tracemalloc.get_traced_memory()
+        start, peak_so_far = self._stack.pop()
+        peak = max(peak, peak_so_far)
+        if self._stack:
+            self._stack[-1][1] = max(self._stack[-1][1], peak)
+        self.peak = max(self.peak, peak - self._start)
+        self.add_memory(key, peak - start, current - start)
+        if current > self._sites_size * SITES_GROWTH:
+            self._record_sites(tracemalloc)
+            self._sites_size = current
+            try:
+                # Don't count the memory used to find the sites in any peaks.
+                tracemalloc.reset_peak()
+            except AttributeError:
+                pass
+
+    def _record_sites(self, tracemalloc):
+        """Record the sites with the most memory allocated right now."""
+
+        snapshot = tracemalloc.take_snapshot().filter_traces(
+            [
+                tracemalloc.Filter(False, tracemalloc.__file__),
+                tracemalloc.Filter(False, __file__),
+            ]
+        )
+        self.sites = [
+            (
+                "{}:{}".format(stat.traceback[0].filename, stat.traceback[0].lineno),
+                stat.size,
+                stat.count,
+            )
+            for stat in snapshot.statistics("lineno")[:REPORT_SITES]
+        ]
+
+    def add_memory(self, key, peak, retained, calls=1):
+        """Add the memory of some calls to a (phase, file)."""
+        try:
+            memory = self.memory[key]
+        except KeyError:
+            memory = self.memory[key] = [0, 0, 0]
+        memory[0] += calls
+        memory[1] = max(memory[1], peak)
+        memory[2] += retained
+
+    def snapshot(self):
+        """Return what's been recorded in a form that can be pickled and passed to merge()."""
+        return dict(self.memory), list(self.sites), self.peak
+
+    def merge(self, snapshot):
+        """Add what was recorded somewhere else (like a worker process) to these stats.
+
+        The peaks and allocation sites are the largest of any one process.
+        """
+
+        memory, sites, peak = snapshot
+        for key, (calls, phase_peak, retained) in memory.items():
+            self.add_memory(key, phase_peak, retained, calls)
+        site_sizes = {site[0]: site for site in self.sites}
+        for site in sites:
+            if site[1] > site_sizes.get(site[0], (None, -1))[1]:
+                site_sizes[site[0]] = site
+        self.sites = sorted(site_sizes.values(), key=lambda s: -s[1])[:REPORT_SITES]
+        self.peak = max(self.peak, peak)
+
+    def summary(self):
+        """Return the recorded memory stats as a dict that can be stored as JSON.
+
+        Returns:
+            dict: Peak and retained bytes of the run, a list of phases (each
+                with its number of calls, peak and retained bytes, and the
+                same for each file the phase worked on), and the allocation
+                sites with the most bytes at the end of the phase that left
+                the most memory in use.
+        """
+
+        from .stats import PHASES
+
+        phases = {}
+        for (name, filename), (calls, peak, retained) in self.memory.items():
+            phase = phases.setdefault(
+                name, {"phase": name, "calls": 0, "peak": 0, "retained": 0, "files": []}
+            )
+            phase["calls"] += calls
+            phase["peak"] = max(phase["peak"], peak)
+            phase["retained"] += retained
+            if filename is not None:
+                phase["files"].append(
+                    {
+                        "file": filename,
+                        "calls": calls,
+                        "peak": peak,
+                        "retained": retained,
+                    }
+                )
+        for phase in phases.values():
+            phase["files"].sort(key=lambda f: -f["peak"])
+
+        order = {name: i for i, name in enumerate(PHASES)}
+        return {
+            "peak": self.peak,
+            "retained": self.retained,
+            "phases": sorted(
+                phases.values(),
+                key=lambda p: (order.get(p["phase"], len(order)), p["phase"]),
+            ),
+            "sites": [
+                {"site": site, "size": size, "blocks": blocks}
+                for site, size, blocks in self.sites
+            ],
+        }
+
+    def report(self):
+        """Return a table of the recorded memory stats."""
+        return format_report(self.summary())
+
+    def save(self, filename):
+        """Store the recorded memory stats in a JSON file."""
+        save_summary(filename, self.summary())
+
+
+def format_report(summary):
+    """Return a table of the memory stats in a summary from MemStats.summary()."""
+
+    row = "{:<40} {:>7} {:>10.2f} {:>13.2f}"
+    lines = [
+        "{:<40} {:>7} {:>10} {:>13}".format(
+            "Phase", "Calls", "Peak (MB)", "Retained (MB)"
+        )
+    ]
+    for phase in summary["phases"]:
+        lines.append(
+            row.format(
+                phase["phase"],
+                phase["calls"],
+                phase["peak"] / MB,
+                phase["retained"] / MB,
+            )
+        )
+        for f in phase["files"][:REPORT_FILES]:
+            lines.append(
+                row.format(
+                    "  " + f["file"][-38:],
+                    f["calls"],
+                    f["peak"] / MB,
+                    f["retained"] / MB,
+                )
+            )
+        if len(phase["files"]) > REPORT_FILES:
+            lines.append(
+                "  ... and {} more files".format(len(phase["files"]) - REPORT_FILES)
+            )
+    lines.append(
+        row.format("Total", "", summary["peak"] / MB, summary["retained"] / MB)
+    )
+    if summary["sites"]:
+        lines.append("")
+        lines.append(
+            "{:<52} {:>10} {:>10}".format("Allocation site", "Size (MB)", "Blocks")
+        )
+        for site in summary["sites"]:
+            lines.append(
+                "{:<52} {:>10.2f} {:>10}".format(
+                    site["site"][-52:], site["size"] / MB, site["blocks"]
+                )
+            )
+    return "\n".join(lines)
+
+
+def save_summary(filename, summary):
+    """Store a summary from MemStats.summary() in a JSON file."""
+    with io.open(filename, "w", encoding="utf-8") as fp:
+        fp.write(json.dumps(summary, indent=1, ensure_ascii=False))
+
+
+# Memory stats of the current run.
+memstats = MemStats()
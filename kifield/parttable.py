@@ -0,0 +1,268 @@
+# -*- coding: utf-8 -*-
+
+# MIT License / Copyright (c) 2021 by Dave Vandenbout.
+
+"""
+Compact storage for the part fields extracted from KiCad files and spreadsheets.
+"""
+
+import sys
+
+try:
+    from collections.abc import MutableMapping
+except ImportError:
+    # Python 2 keeps these in collections.
+    from collections import MutableMapping
+
+if sys.version_info >= (3, 7):
+    _RowDict = dict  # Keeps the order the parts were added.
+else:
+    from collections import OrderedDict as _RowDict
+
+if sys.version_info.major > 2:
+    intern = sys.intern
+    _POOLED_TYPES = (str,)
+else:
+    _POOLED_TYPES = (str, unicode)
+
+
+def intern_name(name):
+    """Return the interned version of a field name (if it's a string)."""
+    try:
+        return intern(name)
+    except TypeError:
+        # Not a string (or a Python 2 unicode string), so it can't be interned.
+        return name
+
+
+class PartRow(MutableMapping):
+    """
+    A dict-like view of the fields of one part in a PartTable.
+
+    Rows are never changed in place: changing a field stores a new row in
+    the table, so rows can be shared by parts with the same fields.
+    """
+
+    __slots__ = ("_table", "_ref")
+
+    def __init__(self, table, ref):
+        self._table = table
+        self._ref = ref
+
+    @property
+    def _row(self):
+        # (value, value, ..., field names)
+        return self._table._rows[self._ref]
+
+    # The most used methods look the row up directly rather than through _row.
+
+    def __getitem__(self, field_name):
+        row = self._table._rows[self._ref]
+        try:
+            return row[row[-1].index(field_name)]
+        except ValueError:
+            raise KeyError(field_name)
+
+    def get(self, field_name, default=None):
+        row = self._table._rows[self._ref]
+        names = row[-1]
+        if field_name in names:
+            return row[names.index(field_name)]
+        return default
+
+    def __contains__(self, field_name):
+        return field_name in self._table._rows[self._ref][-1]
+
+    def __setitem__(self, field_name, value):
+        row = self._row
+        names = row[-1]
+        if field_name in names:
+            i = names.index(field_name)
+            if row[i] is value:
+                return
+            row = row[:i] + (value,) + row[i + 1 :]
+        else:
+            row = row[:-1] + (value, self._table._shape(names + (field_name,)))
+        self._table._rows[self._ref] = row
+
+    def __delitem__(self, field_name):
+        row = self._row
+        names = row[-1]
+        try:
+            i = names.index(field_name)
+        except ValueError:
+            raise KeyError(field_name)
+        shape = self._table._shape(names[:i] + names[i + 1 :])
+        self._table._rows[self._ref] = row[:i] + row[i + 1 : -1] + (shape,)
+
+    def update(self, *args, **kwargs):
+        # Make a single new row instead of one for each field.
+        fields = self.copy()
+        fields.update(*args, **kwargs)
+        self._table._rows[self._ref] = self._table._make_row(fields, pool=False)
+
+    def __iter__(self):
+        return iter(self._row[-1])
+
+    def __len__(self):
+        return len(self._row) - 1
+
+    def items(self):
+        row = self._table._rows[self._ref]
+        return list(zip(row[-1], row))
+
+    def values(self):
+        return list(self._row[:-1])
+
+    def copy(self):
+        """Return the part fields as a plain dict."""
+        row = self._row
+        return dict(zip(row[-1], row))
+
+    def __copy__(self):
+        return self.copy()
+
+    def __deepcopy__(self, memo):
+        # Field values are immutable, so a copy of the fields is a deep copy.
+        return self.copy()
+
+    def __repr__(self):
+        return repr(self.copy())
+
+
+class PartTable(MutableMapping):
+    """
+    A table of part fields keyed by part reference.
+
+    Each part is stored as a tuple of its field values ending with a tuple
+    of its field names. Parts with the same field names share the tuple of
+    names (and the names are interned), so parts don't each carry their own
+    dict of field names and a part only takes up space for the fields it
+    has. When whole parts are added (as the extraction functions do), their
+    string values are shared through a pool, and parts with exactly the
+    same fields share a single row until one of them is changed. The table
+    and its rows behave like the {ref: {field: value}} dicts used throughout
+    KiField.
+    """
+
+    def __init__(self, part_fields=None):
+        self._rows = _RowDict()  # Row for each part reference.
+        self._shapes = {}  # Shared tuple for each set of field names.
+        self._pool = {}  # Pool of shared string values.
+        self._row_pool = {}  # Pool of shared rows.
+        if part_fields is not None:
+            self.update(part_fields)
+
+    def _shape(self, names):
+        """Return the shared tuple for a tuple of field names."""
+        try:
+            return self._shapes[names]
+        except KeyError:
+            shape = tuple(intern_name(name) for name in names)
+            self._shapes[shape] = shape
+            return shape
+
+    def _make_row(self, fields, pool=True):
+        """Return a row for a dict of fields, sharing its values and the row itself if pool is True."""
+        shape = self._shape(tuple(fields))
+        if not pool:
+            return tuple(fields.values()) + (shape,)
+        values = self._pool
+        row = []
+        shareable = True
+        for value in fields.values():
+            if isinstance(value, _POOLED_TYPES):
+                value = values.setdefault(value, value)
+            else:
+                # Equal rows could still hold different types (like 1 and 1.0).
+                shareable = False
+            row.append(value)
+        row.append(shape)
+        row = tuple(row)
+        if shareable:
+            row = self._row_pool.setdefault(row, row)
+        return row
+
+    def __getitem__(self, ref):
+        if ref not in self._rows:
+            raise KeyError(ref)
+        return PartRow(self, ref)
+
+    def __setitem__(self, ref, fields):
+        self._rows[ref] = self._make_row(fields)
+
+    def __delitem__(self, ref):
+        del self._rows[ref]
+
+    def __iter__(self):
+        return iter(self._rows)
+
+    def __len__(self):
+        return len(self._rows)
+
+    def __contains__(self, ref):
+        return ref in self._rows
+
+    def items(self):
+        return [(ref, PartRow(self, ref)) for ref in self._rows]
+
+    def values(self):
+        return [PartRow(self, ref) for ref in self._rows]
+
+    def field_names(self):
+        """Return a list of the field names used by any part in the table."""
+        field_names = _RowDict()
+        shapes = set()
+        for row in self._rows.values():
+            names = row[-1]
+            if id(names) not in shapes:
+                shapes.add(id(names))
+                for field_name in names:
+                    field_names[field_name] = None
+        return list(field_names)
+
+    def column(self, field_name):
+        """Return a dict of the values of a field keyed by part reference."""
+        return {
+            ref: row[row[-1].index(field_name)]
+            for ref, row in self._rows.items()
+            if field_name in row[-1]
+        }
+
+    def map_values(self, func):
+        """Replace every field value in the table with func(value).
+
+        The values of a row shared by several parts are only mapped once.
+        """
+
+        mapped = {}  # Old and new row keyed by the id of the old row.
+        rows = self._rows
+        for ref, row in rows.items():
+            try:
+                rows[ref] = mapped[id(row)][1]
+            except KeyError:
+                new_row = tuple(map(func, row[:-1])) + row[-1:]
+                mapped[id(row)] = (row, new_row)
+                rows[ref] = new_row
+        self._row_pool = {}  # The old rows won't be needed in the pool anymore.
+
+    def value_stats(self):
+        """Return the number of field values, how many are distinct objects, and the bytes saved by sharing them."""
+        num_values = 0
+        sizes = {}  # Size of each distinct value object keyed by its id.
+        saved = 0
+        for row in self._rows.values():
+            for value in row[:-1]:
+                num_values += 1
+                try:
+                    saved += sizes[id(value)]
+                except KeyError:
+                    sizes[id(value)] = sys.getsizeof(value)
+        return num_values, len(sizes), saved
+
+    def to_dict(self):
+        """Return the table as a plain dict of part field dicts."""
+        return {ref: dict(zip(row[-1], row)) for ref, row in self._rows.items()}
+
+    def __repr__(self):
+        return "{}({!r})".format(self.__class__.__name__, self.to_dict())
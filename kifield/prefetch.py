@@ -0,0 +1,172 @@
+# -*- coding: utf-8 -*-
+
+# MIT License / Copyright (c) 2021 by Dave Vandenbout.
+
+"""
+Reading input files in the background while the previous file is being parsed.
+"""
+
+import io
+import os
+import time
+
+try:
+    from concurrent.futures import ThreadPoolExecutor
+except ImportError:
+    # Python 2 without the futures backport, so files are only read when opened.
+    ThreadPoolExecutor = None
+
+from .stats import stats
+
+# Number of files read ahead of the one being parsed.
+PREFETCH_AHEAD = 2
+
+# Prefetcher used by open_input() (or None).
+_prefetcher = None
+
+# Stores the names of the files opened by open_input().
+opened_files = set()
+
+
+def read_file_stat(filename):
+    """Return the size and modification time of a file."""
+    stat = os.stat(filename)
+    return stat.st_size, stat.st_mtime
+
+
+def read_file(filename):
+    """Read the contents of a file.
+
+    Args:
+        filename (string): File to read.
+
+    Returns:
+        tuple: Size and modification time of the file, its contents as bytes,
+            and the number of seconds taken to read it.
+    """
+
+    start = time.time()
+    stat = read_file_stat(filename)
+    with io.open(filename, "rb") as fp:
+        data = fp.read()
+    return stat, data, time.time() - start
+
+
+class Prefetcher(object):
+    """
+    Reads upcoming input files in background threads.
+
+    The files are read in the order they'll be opened, staying a few files
+    ahead of the one being parsed. While the prefetcher is active (as a
+    context manager), open_input() serves a file from the contents read in
+    the background. A file that changed after it was read is read again.
+    Each file has to be released when it's done (whether it was opened or
+    not) so the prefetcher can move on to the next files.
+    """
+
+    def __init__(self, filenames, ahead=PREFETCH_AHEAD):
+        self.pending = list(filenames)  # Files not read yet, in order of use.
+        self.ahead = ahead
+        self.reads = {}  # Read in progress for each file name.
+        self.executor = None
+        self.previous = None
+        self.pid = os.getpid()
+        self.num_files = 0  # Files served from the background reads.
+        self.num_bytes = 0
+        self.read_time = 0.0  # Seconds spent reading in the background.
+        self.wait_time = 0.0  # Seconds spent waiting for background reads.
+
+    def __enter__(self):
+        global _prefetcher
+        if ThreadPoolExecutor is not None and len(self.pending) > 1:
+            self.executor = ThreadPoolExecutor(max_workers=self.ahead)
+            self._read_ahead()
+        self.previous, _prefetcher = _prefetcher, self
+        return self
+
+    def __exit__(self, *exc_info):
+        global _prefetcher
+        _prefetcher = self.previous
+        for read in self.reads.values():
+            read.cancel()
+        self.reads = {}
+        if self.executor is not None:
+            self.executor.shutdown(wait=True)
+            self.executor = None
+
+    def _read_ahead(self):
+        """Start reading more files until enough are in progress."""
+        while self.executor is not None and self.pending:
+            if len(self.reads) >= self.ahead:
+                break
+            filename = self.pending.pop(0)
+            if filename not in self.reads:
+                self.reads[filename] = self.executor.submit(read_file, filename)
+
+    def release(self, filename):
+        """Drop the background read of a file that's done and start reading the next files."""
+        read = self.reads.pop(filename, None)
+        if read is not None:
+            read.cancel()
+        if filename in self.pending:
+            self.pending.remove(filename)
+        self._read_ahead()
+
+    def open(self, filename, mode="r"):
+        """Open a file, using its contents from the background read if there is one."""
+
+        read = self.reads.pop(filename, None)
+        if read is None or os.getpid() != self.pid:
+            # Not prefetched (or in a forked process that has no reader threads).
+            return open(filename, mode)
+
+        start = time.time()
+        try:
+            stat, data, read_time = read.result()
+        except (IOError, OSError):
+            data = None
+        self.wait_time += time.time() - start
+        self._read_ahead()
+
+        # Let open() raise the usual error if the file couldn't be read, and
+        # don't use stale contents if the file has been written since.
+        try:
+            if data is None or stat != read_file_stat(filename):
+                return open(filename, mode)
+        except (IOError, OSError):
+            return open(filename, mode)
+
+        self.num_files += 1
+        self.num_bytes += len(data)
+        self.read_time += read_time
+        if "b" in mode:
+            return io.BytesIO(data)
+        # Decode the same way as open() does for text files.
+        return io.TextIOWrapper(io.BytesIO(data))
+
+
+def open_input(filename, mode="r"):
+    """Open a file for reading, getting its contents from the active Prefetcher if possible.
+
+    Args:
+        filename (string): File to open.
+        mode (string, optional): "r" for text or "rb" for bytes. Defaults to "r".
+
+    Returns:
+        file: File-like object holding the file contents.
+    """
+
+    opened_files.add(filename)
+    if not stats.enabled:
+        if _prefetcher is None:
+            return open(filename, mode)
+        return _prefetcher.open(filename, mode)
+
+    # Read the whole file now so reading is timed apart from parsing.
+    with stats.phase("read", filename):
+        with (open if _prefetcher is None else _prefetcher.open)(filename, mode) as fp:
+            data = fp.read()
+    stats.count("bytes read", os.path.getsize(filename))
+    if isinstance(data, bytes):
+        return io.BytesIO(data)
+    return io.StringIO(data)
@@ -0,0 +1,182 @@
+# -*- coding: utf-8 -*-
+
+# MIT License / Copyright (c) 2021 by Dave Vandenbout.
+
+"""
+Profiling a KiField run, or just chosen phases of it.
+
+Two kinds of profile can be collected: cProfile statistics (which can be
+read with pstats or snakeviz) and stacks sampled from the running code at
+regular intervals, which are stored as collapsed stacks for flamegraph.pl,
+speedscope or similar tools.
+"""
+
+import io
+import os
+import sys
+import threading
+
+# Seconds between samples of the stack.
+SAMPLE_INTERVAL = 0.001
+
+
+class _ProfileStats(object):
+    """cProfile statistics (from another process) in a form pstats.Stats can load."""
+
+    def __init__(self, stats):
+        self.stats = stats
+
+    def create_stats(self):
+        pass
+
+
+def frame_label(frame):
+    """Return the label of a stack frame in a collapsed stack."""
+    code = frame.f_code
+    return "{} ({}:{})".format(
+        code.co_name, os.path.basename(code.co_filename), code.co_firstlineno
+    )
+
+
+class Profiler(object):
+    """
+    Collects a profile of the whole run or of the chosen phases of it.
+
+    Set deterministic to collect cProfile statistics, sampling to collect
+    sampled stacks, and phases to the names of the phases (see stats.PHASES)
+    to profile instead of the whole run. Then collect the profile with
+    begin() and end(). Nothing is collected unless enabled is True.
+    """
+
+    def __init__(self):
+        self.deterministic = False  # Collect cProfile statistics.
+        self.sampling = False  # Collect sampled stacks.
+        self.phases = None  # Names of the phases to profile (or None for all).
+        self.interval = SAMPLE_INTERVAL
+        self._profile = None
+        self._depth = 0
+        self.clear()
+
+    @property
+    def enabled(self):
+        return self.deterministic or self.sampling
+
+    def settings(self):
+        """Return the settings of the profiler so they can be passed to configure() in a worker process."""
+        return self.deterministic, self.sampling, self.phases, self.interval
+
+    def configure(self, settings):
+        """Use the settings of the profiler from settings()."""
+        self.deterministic, self.sampling, self.phases, self.interval = settings
+
+    def clear(self):
+        """Forget the profile collected so far."""
+        if self._depth and self._profile is not None:
+            # Still running in a worker process forked during a profiled run.
+            self._profile.disable()
+        self.profile_stats = []  # cProfile statistics of each run (from any process).
+        self.samples = {}  # Number of samples of each collapsed stack.
+        self._profile = None
+        self._depth = 0
+        self._sampler = None
+        self._stop_sampling = None
+
+    def begin(self):
+        """Begin a run, profiling all of it unless phases are chosen."""
+
+        if not self.enabled:
+            return
+        if self.deterministic:
+            import cProfile
+
+            self._profile = cProfile.Profile()
+        if self.sampling:
+            self._stop_sampling = threading.Event()
+            self._sampler = threading.Thread(
+                target=self._sample, args=(threading.current_thread().ident,)
+            )
+            self._sampler.daemon = True
+            self._sampler.start()
+        if self.phases is None:
+            self.start()
+
+    def end(self):
+        """End a run and gather what was profiled."""
+
+        if not self.enabled:
+            return
+        if self.phases is None:
+            self.stop()
+        if self._sampler is not None:
+            self._stop_sampling.set()
+            self._sampler.join()
+            self._sampler = None
+        if self._profile is not None:
+            self._profile.create_stats()
+            self.profile_stats.append(self._profile.stats)
+            self._profile = None
+
+    def start(self):
+        """Start profiling (unless it's already started by an enclosing phase)."""
+        self._depth += 1
+        if self._depth == 1 and self._profile is not None:
+            self._profile.enable()
+
+    def stop(self):
+        """Stop profiling (unless an enclosing phase is still being profiled)."""
+        self._depth -= 1
+        if self._depth == 0 and self._profile is not None:
+            self._profile.disable()
+
+    def profiles_phase(self, name):
+        """Return True if the phase with this name is to be profiled on its own."""
+        return self.phases is not None and name in self.phases and self.enabled
+
+    def _sample(self, thread_id):
+        """Sample the stack of a thread until told to stop."""
+
+        while not self._stop_sampling.wait(self.interval):
+            if not self._depth:
+                continue
+            frame = sys._current_frames().get(thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(frame_label(frame))
+                frame = frame.f_back
+            stack = ";".join(reversed(stack))
+            self.samples[stack] = self.samples.get(stack, 0) + 1
+
+    def snapshot(self):
+        """Return the collected profile in a form that can be pickled and passed to merge()."""
+        return list(self.profile_stats), dict(self.samples)
+
+    def merge(self, snapshot):
+        """Add the profile collected somewhere else (like a worker process) to this one."""
+        profile_stats, samples = snapshot
+        self.profile_stats.extend(profile_stats)
+        for stack, n in samples.items():
+            self.samples[stack] = self.samples.get(stack, 0) + n
+
+    def get_stats(self):
+        """Return the collected cProfile statistics as a pstats.Stats object."""
+
+        import pstats
+
+        profile_stats = pstats.Stats()
+        for stats in self.profile_stats:
+            profile_stats.add(_ProfileStats(stats))
+        return profile_stats
+
+    def save_pstats(self, filename):
+        """Store the collected cProfile statistics in a file that pstats can load."""
+        self.get_stats().dump_stats(filename)
+
+    def save_collapsed(self, filename):
+        """Store the sampled stacks in a file in the collapsed format of flamegraph.pl."""
+        with io.open(filename, "w", encoding="utf-8") as fp:
+            for stack, n in sorted(self.samples.items()):
+                fp.write("{} {}\n".format(stack, n))
+
+
+# Profiler of the current run.
+profiler = Profiler()
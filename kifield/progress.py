@@ -0,0 +1,210 @@
+# -*- coding: utf-8 -*-
+
+# MIT License / Copyright (c) 2021 by Dave Vandenbout.
+
+"""
+Reporting the progress of a KiField run and cancelling it.
+"""
+
+import os
+import sys
+import time
+
+
+class RunCancelled(Exception):
+    """Raised when a run is stopped by its cancellation flag."""
+
+    pass
+
+
+def file_size(filename):
+    """Return the size of a file (or 0 if it doesn't exist)."""
+    try:
+        return os.path.getsize(filename)
+    except (OSError, TypeError):
+        return 0
+
+
+class Progress(object):
+    """
+    Progress of the current stage ("extract" or "insert") of a run.
+
+    Each time a file or a sheet of a schematic hierarchy is done, the
+    callback is called with this object so it can report the files, sheets,
+    parts and bytes processed so far, along with the rates and the
+    estimated time left for the stage. It's called once more with finished
+    set to True when the stage ends.
+
+    If the cancel flag (anything with an is_set() method, like a
+    threading.Event) is set, the run stops with a RunCancelled exception
+    when the next file is done (or the next sheet while extracting, since
+    nothing has been written then). Files are never left half-written.
+    """
+
+    def __init__(self):
+        self.callback = None
+        self.cancel_flag = None
+        self.collecting = False
+        self.begin(None, [])
+
+    @property
+    def enabled(self):
+        return (
+            self.callback is not None or self.cancel_flag is not None or self.collecting
+        )
+
+    def attach(self, callback=None, cancel_flag=None):
+        """Report the progress of the run to a callback and stop the run when a flag is set."""
+        self.callback = callback
+        self.cancel_flag = cancel_flag
+        self.collecting = False
+
+    def collect(self):
+        """Count the sheets done in a worker process without reporting them.
+
+        The counts are sent back to the main process with snapshot() and
+        reported there with merge().
+        """
+        self.attach()
+        self.collecting = True
+        self.begin(None, [])
+
+    def detach(self):
+        """Stop reporting progress."""
+        self.attach()
+
+    def begin(self, stage, filenames):
+        """Start a stage of the run that processes a list of files."""
+        self.stage = stage
+        self.filename = None
+        self.files_total = len(filenames)
+        self.files_done = 0
+        self.sheets_done = 0
+        self.parts_done = 0
+        self.bytes_done = 0
+        self.finished = False
+        self.start = time.time()
+        self.notify()
+
+    def end(self):
+        """Finish the current stage of the run."""
+        self.finished = True
+        self.notify()
+
+    def file_done(self, filename, num_parts=0):
+        """Record that a file (with this many parts) is done."""
+        if not self.enabled:
+            return
+        self.filename = filename
+        self.files_done += 1
+        self.parts_done += num_parts
+        self.bytes_done += file_size(filename)
+        self.notify()
+        self.check_cancelled()
+
+    def sheet_done(self, filename):
+        """Record that a sub-sheet of a schematic hierarchy is done."""
+        if not self.enabled:
+            return
+        self.filename = filename
+        self.sheets_done += 1
+        self.bytes_done += file_size(filename)
+        self.notify()
+        if self.stage == "extract":
+            self.check_cancelled()
+
+    def snapshot(self):
+        """Return the sheets and bytes done so far."""
+        return self.sheets_done, self.bytes_done
+
+    def merge(self, counts):
+        """Add the sheets and bytes done in a worker process and report them."""
+        sheets_done, bytes_done = counts
+        if not self.enabled or not sheets_done:
+            return
+        self.sheets_done += sheets_done
+        self.bytes_done += bytes_done
+        self.notify()
+        if self.stage == "extract":
+            self.check_cancelled()
+
+    def notify(self):
+        if self.callback is not None and self.stage is not None:
+            self.callback(self)
+
+    def check_cancelled(self):
+        """Stop the run if it has been cancelled."""
+        if self.cancel_flag is not None and self.cancel_flag.is_set():
+            raise RunCancelled("Run cancelled after {}.".format(self.filename))
+
+    @property
+    def elapsed(self):
+        """Seconds since the stage began."""
+        return time.time() - self.start
+
+    @property
+    def parts_per_s(self):
+        return self.parts_done / max(self.elapsed, 1e-6)
+
+    @property
+    def mb_per_s(self):
+        return self.bytes_done / 1e6 / max(self.elapsed, 1e-6)
+
+    @property
+    def eta(self):
+        """Estimated seconds left in the stage (or None if there's no estimate yet)."""
+        if not self.files_done:
+            return None
+        return self.elapsed * (self.files_total - self.files_done) / self.files_done
+
+
+class ProgressBar(object):
+    """
+    Progress callback that shows a progress bar on a stream (stderr by default).
+
+    The bar is redrawn at most every interval seconds (and at the end of
+    each stage).
+    """
+
+    def __init__(self, stream=None, width=20, interval=0.1):
+        self.stream = stream or sys.stderr
+        self.width = width
+        self.interval = interval
+        self.last_draw = 0.0
+        self.last_len = 0
+
+    def __call__(self, progress):
+        now = time.time()
+        if not progress.finished and now - self.last_draw < self.interval:
+            return
+        self.last_draw = now
+
+        total = max(progress.files_total, 1)
+        filled = self.width * min(progress.files_done, total) // total
+        if progress.finished:
+            eta = "done in {:.1f} s".format(progress.elapsed)
+        elif progress.eta is None:
+            eta = "ETA ?"
+        else:
+            eta = "ETA {:.0f} s".format(progress.eta)
+        line = "{:<7} [{}{}] {}/{} files, {} sheets, {} parts ({:.0f} parts/s, {:.2f} MB/s) {}".format(
+            progress.stage,
+            "#" * filled,
+            "." * (self.width - filled),
+            progress.files_done,
+            progress.files_total,
+            progress.sheets_done,
+            progress.parts_done,
+            progress.parts_per_s,
+            progress.mb_per_s,
+            eta,
+        )
+        # Blank out whatever is left of a longer line drawn before.
+        padding = " " * max(0, self.last_len - len(line))
+        self.last_len = 0 if progress.finished else len(line)
+        self.stream.write("\r" + line + padding + ("\n" if progress.finished else ""))
+        self.stream.flush()
+
+
+# Progress of the current run.
+run_progress = Progress()
@@ -0,0 +1,284 @@
+# -*- coding: utf-8 -*-
+
+# MIT License / Copyright (c) 2021 by Dave Vandenbout.
+
+"""
+Encoding and decoding of part references like 'C1-C3, C7, C10-C13'.
+"""
+
+import re
+import sys
+
+try:
+    from functools import lru_cache
+except ImportError:
+    # Python 2 has no lru_cache, so just do without the caching.
+    def lru_cache(maxsize=128):
+        return lambda func: func
+
+
+if sys.version_info.major > 2:
+    # Python3 doesn't have basestring, so create one.
+    basestring = type("")
+
+
+# Patterns are compiled once here instead of on every call.
+_QUOTED_RE = re.compile(r"^['\"](.*)['\"]$")
+_UNQUOTE_RE = re.compile("^(['\"])(.*)\\1$")
+_SPLIT_RE = re.compile(",|;")
+_RANGE_RE = re.compile(
+    r"^\s*(?P<part_prefix>\D+)(?P<range_start>\d+)\s*[-:]\s*\1(?P<range_end>\d+)\s*$"
+)
+_REF_RE = re.compile(r"(?P<part_prefix>\D+)(?P<number>.+)")
+_DIGITS_RE = re.compile(r"(\d+)")
+
+# Number of distinct reference strings whose parsed form is cached.
+REF_CACHE_SIZE = 4096
+
+
+def quote(s):
+    """
+    Returns a quoted version of string 's' if that's not already the case
+    """
+
+    if s is None:
+        return s
+
+    if _QUOTED_RE.match(s) is not None:
+        return s
+    else:
+        return '"{}"'.format(s)
+
+
+def unquote(s):
+    """Remove any quote marks around a string.
+
+    Args:
+        s (string): Quoted or unquoted string.
+
+    Returns:
+        string: Unquoted string.
+    """
+
+    if not isinstance(s, basestring):
+        return s  # Not a string, so just return it.
+    try:
+        # This returns inner part of "..." or '...' strings.
+        return _UNQUOTE_RE.match(s).group(2)
+    except (IndexError, AttributeError):
+        # No surrounding quotes, so just return string.
+        return s
+
+
+def natural_sort_key(s):
+    """Return a sort key that orders strings like 'C2' before 'C10'.
+
+    Args:
+        s (string): String to sort.
+
+    Returns:
+        tuple: Alternating non-digit strings and integers.
+    """
+
+    return tuple(
+        int(t) if i % 2 else t for i, t in enumerate(_DIGITS_RE.split("{}".format(s)))
+    )
+
+
+class RefRange(object):
+    """
+    A lazy span of references like 'R1-R50000' that doesn't store each reference.
+    """
+
+    __slots__ = ("prefix", "start", "end")
+
+    def __init__(self, prefix, start, end):
+        self.prefix = prefix
+        self.start = start
+        self.end = end  # Inclusive.
+
+    def __len__(self):
+        return max(0, self.end - self.start + 1)
+
+    def __iter__(self):
+        prefix = self.prefix
+        for i in range(self.start, self.end + 1):
+            yield prefix + str(i)
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("RefRange index out of range")
+        return self.prefix + str(self.start + index)
+
+    def __contains__(self, ref):
+        if not isinstance(ref, basestring) or not ref.startswith(self.prefix):
+            return False
+        number = ref[len(self.prefix) :]
+        if not number.isdigit() or str(int(number)) != number:
+            return False
+        return self.start <= int(number) <= self.end
+
+    def __eq__(self, other):
+        return isinstance(other, RefRange) and (self.prefix, self.start, self.end) == (
+            other.prefix,
+            other.start,
+            other.end,
+        )
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash((self.prefix, self.start, self.end))
+
+    def __repr__(self):
+        return "RefRange({!r}, {}, {})".format(self.prefix, self.start, self.end)
+
+
+@lru_cache(maxsize=REF_CACHE_SIZE)
+def parse_refs(collapsed):
+    """Parse collapsed references like 'C1-C3,C7' into (RefRange('C',1,3), 'C7').
+
+    Ranges are kept as lazy RefRange objects so huge spans are cheap to parse and
+    to cache. Repeated strings are served from an LRU cache.
+
+    Args:
+        collapsed (string): String of collapsed references.
+
+    Returns:
+        tuple: Individual reference strings and RefRange objects.
+    """
+
+    if not isinstance(collapsed, basestring) or collapsed == "":
+        return ()
+
+    chunks = []
+    for r in _SPLIT_RE.split(collapsed):
+        mtch = _RANGE_RE.match(r)
+        if mtch is None:
+            chunks.append(r.strip())
+        else:
+            chunks.append(
+                RefRange(
+                    mtch.group("part_prefix"),
+                    int(mtch.group("range_start")),
+                    int(mtch.group("range_end")),
+                )
+            )
+    return tuple(chunks)
+
+
+def iter_refs(collapsed):
+    """Iterate over the individual references in collapsed references like 'C1-C3,C7'.
+
+    Args:
+        collapsed (string): String of collapsed references.
+
+    Returns:
+        iterator: Individual reference strings.
+    """
+
+    for chunk in parse_refs(collapsed):
+        if isinstance(chunk, RefRange):
+            for ref in chunk:
+                yield ref
+        else:
+            yield chunk
+
+
+def explode(collapsed):
+    """Explode collapsed references like 'C1-C3,C7,C10-C13' into [C1,C2,C3,C7,C10,C11,C12,C13].
+
+    Args:
+        collapsed (string): String of collapsed references.
+
+    Returns:
+        list: list of reference strings.
+    """
+
+    try:
+        return list(iter_refs(collapsed))
+    except TypeError:
+        # Unhashable, so it can't be a string of references.
+        return []
+
+
+def split_refs(individual_refs):
+    """Split references like [C3,C1,R2] into sorted (prefix, number) tuples like [(C,1),(C,3),(R,2)].
+
+    Args:
+        individual_refs (list): Uncollapsed references.
+
+    Returns:
+        list: Naturally-sorted (prefix, number) tuples. References without a prefix are dropped.
+    """
+
+    parts = []
+    for ref in individual_refs:
+        mtch = _REF_RE.match(ref)
+        if mtch is not None:
+            part_prefix = mtch.group("part_prefix")
+            number = mtch.group("number")
+            try:
+                number = int(number)
+            except ValueError:
+                pass
+            parts.append((part_prefix, number))
+
+    parts.sort(key=lambda part: (part[0], natural_sort_key(part[1])))
+    return parts
+
+
+def join_refs(individual_refs):
+    """Sort references like [C3,C1,C2] and join them into 'C1, C2, C3' without using ranges.
+
+    Args:
+        individual_refs (list): Uncollapsed references.
+
+    Returns:
+        string: Comma-separated references.
+    """
+
+    return ", ".join(
+        "{}{}".format(prefix, number).strip()
+        for prefix, number in split_refs(individual_refs)
+    )
+
+
+def collapse(individual_refs):
+    """Collapse references like [C1,C2,C3,C7,C10,C11,C12,C13] into 'C1-C3, C7, C10-C13'.
+
+    Args:
+        individual_refs (string): Uncollapsed references.
+
+    Returns:
+        string: Collapsed references.
+    """
+
+    # Gather runs of references having the same prefix and consecutive numbers.
+    groups = []
+    prev = None
+    for part in split_refs(individual_refs):
+        if (
+            prev is not None
+            and prev[0] == part[0]
+            and isinstance(prev[1], int)
+            and prev[1] + 1 == part[1]
+        ):
+            groups[-1].append(part)
+        else:
+            groups.append([part])
+        prev = part
+
+    # Runs of more than two references become ranges.
+    collapsed = []
+    for group in groups:
+        refs = ["{}{}".format(*part) for part in group]
+        if len(refs) > 2:
+            collapsed.append(refs[0] + "-" + refs[-1])
+        else:
+            collapsed.extend(refs)
+
+    return ", ".join(collapsed)
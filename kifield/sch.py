@@ -13,9 +13,13 @@ import shlex
 import sys
 from copy import deepcopy
 
-import sexpdata
-
 from .common import *
+from .prefetch import open_input
+from .progress import run_progress
+from .refs import quote, unquote
+from .trace import traced
+
+sexpdata = LazyModule("sexpdata")
 
 sch_field_id_to_name = {
     "0": "reference",
@@ -206,7 +210,7 @@ class Schematic(object):
     """
 
     def __init__(self, filename):
-        f = open(filename)
+        f = open_input(filename)
         self.filename = filename
         self.header = f.readline()
         self.libs = []
@@ -284,10 +288,13 @@ class Schematic(object):
             field_names.update(component.get_field_names())
         return list(field_names)
 
-    def save(self, filename=None):
+    @traced("Schematic.save", file_arg=1)
+    def save(self, filename=None, backup=False):
+        """Save schematic in a file (unless it's unchanged) and return True if it was written."""
+
         # check whether it has header, what means that sch file was loaded fine
         if not self.header:
-            return
+            return False
 
         if not filename:
             filename = self.filename
@@ -393,8 +400,7 @@ class Schematic(object):
 
         to_write += ["$EndSCHEMATC\n"]
 
-        f = open(filename, "w")
-        f.writelines(to_write)
+        return write_file_if_changed(filename, "".join(to_write), backup)
 
 
 class Component_V6(object):
@@ -538,22 +544,105 @@ class Sheet_V6(object):
                 break
 
 
+@traced("parse sheet")
+def read_sch_V6(filename):
+    """Parse a KiCad V6 schematic file into a nested list.
+
+    Args:
+        filename (string): Schematic file.
+
+    Returns:
+        list: Parsed S-expression of the schematic, or None if the file isn't a KiCad V6 schematic.
+    """
+
+    with open_input(filename) as fp:
+        try:
+            data = sexpdata.loads("\n".join(fp.readlines()))
+            if data[0].value() != "kicad_sch":
+                raise AssertionError
+        except AssertionError:
+            sys.stderr.write("The file is not a KiCad V6 Schematic File\n")
+            return None
+    return data
+
+
+@traced("save sheet")
+def write_sch_V6(filename, data, backup=False):
+    """Write the nested list of a KiCad V6 schematic into a file (unless it's unchanged).
+
+    Args:
+        filename (string): Schematic file.
+        data (list): S-expression of the schematic.
+        backup (bool, optional): Back up the file before changing it. Defaults to False.
+
+    Returns:
+        bool: True if the file was written, False if it was left untouched.
+    """
+
+    return write_file_if_changed(filename, sexp_indent(sexpdata.dumps(data)), backup)
+
+
+def read_sch_V6_hierarchy(filename, uuid_path="", jobs=1):
+    """Find and parse all the sheets in a KiCad V6 schematic hierarchy.
+
+    Each level of the hierarchy is parsed by a pool of worker processes and
+    the sheets found in it become the next level to parse.
+
+    Args:
+        filename (string): Top-level schematic file.
+        uuid_path (string, optional): UUID path of the top-level sheet. Defaults to "".
+        jobs (int, optional): Number of worker processes. Defaults to 1.
+
+    Returns:
+        dict: Parsed S-expression of each sheet keyed by its (filename, uuid_path).
+    """
+
+    sheets = {}
+    level = [(filename, uuid_path)]
+    while level:
+        results = run_jobs(read_sch_V6, [(f,) for f, _ in level], jobs)
+        next_level = []
+        for sheet, (data, error) in zip(level, results):
+            if error is not None:
+                if not os.path.isfile(sheet[0]):
+                    raise IOError("File not found: {}".format(sheet[0]))
+                raise ValueError("Unable to parse {}:\n{}".format(sheet[0], error))
+            sheets[sheet] = data
+            if data is not None:
+                next_level.extend(
+                    (child.filename, child.uuid_path)
+                    for child in (
+                        Sheet_V6(s, sheet[0], sheet[1])
+                        for s in find_by_key("sheet", data)
+                    )
+                )
+        level = next_level
+    return sheets
+
+
 class Schematic_V6(object):
     """
     A class to parse KiCad V6 schematic files.
     """
 
-    def __init__(self, filename, uuid_path=""):
+    def __init__(self, filename, uuid_path="", jobs=1, sheets=None):
+        """Parse a schematic and its hierarchy of sub-sheets.
 
-        # Parse the schematic file into a nested list.
-        with open(filename) as fp:
-            try:
-                self.sexpdata = sexpdata.loads("\n".join(fp.readlines()))
-                if self.sexpdata[0].value() != "kicad_sch":
-                    raise AssertionError
-            except AssertionError:
-                sys.stderr.write("The file is not a KiCad V6 Schematic File\n")
-                return
+        If jobs is more than 1, all the sheet files are found first and then
+        parsed by a pool of worker processes. The resulting hierarchy is the
+        same as parsing the sheets one at a time.
+        """
+
+        if sheets is None and num_workers(jobs, 2) > 1:
+            sheets = read_sch_V6_hierarchy(filename, uuid_path, jobs)
+
+        # Parse the schematic file into a nested list (unless it already was).
+        try:
+            self.sexpdata = sheets[(filename, uuid_path)]
+        except (TypeError, KeyError):
+            self.sexpdata = read_sch_V6(filename)
+        if self.sexpdata is None:
+            return
 
         self.filename = filename
         self.description = None
@@ -565,7 +654,10 @@ class Schematic_V6(object):
             for sheet in find_by_key("sheet", self.sexpdata)
         ]
         for sheet in child_sheets:
-            self.children.append(self.__class__(sheet.filename, sheet.uuid_path))
+            self.children.append(
+                self.__class__(sheet.filename, sheet.uuid_path, sheets=sheets)
+            )
+            run_progress.sheet_done(sheet.filename)
 
         # Get any components included in this schematic file.
         self.local_components = [
@@ -605,18 +697,42 @@ class Schematic_V6(object):
 
         return list(field_names)
 
-    def save(self, recurse=False, backup=True, filename=None):
-        """Save schematic in a file."""
+    def iter_sheets(self, filename=None):
+        """Iterate over the (filename, S-expression) of this schematic and its sub-sheets, depth-first."""
 
-        if not filename:
-            filename = self.filename
+        yield filename or self.filename, self.sexpdata
+        for child in self.children:
+            for sheet in child.iter_sheets():
+                yield sheet
 
-        if backup:
-            create_backup(filename)
+    @traced("Schematic_V6.save", file_arg=3)
+    def save(self, recurse=False, backup=True, filename=None, jobs=1):
+        """Save schematic in a file.
 
-        with open(filename, "w") as fp:
-            fp.write(sexp_indent(sexpdata.dumps(self.sexpdata)))
+        If recursing, a sheet used more than once in the hierarchy is only
+        written once with the contents from its last use, and if jobs is
+        more than 1 the sheets are written by a pool of worker processes.
+        Sheets whose contents are unchanged aren't written at all.
+        """
+
+        if not filename:
+            filename = self.filename
 
         if recurse:
-            for child in self.children:
-                child.save(recurse, backup)
+            # The last save of a reused sheet would overwrite the earlier ones.
+            last_saves = dict(self.iter_sheets(filename))
+            # Only back up files that haven't been backed-up already.
+            saves = [
+                (f, data, backup and f not in backedup_files)
+                for f, data in last_saves.items()
+            ]
+            results = run_jobs(write_sch_V6, saves, jobs)
+            for (f, _, backed_up), (written, error) in zip(saves, results):
+                if error is not None:
+                    raise IOError("Unable to write {}:\n{}".format(f, error))
+                # Record what the worker processes did to the files.
+                record_file_change(f, written)
+                if written and backed_up and f not in backedup_files:
+                    backedup_files.append(f)
+        else:
+            write_sch_V6(filename, self.sexpdata, backup)
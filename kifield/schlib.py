@@ -12,9 +12,12 @@ import re
 import sys
 from copy import deepcopy
 
-import sexpdata
-
 from .common import *
+from .prefetch import open_input
+from .refs import unquote
+from .trace import traced
+
+sexpdata = LazyModule("sexpdata")
 
 
 class Documentation(object):
@@ -33,7 +36,7 @@ class Documentation(object):
         if not os.path.isfile(filename):
             return
 
-        f = open(filename)
+        f = open_input(filename)
         self.header = f.readline()
 
         if self.header and not "EESchema-DOCLIB" in self.header:
@@ -346,7 +349,7 @@ class SchLib(object):
                 self.header = ["EESchema-LIBRARY Version 2.3\n", "#encoding utf-8\n"]
                 return
 
-        f = open(filename)
+        f = open_input(filename)
         self.header = [f.readline()]
 
         if self.header and not "EESchema-LIBRARY" in self.header[0]:
@@ -382,10 +385,13 @@ class SchLib(object):
 
         return None
 
-    def save(self, filename=None):
+    @traced("SchLib.save", file_arg=1)
+    def save(self, filename=None, backup=False):
+        """Save library in a file (unless it's unchanged) and return True if it was written."""
+
         # check whether it has header, what means that schlib file was loaded fine
         if not self.header:
-            return
+            return False
 
         if not filename:
             filename = self.filename
@@ -470,8 +476,7 @@ class SchLib(object):
         # This prevents errors caused by an internal CR, LF breaking a line.
         to_write = [re.sub(r"[\n\r]", "", l) + "\n" for l in to_write]
 
-        f = open(filename, "w")
-        f.writelines(to_write)
+        return write_file_if_changed(filename, "".join(to_write), backup)
 
 
 class Component_V6(object):
@@ -595,7 +600,7 @@ class SchLib_V6(object):
     def __init__(self, filename):
 
         # Parse the library file into a nested list.
-        with open(filename) as fp:
+        with open_input(filename) as fp:
             try:
                 self.sexpdata = sexpdata.loads("\n".join(fp.readlines()))
                 if self.sexpdata[0].value() != "kicad_symbol_lib":
@@ -622,14 +627,13 @@ class SchLib_V6(object):
 
         return list(field_names)
 
+    @traced("SchLib_V6.save", file_arg=2)
     def save(self, backup=True, filename=None):
-        """Save schematic in a file."""
+        """Save library in a file (unless it's unchanged) and return True if it was written."""
 
         if not filename:
             filename = self.filename
 
-        if backup:
-            create_backup(filename)
-
-        with open(filename, "w") as fp:
-            fp.write(sexp_indent(sexpdata.dumps(self.sexpdata)))
+        return write_file_if_changed(
+            filename, sexp_indent(sexpdata.dumps(self.sexpdata)), backup
+        )
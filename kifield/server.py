@@ -0,0 +1,309 @@
+# -*- coding: utf-8 -*-
+
+# MIT License / Copyright (c) 2021 by Dave Vandenbout.
+
+"""
+A server that keeps KiField (and the files it has parsed) loaded between
+requests, and the client functions for sending requests to it.
+
+Each connection carries one request and one response, both JSON objects
+terminated by a newline. Only the standard library is imported here so a
+client starts quickly.
+
+There's no authentication: anyone who can connect to the server can have it
+read and write files as the user running it. So the server listens on a Unix
+socket only the user who started it can open unless it's given a TCP address,
+which is open to every user of the machine.
+"""
+
+import json
+import logging
+import os
+import socket
+import stat
+import sys
+import traceback
+
+try:
+    from io import StringIO
+except ImportError:
+    from StringIO import StringIO
+
+# Size of the blocks read from a socket.
+RECV_SIZE = 1 << 16
+
+# Largest request the server accepts (in bytes).
+MAX_REQUEST_SIZE = 1 << 26
+
+# Seconds the server waits on a client to send its request or take its response.
+CLIENT_TIMEOUT = 30
+
+
+def default_socket_dir():
+    """Return the directory for the default server socket.
+
+    That's $XDG_RUNTIME_DIR (which only its user can get into) if it's set,
+    or else a kifield-<uid> directory in the temporary directory.
+    """
+    runtime_dir = os.environ.get("XDG_RUNTIME_DIR")
+    if runtime_dir:
+        return runtime_dir
+    return os.path.join(
+        os.environ.get("TMPDIR", "/tmp"), "kifield-{}".format(os.getuid())
+    )
+
+
+def default_address():
+    """Return the address used if the server or client isn't given one.
+
+    That's a Unix socket in default_socket_dir(). Systems without Unix sockets
+    fall back to a port on localhost.
+    """
+    if not hasattr(socket, "AF_UNIX"):
+        return "localhost:7447"
+    return "unix:" + os.path.join(default_socket_dir(), "kifield.sock")
+
+
+# Address used if the server or client isn't given one.
+DEFAULT_SERVER_ADDRESS = default_address()
+
+
+def make_private_dir(dirname):
+    """Create a directory only the current user can get into, or check an existing one is.
+
+    Raises:
+        IOError: The directory belongs to another user or other users can get into it.
+    """
+    try:
+        os.mkdir(dirname, 0o700)
+    except OSError:
+        pass  # Already exists.
+    st = os.lstat(dirname)
+    if not stat.S_ISDIR(st.st_mode) or st.st_uid != os.getuid() or st.st_mode & 0o077:
+        raise IOError("{} has to be a directory only you can get into.".format(dirname))
+
+
+def parse_address(address):
+    """Return the socket family and address for an address string.
+
+    Args:
+        address (string): 'host:port', a port number on localhost, or the
+            path to a Unix socket (optionally starting with 'unix:').
+
+    Returns:
+        tuple: Socket family and socket address.
+    """
+
+    if address.startswith("unix:"):
+        return socket.AF_UNIX, address[len("unix:") :]
+    if address.isdigit():
+        return socket.AF_INET, ("localhost", int(address))
+    host, _, port = address.rpartition(":")
+    if host and port.isdigit() and os.sep not in address:
+        return socket.AF_INET, (host, int(port))
+    return socket.AF_UNIX, address
+
+
+def send_message(sock, message):
+    """Send a JSON message through a socket.
+
+    Values JSON can't store (like the dates in a spreadsheet cell) are sent as strings.
+    """
+    sock.sendall((json.dumps(message, default=str) + "\n").encode("utf-8"))
+
+
+def recv_message(sock, max_size=None):
+    """Receive a JSON message from a socket (or None if the connection closed first).
+
+    Raises:
+        ValueError: The message is longer than max_size bytes.
+    """
+    blocks = []
+    size = 0
+    while not blocks or not blocks[-1].endswith(b"\n"):
+        block = sock.recv(RECV_SIZE)
+        if not block:
+            if not blocks:
+                return None
+            break
+        size += len(block)
+        if max_size is not None and size > max_size:
+            raise ValueError("Message is longer than {} bytes.".format(max_size))
+        blocks.append(block)
+    return json.loads(b"".join(blocks).decode("utf-8"))
+
+
+def send_request(address, request):
+    """Send a request to a KiField server and return its response.
+
+    Args:
+        address (string): Address of the server.
+        request (dict): Command, its arguments, and the client's working directory and debug level.
+
+    Returns:
+        dict: Result of the command, any error, and the log output of the command.
+    """
+
+    family, sock_address = parse_address(address)
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    try:
+        sock.connect(sock_address)
+        send_message(sock, request)
+        response = recv_message(sock)
+    finally:
+        sock.close()
+    if response is None:
+        raise IOError("No response from KiField server at {}.".format(address))
+    return response
+
+
+def run_command(command, args):
+    """Run a server command with a dict of arguments and return its result."""
+
+    from .kifield import extract_part_fields, insert_part_fields, kifield
+    from .parttable import PartTable
+
+    if command == "ping":
+        return "pong"
+
+    if command == "kifield":
+        return kifield(**args)
+
+    if command == "extract":
+        part_fields_dict = extract_part_fields(**args)
+        if part_fields_dict is None:
+            return None
+        return {ref: dict(fields.items()) for ref, fields in part_fields_dict.items()}
+
+    if command == "insert":
+        args = dict(args, part_fields_dict=PartTable(args["part_fields_dict"]))
+        return insert_part_fields(**args)
+
+    raise ValueError("Unknown command: {}".format(command))
+
+
+def handle_request(request):
+    """Run the command in a request and return the response.
+
+    The command runs in the client's working directory and its log output
+    (at the client's debug level) is returned in the response, along with
+    the stats, memory stats and trace of the command if the request asks
+    for them.
+    """
+
+    from .memstats import memstats
+    from .stats import stats
+    from .trace import trace
+
+    logger = logging.getLogger("kifield")
+    log = StringIO()
+    handler = logging.StreamHandler(log)
+    log_level = logging.DEBUG + 1 - (request.get("debug") or 0)
+    handler.setLevel(log_level)
+    prev_log_level = logger.level
+    logger.addHandler(handler)
+    logger.setLevel(log_level)
+    prev_cwd = os.getcwd()
+    stats.enabled = bool(request.get("stats"))
+    stats.clear()
+    trace.enabled = bool(request.get("trace"))
+    trace.clear()
+    memstats.enabled = bool(request.get("memstats"))
+    memstats.clear()
+    if memstats.enabled:
+        memstats.start()
+
+    try:
+        os.chdir(request.get("cwd", prev_cwd))
+        result = run_command(request.get("command"), request.get("args") or {})
+        error = None
+    except Exception as e:
+        result = None
+        error = "{}: {}".format(e.__class__.__name__, e)
+        logger.debug(traceback.format_exc())
+    finally:
+        os.chdir(prev_cwd)
+        logger.removeHandler(handler)
+        logger.setLevel(prev_log_level)
+
+    if memstats.enabled:
+        memstats.stop()
+
+    response = {"result": result, "error": error, "log": log.getvalue()}
+    if stats.enabled:
+        response["stats"] = stats.summary()
+        stats.enabled = False
+    if memstats.enabled:
+        response["memstats"] = memstats.summary()
+        memstats.enabled = False
+    if trace.enabled:
+        response["trace"] = trace.to_json()
+        trace.enabled = False
+    return response
+
+
+def serve(address=DEFAULT_SERVER_ADDRESS):
+    """Serve KiField requests one at a time until a shutdown request or a keyboard interrupt.
+
+    Parsed schematics and libraries are kept between requests and reused
+    until their files change. A request that can't be handled gets an error
+    response, and a client that doesn't send its request or take its
+    response within CLIENT_TIMEOUT seconds is dropped so it can't hold up
+    the others. Requests longer than MAX_REQUEST_SIZE bytes are refused.
+
+    Args:
+        address (string, optional): Address to listen on. Defaults to DEFAULT_SERVER_ADDRESS.
+    """
+
+    from .common import parse_cache
+
+    family, sock_address = parse_address(address)
+    server = socket.socket(family, socket.SOCK_STREAM)
+    if family == socket.AF_UNIX:
+        if os.path.dirname(sock_address) == default_socket_dir():
+            make_private_dir(default_socket_dir())
+        if os.path.exists(sock_address):
+            os.remove(sock_address)  # Left over from an earlier server.
+        # Only the user running the server can connect, from the moment it's created.
+        prev_umask = os.umask(0o177)
+        try:
+            server.bind(sock_address)
+        finally:
+            os.umask(prev_umask)
+    else:
+        server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        server.bind(sock_address)
+    server.listen(5)
+
+    parse_cache.enabled = True
+    try:
+        while True:
+            conn, _ = server.accept()
+            try:
+                conn.settimeout(CLIENT_TIMEOUT)
+                request = recv_message(conn, MAX_REQUEST_SIZE)
+                if request is None:
+                    continue
+                if request.get("command") == "shutdown":
+                    send_message(conn, {"result": None, "error": None, "log": ""})
+                    break
+                send_message(conn, handle_request(request))
+            except Exception as e:
+                error = "{}: {}".format(e.__class__.__name__, e)
+                sys.stderr.write("Bad KiField request: {}\n".format(error))
+                try:
+                    send_message(conn, {"result": None, "error": error, "log": ""})
+                except (IOError, OSError):
+                    pass  # The client is gone.
+            finally:
+                conn.close()
+
+    except KeyboardInterrupt:
+        pass
+
+    finally:
+        parse_cache.enabled = False
+        parse_cache.clear()
+        server.close()
+        if family == socket.AF_UNIX and os.path.exists(sock_address):
+            os.remove(sock_address)
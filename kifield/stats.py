@@ -0,0 +1,253 @@
+# -*- coding: utf-8 -*-
+
+# MIT License / Copyright (c) 2021 by Dave Vandenbout.
+
+"""
+Timing the phases of a KiField run and counting the work done in them.
+"""
+
+import io
+import json
+import time
+
+from .memstats import memstats
+from .profiling import profiler
+
+try:
+    process_time = time.process_time
+except AttributeError:
+    process_time = time.clock  # Python 2.
+
+# Phases of a run in the order they're reported.
+PHASES = (
+    "read",
+    "parse",
+    "extract",
+    "combine",
+    "clean",
+    "insert",
+    "serialize",
+    "backup",
+    "write",
+)
+
+# Number of files listed under each phase in the report.
+REPORT_FILES = 5
+
+
+class _NoPhase(object):
+    """A phase that isn't timed because stats aren't being collected."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NO_PHASE = _NoPhase()
+
+
+class _Phase(object):
+    """Times a phase of a run (and maybe profiles it or measures its memory) as a context manager."""
+
+    __slots__ = (
+        "stats",
+        "key",
+        "profiled",
+        "measured",
+        "wall",
+        "cpu",
+        "child_wall",
+        "child_cpu",
+    )
+
+    def __init__(self, stats, key, profiled, measured):
+        self.stats = stats  # None if the phase isn't timed.
+        self.key = key
+        self.profiled = profiled
+        self.measured = measured
+
+    def __enter__(self):
+        if self.profiled:
+            profiler.start()
+        if self.measured:
+            memstats.start_phase()
+        if self.stats is None:
+            return self
+        self.child_wall = 0.0  # Time spent in phases nested inside this one.
+        self.child_cpu = 0.0
+        self.stats._stack.append(self)
+        self.wall = time.time()
+        self.cpu = process_time()
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.stats is not None:
+            wall = time.time() - self.wall
+            cpu = process_time() - self.cpu
+            stack = self.stats._stack
+            stack.pop()
+            if stack:
+                stack[-1].child_wall += wall
+                stack[-1].child_cpu += cpu
+            self.stats.add_time(self.key, wall - self.child_wall, cpu - self.child_cpu)
+        if self.measured:
+            memstats.end_phase(self.key)
+        if self.profiled:
+            profiler.stop()
+        return False
+
+
+class Stats(object):
+    """
+    Wall and CPU time spent in each phase of a run (for each file) and counters
+    of the work that was done.
+
+    The time of a phase doesn't include the phases nested inside it (like
+    reading a file while parsing it), so the phase times don't overlap.
+    Nothing is recorded unless enabled is True.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.clear()
+
+    def clear(self):
+        """Forget everything recorded so far and restart the clock for the run."""
+        self.times = {}  # [calls, wall, cpu] keyed by (phase, file).
+        self.counters = {}
+        self._stack = []
+        self.start_wall = time.time()
+        self.start_cpu = process_time()
+
+    def phase(self, name, filename=None):
+        """Return a context manager that times a phase of the run.
+
+        The phase is also profiled if the profiler was told to profile it,
+        and its memory is measured if memstats is enabled.
+
+        Args:
+            name (string): Name of the phase (one of PHASES).
+            filename (string, optional): File the phase is working on. Defaults to None.
+        """
+
+        profiled = profiler.profiles_phase(name)
+        if not (self.enabled or profiled or memstats.enabled):
+            return _NO_PHASE
+        return _Phase(
+            self if self.enabled else None, (name, filename), profiled, memstats.enabled
+        )
+
+    def count(self, name, n=1):
+        """Add n to a counter."""
+        if self.enabled:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def add_time(self, key, wall, cpu, calls=1):
+        """Add the time of some calls to a (phase, file)."""
+        try:
+            times = self.times[key]
+        except KeyError:
+            times = self.times[key] = [0, 0.0, 0.0]
+        times[0] += calls
+        times[1] += wall
+        times[2] += cpu
+
+    def snapshot(self):
+        """Return what's been recorded in a form that can be pickled and passed to merge()."""
+        return (dict(self.times), dict(self.counters))
+
+    def merge(self, snapshot):
+        """Add what was recorded somewhere else (like a worker process) to these stats."""
+        times, counters = snapshot
+        for key, (calls, wall, cpu) in times.items():
+            self.add_time(key, wall, cpu, calls)
+        for name, n in counters.items():
+            self.count(name, n)
+
+    def summary(self):
+        """Return the recorded stats as a dict that can be stored as JSON.
+
+        Returns:
+            dict: Total wall and CPU time of the run, a list of phases (each
+                with its number of calls, wall and CPU time, and the same
+                for each file the phase worked on), and the counters.
+        """
+
+        phases = {}
+        for (name, filename), (calls, wall, cpu) in self.times.items():
+            phase = phases.setdefault(
+                name, {"phase": name, "calls": 0, "wall": 0.0, "cpu": 0.0, "files": []}
+            )
+            phase["calls"] += calls
+            phase["wall"] += wall
+            phase["cpu"] += cpu
+            if filename is not None:
+                phase["files"].append(
+                    {"file": filename, "calls": calls, "wall": wall, "cpu": cpu}
+                )
+        for phase in phases.values():
+            phase["files"].sort(key=lambda f: -f["wall"])
+
+        order = {name: i for i, name in enumerate(PHASES)}
+        return {
+            "wall": time.time() - self.start_wall,
+            "cpu": process_time() - self.start_cpu,
+            "phases": sorted(
+                phases.values(),
+                key=lambda p: (order.get(p["phase"], len(order)), p["phase"]),
+            ),
+            "counters": dict(self.counters),
+        }
+
+    def report(self):
+        """Return a table of the recorded stats."""
+        return format_report(self.summary())
+
+    def save(self, filename):
+        """Store the recorded stats in a JSON file."""
+        save_summary(filename, self.summary())
+
+
+def format_report(summary):
+    """Return a table of the stats in a summary from Stats.summary()."""
+
+    lines = [
+        "{:<40} {:>7} {:>10} {:>10}".format("Phase", "Calls", "Wall (s)", "CPU (s)")
+    ]
+    for phase in summary["phases"]:
+        lines.append(
+            "{phase:<40} {calls:>7} {wall:>10.3f} {cpu:>10.3f}".format(**phase)
+        )
+        for f in phase["files"][:REPORT_FILES]:
+            lines.append(
+                "  {:<38} {:>7} {:>10.3f} {:>10.3f}".format(
+                    f["file"][-38:], f["calls"], f["wall"], f["cpu"]
+                )
+            )
+        if len(phase["files"]) > REPORT_FILES:
+            lines.append(
+                "  ... and {} more files".format(len(phase["files"]) - REPORT_FILES)
+            )
+    lines.append(
+        "{:<40} {:>7} {:>10.3f} {:>10.3f}".format(
+            "Total", "", summary["wall"], summary["cpu"]
+        )
+    )
+    if summary["counters"]:
+        lines.append("")
+        lines.append("{:<40} {:>10}".format("Counter", "Count"))
+        for name, n in sorted(summary["counters"].items()):
+            lines.append("{:<40} {:>10}".format(name, n))
+    return "\n".join(lines)
+
+
+def save_summary(filename, summary):
+    """Store a summary from Stats.summary() in a JSON file."""
+    with io.open(filename, "w", encoding="utf-8") as fp:
+        fp.write(json.dumps(summary, indent=1, ensure_ascii=False))
+
+
+# Stats of the current run.
+stats = Stats()
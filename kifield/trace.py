@@ -0,0 +1,196 @@
+# -*- coding: utf-8 -*-
+
+# MIT License / Copyright (c) 2021 by Dave Vandenbout.
+
+"""
+Recording a timeline of a KiField run in the Chrome trace-event format.
+
+The trace can be opened in Perfetto (https://ui.perfetto.dev) or
+chrome://tracing to see which files were being worked on when, and by
+which process.
+"""
+
+import functools
+import io
+import json
+import os
+import threading
+import time
+
+
+class _NoSpan(object):
+    """A span that isn't recorded because tracing isn't enabled."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NO_SPAN = _NoSpan()
+
+
+class _Span(object):
+    """Records a span of time in a trace as a context manager."""
+
+    __slots__ = ("trace", "name", "args", "start")
+
+    def __init__(self, trace, name, args):
+        self.trace = trace
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        self.start = time.time()
+        return self
+
+    def __exit__(self, *exc_info):
+        end = time.time()
+        self.trace.add_event(
+            {
+                "name": self.name,
+                "cat": "kifield",
+                "ph": "X",
+                "ts": self.start * 1e6,
+                "dur": (end - self.start) * 1e6,
+                "pid": os.getpid(),
+                "tid": threading.current_thread().ident,
+                "args": self.args,
+            }
+        )
+        return False
+
+
+class Trace(object):
+    """
+    The spans of time recorded during a run.
+
+    Span times come from the wall clock so the spans recorded by worker
+    processes line up with those of the main process once they're merged.
+    Nothing is recorded unless enabled is True.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.clear()
+
+    def clear(self):
+        """Forget all the recorded spans."""
+        self.events = []
+
+    def span(self, name, **args):
+        """Return a context manager that records a span of the run.
+
+        Args:
+            name (string): Name shown on the span.
+            **args: Values shown with the span when it's selected (like the file it worked on).
+        """
+
+        if not self.enabled:
+            return _NO_SPAN
+        return _Span(self, name, args)
+
+    def add_event(self, event):
+        """Add a trace event (a dict in the Chrome trace-event format)."""
+        self.events.append(event)
+
+    def snapshot(self):
+        """Return the recorded events in a form that can be pickled and passed to merge()."""
+        return list(self.events)
+
+    def merge(self, events):
+        """Add the events recorded somewhere else (like a worker process) to this trace."""
+        self.events.extend(events)
+
+    def to_json(self):
+        """Return the trace as a dict in the Chrome trace-event format.
+
+        Times start from the first recorded span, and each process is named
+        so the main process and its workers can be told apart.
+        """
+
+        events = sorted(self.events, key=lambda e: e["ts"])
+        start = events[0]["ts"] if events else 0.0
+        events = [dict(e, ts=e["ts"] - start) for e in events]
+
+        main_pid = os.getpid()
+        pids = sorted({e["pid"] for e in events} | {main_pid})
+        for pid in pids:
+            events.append(
+                {
+                    "name": "process_name",
+                    "ph": "M",
+                    "pid": pid,
+                    "args": {
+                        "name": (
+                            "kifield"
+                            if pid == main_pid
+                            else "kifield worker {}".format(pid)
+                        )
+                    },
+                }
+            )
+            events.append(
+                {
+                    "name": "process_sort_index",
+                    "ph": "M",
+                    "pid": pid,
+                    "args": {"sort_index": 0 if pid == main_pid else pid},
+                }
+            )
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def save(self, filename):
+        """Store the trace in a JSON file."""
+        save_trace(filename, self.to_json())
+
+
+def save_trace(filename, trace_json):
+    """Store a trace from Trace.to_json() in a JSON file."""
+    with io.open(filename, "w", encoding="utf-8") as fp:
+        fp.write(json.dumps(trace_json, ensure_ascii=False))
+
+
+def traced(name=None, file_arg=0):
+    """Decorator that records a span of the trace for each call of a function.
+
+    Args:
+        name (string, optional): Name of the span. Defaults to the name of the function.
+        file_arg (int, optional): Position of the argument holding the name of
+            the file (or files) the function works on, which can also be passed
+            as the filename keyword. If the file name is None for a method, the
+            filename attribute of the object is used. Use None if the function
+            doesn't work on a file. Defaults to 0.
+    """
+
+    def decorator(func):
+        span_name = name or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not trace.enabled:
+                return func(*args, **kwargs)
+            if file_arg is None:
+                with trace.span(span_name):
+                    return func(*args, **kwargs)
+            if len(args) > file_arg:
+                filename = args[file_arg]
+            else:
+                filename = kwargs.get("filename")
+            if filename is None and args:
+                filename = getattr(args[0], "filename", None)
+            if isinstance(filename, (list, tuple)):
+                span = trace.span(span_name, files=list(filename))
+            else:
+                span = trace.span(span_name, file=filename)
+            with span:
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+# Trace of the current run.
+trace = Trace()
@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+
+# MIT License / Copyright (c) 2021 by Dave Vandenbout.
+
+"""Benchmark the cost of the debug logging in KiField's insertion loops.
+
+A synthetic project (see synthesize.py) is generated and the fields from
+its BOM are inserted into its schematic, library and a spreadsheet with
+logging turned off and, for comparison, with every debug message enabled
+but thrown away by a NullHandler. Since the files are inserted into
+unchanged (except for a new description field on every part), the
+times are dominated by the parsing and insertion loops.
+
+Run with: python tests/integration/bench_logging.py [options]
+"""
+
+from __future__ import print_function
+
+import argparse
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from synthesize import make_project
+
+from kifield.common import DEBUG_OBSESSIVE
+from kifield.kifield import extract_part_fields, insert_part_fields_into_file
+
+# Logging levels to compare.
+LEVELS = (("off", logging.WARNING), ("obsessive", DEBUG_OBSESSIVE))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark logging in the insertion loops."
+    )
+    parser.add_argument("--versions", type=int, nargs="+", default=[5, 6])
+    parser.add_argument(
+        "--parts", type=int, default=200, help="Parts on each sheet file."
+    )
+    parser.add_argument(
+        "--fields", type=int, default=6, help="Extra fields on each part."
+    )
+    parser.add_argument(
+        "--repeat", type=int, default=5, help="Keep the best of N runs."
+    )
+    args = parser.parse_args()
+
+    logger = logging.getLogger("kifield")
+    logger.addHandler(logging.NullHandler())
+    logger.propagate = False
+
+    print("{:>3} {:<5} {:<10} {:>10}".format("ver", "file", "logging", "time (s)"))
+    project_root = tempfile.mkdtemp(prefix="kifield_logging_")
+    try:
+        for version in args.versions:
+            project_dir = os.path.join(project_root, "v{}".format(version))
+            _, files = make_project(
+                project_dir,
+                version=version,
+                parts_per_sheet=args.parts,
+                fields_per_part=args.fields,
+            )
+            for kind in ("sch", "lib", "csv"):
+                bom = files["lib_csv"] if kind == "lib" else files["csv"]
+                part_fields_dict = extract_part_fields([bom])
+                for ref, fields in part_fields_dict.items():
+                    fields["description"] = "Changed " + ref
+                for name, level in LEVELS:
+                    logger.setLevel(level)
+                    best = min(
+                        timeit.repeat(
+                            lambda: insert_part_fields_into_file(
+                                part_fields_dict, files[kind], True, False, False, False
+                            ),
+                            number=1,
+                            repeat=args.repeat,
+                        )
+                    )
+                    print(
+                        "{:>3} {:<5} {:<10} {:>10.3f}".format(version, kind, name, best)
+                    )
+    finally:
+        shutil.rmtree(project_root, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
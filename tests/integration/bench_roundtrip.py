@@ -0,0 +1,291 @@
+# -*- coding: utf-8 -*-
+
+# MIT License / Copyright (c) 2021 by Dave Vandenbout.
+
+"""Benchmark the parse and save throughput of each file format on the test fixtures.
+
+Every schematic, library, description file and spreadsheet under the
+kicad5, kicad6, kicad7 and misc directories is parsed and then saved,
+unmodified, into a scratch directory. The parse and save speeds are reported
+in MB/s along with the fidelity of the saved file: "identical" if it matches
+the original byte-for-byte, "semantic" if it parses into the same contents,
+or "DIFFERENT" if it doesn't. So a change to a parser or writer can be judged
+on both speed and correctness.
+
+Run with: python tests/integration/bench_roundtrip.py [--repeat N] [--output file.json]
+"""
+
+from __future__ import print_function
+
+import argparse
+import io
+import json
+import os
+import shutil
+import tempfile
+import timeit
+
+import sexpdata
+
+from kifield.dcm import Dcm
+from kifield.kifield import csvfile_to_wb, pyxl, wb_to_csvfile, wb_values
+from kifield.sch import Schematic, Schematic_V6
+from kifield.schlib import SchLib, SchLib_V6
+
+INTEGRATION_DIR = os.path.dirname(os.path.abspath(__file__))
+
+FIXTURE_DIRS = ("kicad5", "kicad6", "kicad7", "misc")
+
+
+def sch_contents(filename):
+    """Return the parsed contents of a KiCad 5 schematic sheet."""
+    sch = Schematic(filename)
+    return (
+        sch.header,
+        sch.libs,
+        sch.eelayer,
+        [
+            (c.labels, c.unit, c.position, c.references, c.fields, c.old_stuff)
+            for c in sch.components
+        ],
+        [(s.shape, s.unit, s.fields) for s in sch.sheets],
+        [(t["desc"], t["data"]) for t in sch.texts + sch.wires + sch.entries],
+        [c["desc"] for c in sch.conns + sch.noconns],
+    )
+
+
+def lib_contents(filename):
+    """Return the parsed contents of a KiCad 5 part library."""
+    lib = SchLib(filename)
+    return [
+        (c.definition, c.fields, c.aliases, c.fplist, c.draw) for c in lib.components
+    ]
+
+
+def dcm_contents(filename):
+    """Return the parsed contents of a part description file."""
+    return [
+        (c.name, c.description, c.keywords, c.docfile) for c in Dcm(filename).components
+    ]
+
+
+def sexp_contents(filename):
+    """Return the parsed S-expression of a KiCad 6 or 7 file."""
+    with io.open(filename, "r", encoding="utf-8") as fp:
+        return sexpdata.loads(fp.read())
+
+
+def csv_contents(filename):
+    """Return the cell values of a CSV file."""
+    return wb_values(csvfile_to_wb(filename)[0])
+
+
+def xlsx_contents(filename):
+    """Return the cell values of an XLSX file."""
+    return wb_values(pyxl.load_workbook(filename))
+
+
+def sch_V6_files(sch):
+    """Return the set of sheet files parsed for a KiCad 6 schematic hierarchy."""
+    return {f for f, _ in sch.iter_sheets()}
+
+
+# For each file extension: the name of its parser/writer, a function to parse a
+# file, a function to save the parsed file under a new name, a function to get
+# the files read by the parse, and a function to get the contents of a file for
+# comparison.
+CODECS = {
+    ".sch": (
+        "Schematic",
+        Schematic,
+        lambda sch, filename: sch.save(filename=filename),
+        lambda sch: {sch.filename},
+        sch_contents,
+    ),
+    ".kicad_sch": (
+        "Schematic_V6",
+        Schematic_V6,
+        lambda sch, filename: sch.save(backup=False, filename=filename),
+        sch_V6_files,
+        sexp_contents,
+    ),
+    ".lib": (
+        "SchLib",
+        SchLib,
+        lambda lib, filename: lib.save(filename=filename),
+        lambda lib: {lib.filename},
+        lib_contents,
+    ),
+    ".kicad_sym": (
+        "SchLib_V6",
+        SchLib_V6,
+        lambda lib, filename: lib.save(backup=False, filename=filename),
+        lambda lib: {lib.filename},
+        sexp_contents,
+    ),
+    ".dcm": (
+        "Dcm",
+        Dcm,
+        lambda dcm, filename: dcm.save(filename=filename),
+        lambda dcm: {dcm.filename},
+        dcm_contents,
+    ),
+    ".csv": (
+        "CSV workbook",
+        csvfile_to_wb,
+        lambda wb_dialect, filename: wb_to_csvfile(
+            wb_dialect[0], filename, wb_dialect[1]
+        ),
+        None,
+        csv_contents,
+    ),
+    ".xlsx": (
+        "XLSX workbook",
+        pyxl.load_workbook,
+        lambda wb, filename: wb.save(filename),
+        None,
+        xlsx_contents,
+    ),
+}
+
+
+def fixture_files():
+    """Return the paths of the fixture files with a known format, sorted by directory and name."""
+    files = []
+    for fixture_dir in FIXTURE_DIRS:
+        for dirpath, dirnames, filenames in os.walk(
+            os.path.join(INTEGRATION_DIR, fixture_dir)
+        ):
+            dirnames.sort()
+            for filename in sorted(filenames):
+                if os.path.splitext(filename)[1].lower() in CODECS:
+                    files.append(os.path.join(dirpath, filename))
+    return files
+
+
+def fidelity(original, saved, contents):
+    """Return how faithfully a saved file reproduces the original."""
+    with io.open(original, "rb") as fp1, io.open(saved, "rb") as fp2:
+        if fp1.read() == fp2.read():
+            return "identical"
+    try:
+        if contents(original) == contents(saved):
+            return "semantic"
+    except Exception:
+        pass
+    return "DIFFERENT"
+
+
+def bench_file(filename, out_dir, repeat):
+    """Parse and save a file and return its speeds and fidelity (or the error if either fails)."""
+
+    ext = os.path.splitext(filename)[1].lower()
+    codec, parse, save, files_read, contents = CODECS[ext]
+    saved = os.path.join(out_dir, os.path.basename(filename))
+
+    def save_one():
+        # Always write the whole file rather than finding it's unchanged.
+        if os.path.exists(saved):
+            os.remove(saved)
+        save(parsed.pop(), saved)
+
+    try:
+        parse_time = min(
+            timeit.repeat(lambda: parse(filename), number=1, repeat=repeat)
+        )
+        # Each save gets its own parse since some writers change the parsed data.
+        parsed = [parse(filename) for _ in range(repeat)]
+        save_time = min(timeit.repeat(save_one, number=1, repeat=repeat))
+    except Exception as e:
+        return dict(codec=codec, error="{}: {}".format(e.__class__.__name__, e))
+
+    read_bytes = sum(
+        os.path.getsize(f)
+        for f in (files_read(parse(filename)) if files_read else [filename])
+    )
+    saved_bytes = os.path.getsize(saved)
+    return dict(
+        codec=codec,
+        bytes=read_bytes,
+        saved_bytes=saved_bytes,
+        parse_time=parse_time,
+        parse_mb_s=read_bytes / parse_time / 1e6,
+        save_time=save_time,
+        save_mb_s=saved_bytes / save_time / 1e6,
+        fidelity=fidelity(filename, saved, contents),
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark parsing and saving the test fixtures."
+    )
+    parser.add_argument(
+        "--repeat", type=int, default=5, help="Keep the best of N runs."
+    )
+    parser.add_argument("--output", "-o", help="Store the results in this JSON file.")
+    args = parser.parse_args()
+
+    results = []
+    totals = {}
+    print(
+        "{:<42} {:<14} {:>9} {:>10} {:>10}  {}".format(
+            "file", "codec", "KB", "parse MB/s", "save MB/s", "fidelity"
+        )
+    )
+    out_dir = tempfile.mkdtemp(prefix="kifield_roundtrip_")
+    try:
+        for filename in fixture_files():
+            name = os.path.relpath(filename, INTEGRATION_DIR)
+            result = bench_file(filename, out_dir, args.repeat)
+            result["file"] = name
+            results.append(result)
+            total = totals.setdefault(result["codec"], [0, 0.0, 0, 0.0, 0, 0])
+            if "error" in result:
+                print("{:<42} {:<14} {}".format(name, result["codec"], result["error"]))
+                total[5] += 1
+                continue
+            print(
+                "{:<42} {:<14} {:>9.1f} {:>10.2f} {:>10.2f}  {}".format(
+                    name,
+                    result["codec"],
+                    result["bytes"] / 1e3,
+                    result["parse_mb_s"],
+                    result["save_mb_s"],
+                    result["fidelity"],
+                )
+            )
+            total[0] += result["bytes"]
+            total[1] += result["parse_time"]
+            total[2] += result["saved_bytes"]
+            total[3] += result["save_time"]
+            total[4] += result["fidelity"] == "DIFFERENT"
+    finally:
+        shutil.rmtree(out_dir, ignore_errors=True)
+
+    print()
+    print(
+        "{:<14} {:>9} {:>10} {:>10} {:>10} {:>7}".format(
+            "codec", "KB", "parse MB/s", "save MB/s", "different", "errors"
+        )
+    )
+    for codec, total in sorted(totals.items()):
+        read_bytes, parse_time, saved_bytes, save_time, different, errors = total
+        print(
+            "{:<14} {:>9.1f} {:>10.2f} {:>10.2f} {:>10} {:>7}".format(
+                codec,
+                read_bytes / 1e3,
+                read_bytes / parse_time / 1e6 if parse_time else 0.0,
+                saved_bytes / save_time / 1e6 if save_time else 0.0,
+                different,
+                errors,
+            )
+        )
+
+    if args.output:
+        with open(args.output, "w") as fp:
+            json.dump(results, fp, indent=1)
+
+
+if __name__ == "__main__":
+    main()
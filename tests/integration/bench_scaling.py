@@ -0,0 +1,240 @@
+# -*- coding: utf-8 -*-
+
+# MIT License / Copyright (c) 2021 by Dave Vandenbout.
+
+"""Benchmark how KiField scales with the size of a project.
+
+Synthetic projects (see synthesize.py) of increasing size are generated for
+each KiCad version, and the extraction, insertion and round-trip (extract
+into a spreadsheet and insert it back) of each of their files is timed.
+Every measurement runs in a fresh process on a fresh copy of the project so
+its peak RSS can be reported, too. The results are printed as a table and
+can be stored as JSON for plotting time and peak RSS against parts.
+
+Run with: python tests/integration/bench_scaling.py [options]
+"""
+
+from __future__ import print_function
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+try:
+    import resource
+except ImportError:
+    resource = None  # Peak RSS isn't available on Windows.
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from synthesize import make_project
+
+# Files whose fields are extracted and inserted (dcm is only made for KiCad 5).
+FORMATS = ("sch", "lib", "dcm", "csv", "xlsx")
+
+OPERATIONS = ("extract", "insert", "roundtrip")
+
+
+def peak_rss_mb():
+    """Return the peak resident memory of this process in MB (or None if unknown)."""
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KB but macOS reports bytes.
+    return rss / (1024.0 * 1024.0 if sys.platform == "darwin" else 1024.0)
+
+
+def run_operation(op, files, fmt, jobs):
+    """Time one operation on a file of a project and return the seconds it took.
+
+    The spreadsheet read for an insertion is loaded (and given a changed
+    description for every part) before the timing starts.
+    """
+
+    from kifield.kifield import extract_part_fields, insert_part_fields, kifield
+
+    filename = files[fmt]
+
+    if op == "extract":
+        start = time.time()
+        extract_part_fields([filename], recurse=True, jobs=jobs)
+        return time.time() - start
+
+    if op == "insert":
+        bom = files["lib_csv"] if fmt in ("lib", "dcm") else files["csv"]
+        part_fields_dict = extract_part_fields([bom])
+        for ref, fields in part_fields_dict.items():
+            fields["description"] = "Changed " + ref
+        start = time.time()
+        insert_part_fields(
+            part_fields_dict, [filename], True, False, False, False, jobs
+        )
+        return time.time() - start
+
+    if op == "roundtrip":
+        ext = ".xlsx" if fmt == "csv" else ".csv"
+        sheet = os.path.join(os.path.dirname(filename), "roundtrip" + ext)
+        start = time.time()
+        kifield([filename], [sheet], recurse=True, backup=False, jobs=jobs)
+        kifield([sheet], [filename], recurse=True, backup=False, jobs=jobs)
+        return time.time() - start
+
+    raise ValueError("Unknown operation: {}".format(op))
+
+
+def measure(project_dir, op, fmt, jobs):
+    """Run an operation in a new process on a copy of a project and return its time and peak RSS."""
+
+    work_dir = tempfile.mkdtemp(prefix="kifield_bench_")
+    try:
+        dst = os.path.join(work_dir, "project")
+        shutil.copytree(project_dir, dst)
+        with open(os.path.join(project_dir, "files.json")) as fp:
+            files = {
+                kind: os.path.join(dst, os.path.basename(path))
+                for kind, path in json.load(fp).items()
+            }
+        cmd = [
+            sys.executable,
+            os.path.abspath(__file__),
+            "--child",
+            json.dumps({"op": op, "fmt": fmt, "files": files, "jobs": jobs}),
+        ]
+        out = subprocess.check_output(cmd)
+        return json.loads(out.decode("utf-8").strip().splitlines()[-1])
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def child(args):
+    """Run one measurement and print its results as JSON."""
+    args = json.loads(args)
+    elapsed = run_operation(args["op"], args["files"], args["fmt"], args["jobs"])
+    print(json.dumps({"time": elapsed, "peak_rss_mb": peak_rss_mb()}))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark KiField on synthetic projects."
+    )
+    parser.add_argument("--versions", type=int, nargs="+", default=[5, 6, 7])
+    parser.add_argument(
+        "--parts",
+        type=int,
+        nargs="+",
+        default=[10, 50, 200],
+        help="Parts on each sheet file for each point on the scaling curves.",
+    )
+    parser.add_argument(
+        "--sheets", type=int, default=8, help="Number of sub-sheet files."
+    )
+    parser.add_argument(
+        "--depth", type=int, default=2, help="Depth of the sheet hierarchy."
+    )
+    parser.add_argument(
+        "--reuse", type=int, default=2, help="Placements of each sub-sheet."
+    )
+    parser.add_argument(
+        "--fields", type=int, default=4, help="Extra fields on each part."
+    )
+    parser.add_argument("--formats", nargs="+", default=list(FORMATS), choices=FORMATS)
+    parser.add_argument(
+        "--ops", nargs="+", default=list(OPERATIONS), choices=OPERATIONS
+    )
+    parser.add_argument("--jobs", "-j", type=int, default=1)
+    parser.add_argument(
+        "--repeat", type=int, default=3, help="Keep the best of N runs."
+    )
+    parser.add_argument("--output", "-o", help="Store the results in this JSON file.")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.child)
+        return
+
+    params = dict(
+        num_sheets=args.sheets,
+        depth=args.depth,
+        reuse=args.reuse,
+        fields_per_part=args.fields,
+    )
+    results = []
+    print(
+        "{:>3} {:<5} {:<10} {:>8} {:>8} {:>10} {:>10}".format(
+            "ver", "fmt", "op", "parts", "symbols", "time (s)", "rss (MB)"
+        )
+    )
+
+    project_root = tempfile.mkdtemp(prefix="kifield_projects_")
+    try:
+        for version in args.versions:
+            for parts_per_sheet in args.parts:
+                project_dir = os.path.join(
+                    project_root, "v{}_{}".format(version, parts_per_sheet)
+                )
+                project, files = make_project(
+                    project_dir,
+                    version=version,
+                    parts_per_sheet=parts_per_sheet,
+                    **params
+                )
+                with open(os.path.join(project_dir, "files.json"), "w") as fp:
+                    json.dump(files, fp)
+
+                for fmt in args.formats:
+                    if fmt not in files:
+                        continue
+                    for op in args.ops:
+                        runs = [
+                            measure(project_dir, op, fmt, args.jobs)
+                            for _ in range(args.repeat)
+                        ]
+                        best = min(runs, key=lambda r: r["time"])
+                        rss = [
+                            r["peak_rss_mb"]
+                            for r in runs
+                            if r["peak_rss_mb"] is not None
+                        ]
+                        result = dict(
+                            version=version,
+                            format=fmt,
+                            op=op,
+                            parts=project.num_parts,
+                            symbols=project.num_symbols,
+                            sheets=len(project.instances),
+                            time=best["time"],
+                            peak_rss_mb=max(rss) if rss else None,
+                        )
+                        results.append(result)
+                        print(
+                            "{version:>3} {format:<5} {op:<10} {parts:>8} {symbols:>8} "
+                            "{time:>10.3f} {rss:>10}".format(
+                                rss="-" if not rss else "{:.1f}".format(max(rss)),
+                                **result
+                            )
+                        )
+    finally:
+        shutil.rmtree(project_root, ignore_errors=True)
+
+    if args.output:
+        with open(args.output, "w") as fp:
+            json.dump(
+                {
+                    "python": platform.python_version(),
+                    "platform": platform.platform(),
+                    "params": dict(params, jobs=args.jobs, repeat=args.repeat),
+                    "results": results,
+                },
+                fp,
+                indent=1,
+            )
+
+
+if __name__ == "__main__":
+    main()
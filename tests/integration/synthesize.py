@@ -0,0 +1,510 @@
+# -*- coding: utf-8 -*-
+
+# MIT License / Copyright (c) 2021 by Dave Vandenbout.
+
+"""Generate synthetic KiCad projects for benchmarking KiField at scale.
+
+A project has a root schematic and a hierarchy of sub-sheet files with a
+given depth, where each sub-sheet can be placed more than once. Each sheet
+holds a number of parts with the standard fields plus some extra ones. A
+matching part library (and a .dcm description file for KiCad 5) holds one
+symbol for each part on the sheets, and CSV and XLSX BOMs hold the fields of
+every part instance in the project.
+
+Run with: python tests/integration/synthesize.py DIR [options]
+"""
+
+from __future__ import print_function
+
+import argparse
+import csv
+import io
+import os
+import random
+import uuid
+
+import openpyxl as pyxl
+
+# Names of the extra fields given to each part.
+EXTRA_FIELD_NAMES = ["manf", "manf#", "Supplier", "SupplierPN", "Tolerance", "Voltage"]
+
+# Part kinds with their reference prefix, value pool and footprint.
+PART_KINDS = [
+    (
+        "R",
+        ["{}K".format(v) for v in (1, 2.2, 4.7, 10, 22, 47, 100)],
+        "Resistor_SMD:R_0603",
+    ),
+    ("C", ["{}nF".format(v) for v in (1, 10, 22, 100, 470)], "Capacitor_SMD:C_0603"),
+    ("L", ["{}uH".format(v) for v in (1, 4.7, 10)], "Inductor_SMD:L_0805"),
+    ("D", ["1N4148", "BAT54", "LED"], "Diode_SMD:D_SOD-123"),
+    ("U", ["LM358", "NE555", "74HC04", "ATmega328P"], "Package_SO:SOIC-8"),
+]
+
+# Versions of the KiCad 6 and 7 schematic and library formats.
+SEXP_VERSIONS = {6: ("20211123", "20211014"), 7: ("20230121", "20220914")}
+
+PROJECT_NAME = "bench"
+
+
+def extra_field_names(fields_per_part):
+    """Return the names of the extra fields given to each part."""
+    names = EXTRA_FIELD_NAMES[:fields_per_part]
+    names += ["Field{}".format(i) for i in range(len(names), fields_per_part)]
+    return names
+
+
+class Project(object):
+    """
+    The sheets, parts and part instances of a synthetic KiCad project.
+    """
+
+    def __init__(
+        self,
+        version=6,
+        num_sheets=4,
+        depth=2,
+        reuse=1,
+        parts_per_sheet=50,
+        fields_per_part=4,
+        seed=0,
+    ):
+        self.version = version
+        self.num_sheets = num_sheets
+        self.depth = min(max(depth, 1), num_sheets)
+        self.reuse = reuse
+        self.parts_per_sheet = parts_per_sheet
+        self.field_names = extra_field_names(fields_per_part)
+        self.rng = random.Random(seed)
+        self.root_id = self.new_id()
+
+        # Spread the sub-sheets over the levels of the hierarchy and place
+        # each one (reuse times) on a sheet in the level above it.
+        # Sheet None is the root schematic.
+        levels = [[] for _ in range(self.depth)]
+        for sheet in range(num_sheets):
+            levels[sheet * self.depth // num_sheets].append(sheet)
+        self.placements = {None: []}  # (placement id, sub-sheet) on each sheet.
+        for level, sheets in enumerate(levels):
+            parents = levels[level - 1] if level else [None]
+            for i, sheet in enumerate(sheets):
+                self.placements.setdefault(sheet, [])
+                parent = parents[i % len(parents)]
+                for _ in range(reuse):
+                    self.placements[parent].append((self.new_id(), sheet))
+
+        # Parts on each sheet: (id, library symbol, prefix, fields).
+        self.parts = {}
+        for n, sheet in enumerate([None] + list(range(num_sheets))):
+            self.parts[sheet] = [
+                self.new_part(n * parts_per_sheet + i) for i in range(parts_per_sheet)
+            ]
+
+        # Assign a reference to each part of each sheet instance.
+        self.instances = list(self.iter_instances(None, ""))
+        counts = {}
+        self.refs = {}  # Reference keyed by (instance path, part id).
+        for sheet, path in self.instances:
+            for part_id, _, prefix, _ in self.parts[sheet]:
+                counts[prefix] = counts.get(prefix, 0) + 1
+                self.refs[(path, part_id)] = "{}{}".format(prefix, counts[prefix])
+
+    @property
+    def num_parts(self):
+        """Number of part instances in the project."""
+        return len(self.refs)
+
+    @property
+    def num_symbols(self):
+        """Number of symbols in the part library."""
+        return sum(len(parts) for parts in self.parts.values())
+
+    def new_id(self):
+        """Return a new timestamp (KiCad 5) or UUID (KiCad 6 and 7)."""
+        if self.version == 5:
+            return "{:08X}".format(self.rng.getrandbits(32))
+        return str(uuid.UUID(int=self.rng.getrandbits(128), version=4))
+
+    def new_part(self, symbol_num):
+        """Return the id, library symbol, reference prefix and field values of a new part."""
+        prefix, values, footprint = self.rng.choice(PART_KINDS)
+        fields = [
+            ("value", self.rng.choice(values)),
+            ("footprint", footprint),
+            ("datasheet", "~"),
+        ]
+        for name in self.field_names:
+            fields.append((name, "{}-{}".format(name, self.rng.randint(1, 20))))
+        return self.new_id(), "PART_{}".format(symbol_num), prefix, fields
+
+    def iter_instances(self, sheet, path):
+        """Iterate over the (sheet, instance path) of a sheet and all the sheets below it."""
+        yield sheet, path
+        for placement_id, sub_sheet in self.placements[sheet]:
+            for instance in self.iter_instances(sub_sheet, path + "/" + placement_id):
+                yield instance
+
+    def sheet_filename(self, sheet):
+        """Return the file name of a sheet."""
+        ext = ".sch" if self.version == 5 else ".kicad_sch"
+        if sheet is None:
+            return PROJECT_NAME + ext
+        return "sheet{}{}".format(sheet, ext)
+
+    def field_name(self, name):
+        """Return the name of a field as it's extracted from this version of schematic."""
+        if self.version == 5 or name not in ("value", "footprint", "datasheet"):
+            return name
+        return name.capitalize()
+
+    def bom_rows(self):
+        """Return the header and rows of a BOM with the fields of every part instance."""
+        header = ["Refs"] + [
+            self.field_name(name) for name, _ in self.parts[None][0][3]
+        ]
+        rows = []
+        for sheet, path in self.instances:
+            for part_id, _, _, fields in self.parts[sheet]:
+                rows.append([self.refs[(path, part_id)]] + [v for _, v in fields])
+        return header, rows
+
+    def lib_bom_rows(self):
+        """Return the header and rows of a BOM with the fields of every library symbol."""
+        header = ["Refs"] + [name for name, _ in self.parts[None][0][3]]
+        rows = []
+        for sheet in sorted(self.parts, key=lambda s: -1 if s is None else s):
+            for _, symbol, _, fields in self.parts[sheet]:
+                rows.append([symbol] + [v for _, v in fields])
+        return header, rows
+
+    # KiCad 5 files.
+
+    def sch_V5(self, sheet):
+        """Return the contents of a KiCad 5 schematic sheet."""
+        out = [
+            "EESchema Schematic File Version 4\n",
+            "EELAYER 30 0\n",
+            "EELAYER END\n",
+            "$Descr A4 11693 8268\n",
+            "encoding utf-8\n",
+            "Sheet 1 1\n",
+            'Title ""\n',
+            "$EndDescr\n",
+        ]
+        paths = [path for s, path in self.instances if s == sheet]
+        for n, (part_id, symbol, prefix, fields) in enumerate(self.parts[sheet]):
+            x, y = 1000 + 500 * (n % 20), 1000 + 500 * (n // 20)
+            refs = [self.refs[(path, part_id)] for path in paths]
+            out.append("$Comp\n")
+            out.append("L {}:{} {}\n".format(PROJECT_NAME, symbol, refs[0]))
+            out.append("U 1 1 {}\n".format(part_id))
+            out.append("P {} {}\n".format(x, y))
+            if sheet is not None:
+                for path, ref in zip(paths, refs):
+                    out.append(
+                        'AR Path="{}/{}" Ref="{}"  Part="1" \n'.format(
+                            path, part_id, ref
+                        )
+                    )
+            out.append('F 0 "{}" H {} {} 50  0000 C CNN\n'.format(refs[0], x, y - 100))
+            for i, (name, value) in enumerate(fields, 1):
+                visible = "0000" if name == "value" else "0001"
+                custom = "" if i <= 3 else ' "{}"'.format(name)
+                out.append(
+                    'F {} "{}" H {} {} 50  {} C CNN{}\n'.format(
+                        i, value, x, y + 100, visible, custom
+                    )
+                )
+            out.append("\t1    {} {}\n".format(x, y))
+            out.append("\t1    0    0    -1  \n")
+            out.append("$EndComp\n")
+        for n, (placement_id, sub_sheet) in enumerate(self.placements[sheet]):
+            out.append("$Sheet\n")
+            out.append("S {} 7000 1000 500\n".format(1000 + 1200 * n))
+            out.append("U {}\n".format(placement_id))
+            out.append('F0 "Sheet{}" 50\n'.format(n))
+            out.append('F1 "{}" 50\n'.format(self.sheet_filename(sub_sheet)))
+            out.append("$EndSheet\n")
+        out.append("$EndSCHEMATC\n")
+        return "".join(out)
+
+    def lib_V5(self):
+        """Return the contents of a KiCad 5 part library."""
+        out = ["EESchema-LIBRARY Version 2.4\n", "#encoding utf-8\n"]
+        for parts in self.parts.values():
+            for _, symbol, prefix, fields in parts:
+                out.append("#\n# {}\n#\n".format(symbol))
+                out.append("DEF {} {} 0 40 Y Y 1 F N\n".format(symbol, prefix))
+                out.append('F0 "{}" 0 100 50 H V C CNN\n'.format(prefix))
+                for i, (name, value) in enumerate(fields, 1):
+                    if name == "value":
+                        value = symbol
+                    custom = "" if i <= 3 else ' "{}"'.format(name)
+                    out.append(
+                        'F{} "{}" 0 -100 50 H I C CNN{}\n'.format(i, value, custom)
+                    )
+                out.append("DRAW\n")
+                out.append("S -100 100 100 -100 0 1 0 N\n")
+                out.append("X ~ 1 -200 0 100 R 50 50 1 1 P\n")
+                out.append("X ~ 2 200 0 100 L 50 50 1 1 P\n")
+                out.append("ENDDRAW\n")
+                out.append("ENDDEF\n")
+        out.append("#\n#End Library\n")
+        return "".join(out)
+
+    def dcm_V5(self):
+        """Return the contents of a KiCad 5 part description file."""
+        out = ["EESchema-DOCLIB  Version 2.0\n"]
+        for parts in self.parts.values():
+            for _, symbol, _, fields in parts:
+                out.append("#\n$CMP {}\n".format(symbol))
+                out.append("D {} {}\n".format(fields[0][1], symbol))
+                out.append("K bench {}\n".format(symbol.lower()))
+                out.append("F http://example.com/{}.pdf\n".format(symbol))
+                out.append("$ENDCMP\n")
+        out.append("#\n#End Doc Library\n")
+        return "".join(out)
+
+    # KiCad 6 and 7 files.
+
+    def sexp_property(self, name, value, id, at, indent):
+        """Return an S-expression for a symbol or sheet property."""
+        id = " (id {})".format(id) if self.version == 6 else ""
+        return (
+            '{0}(property "{1}" "{2}"{3} (at {4})\n'
+            "{0}  (effects (font (size 1.27 1.27)) hide)\n"
+            "{0})\n"
+        ).format(indent, name, value, id, at)
+
+    def sch_V6(self, sheet):
+        """Return the contents of a KiCad 6 or 7 schematic sheet."""
+        sheet_id = self.root_id if sheet is None else self.new_id()
+        out = [
+            "(kicad_sch (version {}) (generator eeschema)\n\n".format(
+                SEXP_VERSIONS[self.version][0]
+            ),
+            "  (uuid {})\n\n".format(sheet_id),
+            '  (paper "A4")\n\n',
+            "  (lib_symbols)\n\n",
+        ]
+        paths = [path for s, path in self.instances if s == sheet]
+        for n, (part_id, symbol, prefix, fields) in enumerate(self.parts[sheet]):
+            at = "{} {} 0".format(25.4 + 12.7 * (n % 20), 25.4 + 12.7 * (n // 20))
+            refs = [self.refs[(path, part_id)] for path in paths]
+            out.append(
+                '  (symbol (lib_id "{}:{}") (at {}) (unit 1)\n'.format(
+                    PROJECT_NAME, symbol, at
+                )
+            )
+            out.append("    (in_bom yes) (on_board yes)\n")
+            out.append("    (uuid {})\n".format(part_id))
+            out.append(self.sexp_property("Reference", refs[0], 0, at, "    "))
+            for i, (name, value) in enumerate(fields, 1):
+                out.append(
+                    self.sexp_property(self.field_name(name), value, i, at, "    ")
+                )
+            out.append('    (pin "1" (uuid {}))\n'.format(self.new_id()))
+            out.append('    (pin "2" (uuid {}))\n'.format(self.new_id()))
+            if self.version >= 7:
+                out.append('    (instances\n      (project "{}"\n'.format(PROJECT_NAME))
+                for path, ref in zip(paths, refs):
+                    out.append(
+                        '        (path "/{}{}"\n          (reference "{}") (unit 1)\n        )\n'.format(
+                            self.root_id, path, ref
+                        )
+                    )
+                out.append("      )\n    )\n")
+            out.append("  )\n\n")
+        for n, (placement_id, sub_sheet) in enumerate(self.placements[sheet]):
+            at = "{} 200 0".format(25.4 + 30.48 * n)
+            out.append("  (sheet (at {}) (size 25.4 12.7)\n".format(at))
+            out.append("    (uuid {})\n".format(placement_id))
+            out.append(
+                self.sexp_property("Sheet name", "Sheet{}".format(n), 0, at, "    ")
+            )
+            out.append(
+                self.sexp_property(
+                    "Sheet file", self.sheet_filename(sub_sheet), 1, at, "    "
+                )
+            )
+            out.append("  )\n\n")
+        if sheet is None and self.version == 6:
+            # KiCad 6 keeps the references of every part instance in the root sheet.
+            out.append("  (symbol_instances\n")
+            for inst_sheet, path in self.instances:
+                for part_id, _, _, fields in self.parts[inst_sheet]:
+                    out.append(
+                        '    (path "{}/{}"\n      (reference "{}") (unit 1) (value "{}") (footprint "{}")\n    )\n'.format(
+                            path,
+                            part_id,
+                            self.refs[(path, part_id)],
+                            fields[0][1],
+                            fields[1][1],
+                        )
+                    )
+            out.append("  )\n")
+        out.append(")\n")
+        return "".join(out)
+
+    def lib_V6(self):
+        """Return the contents of a KiCad 6 or 7 symbol library."""
+        out = [
+            "(kicad_symbol_lib (version {}) (generator kicad_symbol_editor)\n".format(
+                SEXP_VERSIONS[self.version][1]
+            )
+        ]
+        for parts in self.parts.values():
+            for _, symbol, prefix, fields in parts:
+                out.append(
+                    '  (symbol "{}" (in_bom yes) (on_board yes)\n'.format(symbol)
+                )
+                out.append(
+                    self.sexp_property("Reference", prefix, 0, "0 2.54 0", "    ")
+                )
+                for i, (name, value) in enumerate(fields, 1):
+                    if name == "value":
+                        value = symbol
+                    out.append(
+                        self.sexp_property(
+                            self.field_name(name), value, i, "0 0 0", "    "
+                        )
+                    )
+                out.append('    (symbol "{}_1_1"\n'.format(symbol))
+                out.append("      (rectangle (start -2.54 2.54) (end 2.54 -2.54)\n")
+                out.append("        (stroke (width 0.254)) (fill (type none))\n")
+                out.append("      )\n")
+                for pin, x, angle in (("1", -5.08, 0), ("2", 5.08, 180)):
+                    out.append(
+                        "      (pin passive line (at {} 0 {}) (length 2.54)\n".format(
+                            x, angle
+                        )
+                    )
+                    out.append('        (name "~" (effects (font (size 1.27 1.27))))\n')
+                    out.append(
+                        '        (number "{}" (effects (font (size 1.27 1.27))))\n'.format(
+                            pin
+                        )
+                    )
+                    out.append("      )\n")
+                out.append("    )\n  )\n")
+        out.append(")\n")
+        return "".join(out)
+
+    def write(self, dirname):
+        """Write the project files into a directory.
+
+        Args:
+            dirname (string): Directory for the files (created if needed).
+
+        Returns:
+            dict: Path of each file keyed by its kind: sch (the root schematic),
+                lib, dcm (KiCad 5 only), csv and xlsx (the project BOM), and
+                lib_csv (a BOM of the library symbols).
+        """
+
+        if not os.path.isdir(dirname):
+            os.makedirs(dirname)
+        files = {}
+
+        def write_file(kind, filename, contents):
+            path = os.path.join(dirname, filename)
+            with io.open(path, "w", encoding="utf-8") as fp:
+                fp.write(contents)
+            if kind:
+                files[kind] = path
+
+        if self.version == 5:
+            for sheet in self.parts:
+                kind = "sch" if sheet is None else None
+                write_file(kind, self.sheet_filename(sheet), self.sch_V5(sheet))
+            write_file("lib", PROJECT_NAME + ".lib", self.lib_V5())
+            write_file("dcm", PROJECT_NAME + ".dcm", self.dcm_V5())
+        else:
+            for sheet in self.parts:
+                kind = "sch" if sheet is None else None
+                write_file(kind, self.sheet_filename(sheet), self.sch_V6(sheet))
+            write_file("lib", PROJECT_NAME + ".kicad_sym", self.lib_V6())
+
+        header, rows = self.bom_rows()
+        csv_file = io.StringIO()
+        writer = csv.writer(csv_file, lineterminator="\n")
+        writer.writerow(header)
+        writer.writerows(rows)
+        write_file("csv", PROJECT_NAME + ".csv", csv_file.getvalue())
+
+        wb = pyxl.Workbook()
+        ws = wb.active
+        ws.append(header)
+        for row in rows:
+            ws.append(row)
+        files["xlsx"] = os.path.join(dirname, PROJECT_NAME + ".xlsx")
+        wb.save(files["xlsx"])
+
+        header, rows = self.lib_bom_rows()
+        csv_file = io.StringIO()
+        writer = csv.writer(csv_file, lineterminator="\n")
+        writer.writerow(header)
+        writer.writerows(rows)
+        write_file("lib_csv", PROJECT_NAME + "_lib.csv", csv_file.getvalue())
+
+        return files
+
+
+def make_project(dirname, **params):
+    """Generate a synthetic project in a directory.
+
+    Args:
+        dirname (string): Directory for the project files.
+        params: Arguments for Project().
+
+    Returns:
+        tuple: The Project and the dict of its files from Project.write().
+    """
+
+    project = Project(**params)
+    return project, project.write(dirname)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic KiCad project.")
+    parser.add_argument("dir", help="Directory for the project files.")
+    parser.add_argument("--version", type=int, choices=(5, 6, 7), default=6)
+    parser.add_argument(
+        "--sheets", type=int, default=4, help="Number of sub-sheet files."
+    )
+    parser.add_argument(
+        "--depth", type=int, default=2, help="Depth of the sheet hierarchy."
+    )
+    parser.add_argument(
+        "--reuse", type=int, default=1, help="Placements of each sub-sheet."
+    )
+    parser.add_argument(
+        "--parts", type=int, default=50, help="Parts on each sheet file."
+    )
+    parser.add_argument(
+        "--fields", type=int, default=4, help="Extra fields on each part."
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    project, files = make_project(
+        args.dir,
+        version=args.version,
+        num_sheets=args.sheets,
+        depth=args.depth,
+        reuse=args.reuse,
+        parts_per_sheet=args.parts,
+        fields_per_part=args.fields,
+        seed=args.seed,
+    )
+    print(
+        "{} part instances on {} sheet instances, {} library symbols.".format(
+            project.num_parts, len(project.instances), project.num_symbols
+        )
+    )
+    for kind, path in sorted(files.items()):
+        print("{:<8} {}".format(kind, path))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+
+# MIT License / Copyright (c) 2021 by Dave Vandenbout.
+
+"""Benchmark combining the part fields extracted from a growing number of sources.
+
+The time per source should stay flat as the number of sources grows.
+
+Run with: python tests/unit/bench_combine.py
+"""
+
+from __future__ import print_function
+
+import timeit
+
+from kifield import kifield
+
+
+def make_sources(num_sources, num_parts, num_fields=20):
+    """Return part field dicts for overlapping sets of parts."""
+    sources = []
+    for s in range(num_sources):
+        first = s * num_parts // 2  # Each source overlaps half of the previous one.
+        sources.append(
+            {
+                "R{}".format(i): {
+                    "field{}".format(f): "{}-{}".format(s, f) for f in range(num_fields)
+                }
+                for i in range(first, first + num_parts)
+            }
+        )
+    return sources
+
+
+def combine_all(sources):
+    part_fields_dict = {}
+    for source in sources:
+        part_fields_dict = kifield.combine_part_field_dicts(source, part_fields_dict)
+    return part_fields_dict
+
+
+def main():
+    print(
+        "{:>8} {:>8} {:>10} {:>15}".format(
+            "sources", "parts", "total (s)", "per source (ms)"
+        )
+    )
+    for num_sources in (1, 5, 10, 20, 40):
+        sources = make_sources(num_sources, 2000)
+        t = min(timeit.repeat(lambda: combine_all(sources), number=1, repeat=3))
+        num_parts = len(combine_all(sources))
+        print(
+            "{:>8} {:>8} {:>10.3f} {:>15.2f}".format(
+                num_sources, num_parts, t, t / num_sources * 1e3
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
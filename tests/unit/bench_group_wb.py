@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+
+# MIT License / Copyright (c) 2021 by Dave Vandenbout.
+
+"""Benchmark group_wb() as the number of rows and distinct groups grow.
+
+Run with: python tests/unit/bench_group_wb.py
+"""
+
+from __future__ import print_function
+
+import timeit
+
+import openpyxl as pyxl
+
+from kifield import kifield
+
+
+def make_wb(num_rows, num_groups):
+    """Return a workbook with num_rows parts spread across num_groups field values."""
+    wb = pyxl.Workbook()
+    ws = wb.active
+    ws.append(("Refs", "value", "footprint", "manf#"))
+    for i in range(num_rows):
+        g = i % num_groups
+        ws.append(("R{}".format(i + 1), "{}K".format(g), "0603", "MPN-{}".format(g)))
+    return wb
+
+
+def main():
+    print(
+        "{:>8} {:>8} {:>11} {:>11}".format("rows", "groups", "range (s)", "norange (s)")
+    )
+    for num_rows in (1000, 10000, 100000):
+        for num_groups in (10, 1000, 5000):
+            if num_groups > num_rows:
+                continue
+            wb = make_wb(num_rows, num_groups)
+            t_range = min(
+                timeit.repeat(lambda: kifield.group_wb(wb), number=1, repeat=3)
+            )
+            t_norange = min(
+                timeit.repeat(
+                    lambda: kifield.group_wb(wb, no_range=True), number=1, repeat=3
+                )
+            )
+            print(
+                "{:>8} {:>8} {:>11.3f} {:>11.3f}".format(
+                    num_rows, num_groups, t_range, t_norange
+                )
+            )
+
+
+if __name__ == "__main__":
+    main()
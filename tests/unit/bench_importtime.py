@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+
+# MIT License / Copyright (c) 2021 by Dave Vandenbout.
+
+"""Benchmark how long KiField takes to start up.
+
+Reports the cumulative import time of each module (from python -X importtime)
+and the wall-clock time of a few commands that don't process any files.
+
+Run with: python tests/unit/bench_importtime.py
+"""
+
+from __future__ import print_function
+
+import subprocess
+import sys
+import timeit
+
+MODULES = ("kifield.__main__", "kifield.kifield", "kifield.server")
+
+RUN_MAIN = "import sys; from kifield.__main__ import main; sys.argv = {!r}; main()"
+
+COMMANDS = (
+    ("kifield -v", RUN_MAIN.format(["kifield", "-v"])),
+    ("kifield --help", RUN_MAIN.format(["kifield", "--help"])),
+)
+
+
+def import_times(module):
+    """Return the cumulative import time in microseconds of each module imported by importing a module."""
+    out = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import " + module],
+        stderr=subprocess.PIPE,
+        check=True,
+    ).stderr.decode("utf-8")
+    times = {}
+    for line in out.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:") :].split("|")
+        times[name.strip()] = int(cumulative)
+    return times
+
+
+def run_time(code):
+    """Return the best wall-clock time of running some code in a new interpreter."""
+    cmd = [sys.executable, "-c", code]
+    return min(
+        timeit.repeat(
+            lambda: subprocess.run(cmd, stdout=subprocess.DEVNULL, check=False),
+            number=1,
+            repeat=5,
+        )
+    )
+
+
+def main():
+    print("{:<40} {:>12}".format("import", "time (ms)"))
+    for module in MODULES:
+        times = min((import_times(module) for _ in range(5)), key=lambda t: t[module])
+        print("{:<40} {:>12.1f}".format(module, times[module] / 1000.0))
+        for backend in ("openpyxl", "sexpdata", "future"):
+            if backend in times:
+                print(
+                    "{:<40} {:>12.1f}".format("  " + backend, times[backend] / 1000.0)
+                )
+
+    print()
+    print("{:<40} {:>12}".format("command", "time (ms)"))
+    print("{:<40} {:>12.1f}".format("python -c pass", run_time("pass") * 1000))
+    for label, code in COMMANDS:
+        print("{:<40} {:>12.1f}".format(label, run_time(code) * 1000))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+
+# MIT License / Copyright (c) 2021 by Dave Vandenbout.
+
+"""Compare the memory and speed of a PartTable against a dict of part field dicts.
+
+Field names are fresh strings for every part, the way the parsers create them.
+Four sets of parts are measured:
+
+* dense: every part has the same field names and a value of its own, and the
+  other values are shared so the measurement shows the cost of the
+  containers and field names.
+* sparse: each part has a few fields picked from a large set of names, like
+  the properties of parts from many different libraries.
+* fresh: like dense, but every value is a fresh string the way the parsers
+  create them, so the value pool has something to share.
+* identical: like fresh, but the parts all have the same values, like the
+  bypass capacitors of a board, so they share a single row.
+
+Run with: python tests/unit/bench_parttable.py [num_parts] [num_fields]
+"""
+
+from __future__ import print_function
+
+import random
+import sys
+import timeit
+import tracemalloc
+
+from kifield.parttable import PartTable
+
+VALUES = [
+    "10K",
+    "0603",
+    "Yageo",
+    "https://example.com/datasheet.pdf",
+    "Resistor_SMD:R_0603_1608Metric",
+]
+
+# Field names the sparse parts pick their fields from, and how many each one has.
+SPARSE_NAMES = 500
+SPARSE_FIELDS = 6
+
+
+def make_parts(num_parts, num_fields, sparse=False, fresh=False, identical=False):
+    """Generate (ref, fields) pairs for a set of parts."""
+    rnd = random.Random(num_parts)
+    for i in range(num_parts):
+        if sparse:
+            fields = rnd.sample(range(SPARSE_NAMES), num_fields)
+        else:
+            fields = range(num_fields)
+        part_fields = {}
+        for f in fields:
+            value = VALUES[f % len(VALUES)]
+            if fresh:
+                value = (value + " ")[:-1]
+            part_fields["".join(("field", str(f)))] = value
+        if not identical:
+            part_fields["field0"] = str(i)
+        yield "R{}".format(i), part_fields
+
+
+def measure(build):
+    """Return the object created by build(), the memory it occupies and the time taken."""
+    tracemalloc.start()
+    obj = build()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return obj, size, timeit.timeit(build, number=1)
+
+
+def build_table(parts):
+    table = PartTable()
+    for ref, fields in parts:
+        table[ref] = fields
+    return table
+
+
+def iterate(parts):
+    """Go through every field of every part, the way the insertion functions do."""
+    n = 0
+    for fields in parts.values():
+        for name, value in fields.items():
+            n += 1
+    return n
+
+
+def clean(v):
+    return v.strip()
+
+
+def clean_dicts(dicts):
+    for fields in dicts.values():
+        for k, v in fields.items():
+            fields[k] = clean(v)
+
+
+def bench(name, num_parts, num_fields, **kwargs):
+    dicts, dicts_size, t_dicts = measure(
+        lambda: dict(make_parts(num_parts, num_fields, **kwargs))
+    )
+    table, table_size, t_table = measure(
+        lambda: build_table(make_parts(num_parts, num_fields, **kwargs))
+    )
+    num_values, num_distinct, saved = table.value_stats()
+
+    print("{}: {} parts x {} fields".format(name, num_parts, num_fields))
+    print(
+        "  memory:  dicts {:7.1f} MB, PartTable {:7.1f} MB ({:.1f}x smaller)".format(
+            dicts_size / 1e6, table_size / 1e6, dicts_size / float(table_size)
+        )
+    )
+    print(
+        "  pool:    {} values shared as {} objects, saving {:.1f} MB".format(
+            num_values, num_distinct, saved / 1e6
+        )
+    )
+    print("  build:   dicts {:.3f} s, PartTable {:.3f} s".format(t_dicts, t_table))
+    for op, dicts_op, table_op in (
+        ("iterate", lambda: iterate(dicts), lambda: iterate(table)),
+        ("clean", lambda: clean_dicts(dicts), lambda: table.map_values(clean)),
+    ):
+        print(
+            "  {:<8} dicts {:.3f} s, PartTable {:.3f} s".format(
+                op + ":",
+                timeit.timeit(dicts_op, number=1),
+                timeit.timeit(table_op, number=1),
+            )
+        )
+
+
+def main():
+    num_parts = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    num_fields = int(sys.argv[2]) if len(sys.argv) > 2 else 40
+
+    bench("dense", num_parts, num_fields)
+    bench("sparse", num_parts // 5, SPARSE_FIELDS, sparse=True)
+    bench("fresh", num_parts // 5, num_fields, fresh=True)
+    bench("identical", num_parts // 5, num_fields, fresh=True, identical=True)
+
+
+if __name__ == "__main__":
+    main()
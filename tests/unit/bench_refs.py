@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+
+# MIT License / Copyright (c) 2021 by Dave Vandenbout.
+
+"""Microbenchmarks for the reference codec.
+
+Run with: python tests/unit/bench_refs.py
+"""
+
+from __future__ import print_function
+
+import timeit
+
+from kifield import refs
+
+
+def bench(label, stmt, number):
+    t = min(timeit.repeat(stmt, number=number, repeat=3)) / number
+    print("{:<40} {:>12.2f} us".format(label, t * 1e6))
+
+
+def main():
+    individual = ["C{}".format(i) for i in range(1, 10001) if i % 7]
+
+    bench("quote", lambda: refs.quote("10K"), 100000)
+    bench("unquote", lambda: refs.unquote('"10K"'), 100000)
+    bench("explode single", lambda: refs.explode("C12"), 100000)
+    bench(
+        "explode 'C1-C3,C7,C10-C13'", lambda: refs.explode("C1-C3,C7,C10-C13"), 100000
+    )
+    bench(
+        "parse_refs 'C1-C3,C7,C10-C13'",
+        lambda: refs.parse_refs("C1-C3,C7,C10-C13"),
+        100000,
+    )
+    bench(
+        "parse_refs uncached 'C1-C3,C7,C10-C13'",
+        lambda: refs.parse_refs.__wrapped__("C1-C3,C7,C10-C13"),
+        100000,
+    )
+    bench("parse_refs 'R1-R50000'", lambda: refs.parse_refs("R1-R50000"), 100000)
+    bench("explode 'R1-R50000'", lambda: refs.explode("R1-R50000"), 10)
+    bench(
+        "'R49999' in RefRange", lambda: "R49999" in refs.RefRange("R", 1, 50000), 100000
+    )
+    bench("collapse 8572 refs", lambda: refs.collapse(individual), 10)
+    bench("join_refs 8572 refs", lambda: refs.join_refs(individual), 10)
+    bench("natural_sort_key", lambda: refs.natural_sort_key("U12A"), 100000)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+import os
+import shutil
+
+import pytest
+
+INTEGRATION_DIR = os.path.join(os.path.dirname(__file__), "..", "integration")
+
+# Files of the hierarchical schematic of each KiCad version (top sheet first).
+HIERARCHIES = {
+    "kicad5": ("hier_test.sch", "leaf.sch"),
+    "kicad6": (
+        "hierarchical_schematic.kicad_sch",
+        "leaf1.kicad_sch",
+        "leaf2.kicad_sch",
+    ),
+    "kicad7": (
+        "hierarchical_schematic.kicad_sch",
+        "leaf1.kicad_sch",
+        "leaf2.kicad_sch",
+    ),
+}
+
+
+def copy_hierarchy(version, dest):
+    """Copy the hierarchical schematic of a KiCad version and return the path to its top sheet."""
+    for f in HIERARCHIES[version]:
+        shutil.copy(os.path.join(INTEGRATION_DIR, version, f), str(dest))
+    return str(dest / HIERARCHIES[version][0])
+
+
+@pytest.fixture
+def integration_dir():
+    return INTEGRATION_DIR
+
+
+@pytest.fixture
+def kicad5_hierarchy(tmp_path):
+    return copy_hierarchy("kicad5", tmp_path)
+
+
+@pytest.fixture
+def kicad6_hierarchy(tmp_path):
+    return copy_hierarchy("kicad6", tmp_path)
+
+
+@pytest.fixture
+def kicad7_hierarchy(tmp_path):
+    return copy_hierarchy("kicad7", tmp_path)
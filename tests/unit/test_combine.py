@@ -0,0 +1,33 @@
+from kifield import kifield
+
+
+def test_combine_last_wins():
+    to_dict = {"C1": {"value": "1uF", "footprint": "0603"}}
+    from_dict = {"C1": {"value": "2uF"}, "R1": {"value": "1K"}}
+
+    comb_dict = kifield.combine_part_field_dicts(from_dict, to_dict)
+
+    assert comb_dict is to_dict
+    assert comb_dict == {
+        "C1": {"value": "2uF", "footprint": "0603"},
+        "R1": {"value": "1K"},
+    }
+
+
+def test_combine_leaves_from_dict_alone():
+    from_dict = {"C1": {"value": "1uF"}}
+
+    comb_dict = kifield.combine_part_field_dicts(from_dict, None)
+    comb_dict = kifield.combine_part_field_dicts({"C1": {"value": "2uF"}}, comb_dict)
+
+    assert comb_dict == {"C1": {"value": "2uF"}}
+    assert from_dict == {"C1": {"value": "1uF"}}
+
+
+def test_combine_no_union():
+    to_dict = {"C1": {"value": "1uF"}}
+    from_dict = {"C1": {"footprint": "0603"}, "R1": {"value": "1K"}}
+
+    comb_dict = kifield.combine_part_field_dicts(from_dict, to_dict, do_union=False)
+
+    assert comb_dict == {"C1": {"value": "1uF", "footprint": "0603"}}
@@ -1,4 +1,4 @@
-from kifield.common import explode, collapse
+from kifield.common import collapse, explode, summarize_part_fields
 
 
 def test_explode_works():
@@ -149,3 +149,15 @@ def test_collapse_empty():
 #             assert collapse(
 #                 explode(collapse(references))
 #             ) == collapse(references)
+
+
+def test_summarize_part_fields():
+    part_fields = {"R{}".format(i): {"value": "1K"} for i in range(100)}
+    summary = summarize_part_fields(part_fields, max_parts=3)
+    assert summary.startswith("100 parts (showing 3):")
+    assert summary.count("1K") == 3
+    assert (
+        summarize_part_fields({"R1": {"value": "1K"}})
+        == "1 parts:\n{'R1': {'value': '1K'}}"
+    )
+    assert len(summarize_part_fields(part_fields, max_chars=20)) == 24
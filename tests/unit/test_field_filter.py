@@ -0,0 +1,40 @@
+from kifield import kifield
+
+
+def test_cull_exact_case_insensitive():
+    fields = ["Reference", "Value", "Footprint", "MPN"]
+    kifield.cull_list(fields, ["value", "mpn"])
+    assert fields == ["Value", "MPN"]
+
+
+def test_cull_fuzzy():
+    fields = ["manf#", "Footprint"]
+    kifield.cull_list(fields, ["manf"])
+    assert fields == ["manf#"]
+
+
+def test_cull_globs():
+    fields = ["MPN", "MPN2", "ki_keywords", "ki_fp_filters", "Value"]
+    kifield.cull_list(fields, None, ["ki_*"])
+    assert fields == ["MPN", "MPN2", "Value"]
+    kifield.cull_list(fields, ["mpn*"])
+    assert fields == ["MPN", "MPN2"]
+
+
+def test_cull_no_lists():
+    fields = ["Value", None]
+    kifield.cull_list(fields, None, [])
+    assert fields == ["Value", None]
+
+
+def test_field_filter_shared():
+    assert kifield.get_field_filter(["a"], None) is kifield.get_field_filter(["a"], [])
+
+
+def test_cull_visibility_prefixes():
+    fields = ["[I]manf#", "value", "[V]footprint"]
+    kifield.cull_list(fields, ["[I]manf#", "[v]footprint"])
+    assert fields == ["[I]manf#", "[V]footprint"]
+    fields = ["[I]manf#", "value", "footprint"]
+    kifield.cull_list(fields, None, ["[I]manf#"])
+    assert fields == ["value", "footprint"]
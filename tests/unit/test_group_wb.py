@@ -1,4 +1,5 @@
 import openpyxl as pyxl
+import pytest
 from kifield import kifield
 
 
@@ -21,6 +22,7 @@ def test_groups():
     assert values[0] == header
     assert values[1] == ("C1-C3", "1", "1", "1")
 
+
 def test_groups2():
     wb = pyxl.Workbook()
     ws = wb.active
@@ -67,3 +69,119 @@ def test_groups3():
     values = tuple(ws.values)
     assert values[0] == header
     assert values[1] == ("C1, C2, C3", "1", "1", "1")
+
+
+def test_groups_first_seen_order():
+    wb = pyxl.Workbook()
+    ws = wb.active
+    header = ("Ref", "x")
+    ws.append(header)
+    ws.append(("R10", "2"))
+    ws.append(("C1", "1"))
+    ws.append(("R2", "2"))
+    ws.append(("C2", "1"))
+
+    values = tuple(kifield.group_wb(wb).active.values)
+    assert values[1:] == (("R2, R10", "2"), ("C1, C2", "1"))
+
+    values = tuple(kifield.group_wb(wb, no_range=True).active.values)
+    assert values[1:] == (("R2, R10", "2"), ("C1, C2", "1"))
+
+
+def test_ungroup_untouched():
+    wb = pyxl.Workbook()
+    ws = wb.active
+    ws.append(("Ref", "x"))
+    ws.append(("C1", "1"))
+    ws.append(("C2", "1"))
+    cell = ws["A2"]
+
+    ungrouped_wb = kifield.ungroup_wb(wb)
+
+    assert ungrouped_wb is wb
+    assert ungrouped_wb.active["A2"] is cell
+
+
+def test_ungroup():
+    wb = pyxl.Workbook()
+    ws = wb.active
+    header = ("Ref", "x", "y")
+    ws.append(header)
+    ws.append(("C1-C3", "1", "1"))
+    ws.append(("R1, R2", "2", None))
+
+    ws = kifield.ungroup_wb(wb).active
+
+    values = tuple(ws.values)
+    assert values[0] == header
+    assert values[1:] == (
+        ("C1", "1", "1"),
+        ("C2", "1", "1"),
+        ("C3", "1", "1"),
+        ("R1", "2", None),
+        ("R2", "2", None),
+    )
+
+
+@pytest.mark.parametrize(
+    "refs, ungrouped",
+    [("C2", [("C2", "2")]), ("C2, C3", [("C2", "2"), ("C3", "2")])],
+)
+def test_ungroup_drops_rows_without_refs(refs, ungrouped):
+    # Rows without a reference are dropped whether or not any row is grouped.
+    wb = pyxl.Workbook()
+    ws = wb.active
+    ws.append(("Ref", "x"))
+    ws.append(("C1", "1"))
+    ws.append((None, "note"))
+    ws.append((refs, "2"))
+    ws.append(("", "3"))
+
+    values = tuple(kifield.ungroup_wb(wb).active.values)
+
+    assert list(values[1:]) == [("C1", "1")] + ungrouped
+
+
+def test_ungroup_in_place():
+    wb = pyxl.Workbook()
+    ws = wb.active
+    ws.append(("Ref", "x"))
+    ws.append(("C1-C3", "1"))
+    ws.append((None, "2"))
+    ws.append((None, "3"))
+    ws.append(("R1, R2", "4"))
+    ws.append(("R3", "5"))
+
+    ref_rows = kifield.ungroup_ws(ws)
+
+    assert tuple(ws.values)[1:] == (
+        ("C1", "1"),
+        ("C2", "1"),
+        ("C3", "1"),
+        ("R1", "4"),
+        ("R2", "4"),
+        ("R3", "5"),
+    )
+    assert ref_rows == {
+        "C1": [2],
+        "C2": [3],
+        "C3": [4],
+        "R1": [5],
+        "R2": [6],
+        "R3": [7],
+    }
+
+
+def test_groups_indexed_refs():
+    # References are read the same way as when indexing them, so grouped
+    # references are merged and rows without one are left out.
+    wb = pyxl.Workbook()
+    ws = wb.active
+    ws.append(("Ref", "x"))
+    ws.append(("C1, C2", "1"))
+    ws.append((None, "1"))
+    ws.append(("C3", "1"))
+
+    values = tuple(kifield.group_wb(wb).active.values)
+
+    assert values[1:] == (("C1-C3", "1"),)
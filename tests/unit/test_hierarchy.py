@@ -0,0 +1,22 @@
+from kifield import kifield
+from kifield.sch import Schematic_V6
+
+
+def test_parallel_extract_sch(kicad5_hierarchy):
+    filename = kicad5_hierarchy
+    serial = kifield.extract_part_fields_from_sch(filename, recurse=True)
+    parallel = kifield.extract_part_fields_from_sch(filename, recurse=True, jobs=2)
+    assert list(parallel) == list(serial)
+    assert parallel.to_dict() == serial.to_dict()
+
+
+def test_parallel_parse_sch_V6(kicad7_hierarchy):
+    filename = kicad7_hierarchy
+    serial = Schematic_V6(filename)
+    parallel = Schematic_V6(filename, jobs=2)
+    assert [f for f, _ in parallel.iter_sheets()] == [
+        f for f, _ in serial.iter_sheets()
+    ]
+    assert [(c.uuid_path, c.get_ref()) for c in parallel.components] == [
+        (c.uuid_path, c.get_ref()) for c in serial.components
+    ]
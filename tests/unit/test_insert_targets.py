@@ -0,0 +1,27 @@
+from kifield import kifield
+
+
+def test_group_insertion_targets():
+    filenames = [
+        "a.csv",
+        "b.kicad_sym",
+        "lib/x.lib",
+        "a.csv",
+        "lib/x.dcm",
+        "top.sch",
+        "sub.sch",
+    ]
+
+    assert kifield.group_insertion_targets(filenames, recurse=False) == [
+        [0, 3],
+        [1],
+        [2, 4],
+        [5],
+        [6],
+    ]
+    assert kifield.group_insertion_targets(filenames, recurse=True) == [
+        [0, 3],
+        [1],
+        [2, 4],
+        [5, 6],
+    ]
@@ -0,0 +1,17 @@
+import os.path
+
+from kifield.common import run_jobs
+
+
+def test_run_jobs_in_order():
+    paths = [("a/x",), ("b/y",), ("c/z",)]
+    for jobs in (1, 2):
+        results = list(run_jobs(os.path.basename, paths, jobs))
+        assert results == [("x", None), ("y", None), ("z", None)]
+
+
+def test_run_jobs_errors():
+    results = list(run_jobs(os.path.basename, [("a/x",), (None,)], 2))
+    assert results[0] == ("x", None)
+    assert results[1][0] is None
+    assert "TypeError" in results[1][1]
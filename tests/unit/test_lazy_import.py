@@ -0,0 +1,19 @@
+import subprocess
+import sys
+
+from kifield.common import LazyModule
+
+
+def test_lazy_module():
+    json = LazyModule("json")
+    assert json._module is None
+    assert json.loads("[1]") == [1]
+    assert json._module is not None
+
+
+def test_format_backends_not_imported_at_startup():
+    code = (
+        "import sys, kifield.__main__, kifield.kifield; "
+        "print(' '.join(m for m in ('openpyxl', 'sexpdata', 'future') if m in sys.modules))"
+    )
+    assert subprocess.check_output([sys.executable, "-c", code]).strip() == b""
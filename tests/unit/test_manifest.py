@@ -0,0 +1,60 @@
+from kifield import kifield
+from kifield.manifest import (
+    changed_parts,
+    file_hashes,
+    files_unchanged,
+    load_manifest,
+    part_hashes,
+    save_manifest,
+)
+
+
+def test_changed_parts():
+    hashes = part_hashes({"R1": {"value": "1K"}, "R2": {"value": "2K"}})
+    part_fields_dict = {
+        "R1": {"value": "1K"},
+        "R2": {"value": "2.2K"},
+        "R3": {"value": "3K"},
+    }
+    assert changed_parts(part_fields_dict, hashes) == ["R2", "R3"]
+
+
+def test_manifest_round_trip(tmp_path):
+    data_file = str(tmp_path / "data.txt")
+    with open(data_file, "w") as fp:
+        fp.write("data")
+    manifest_file = str(tmp_path / "manifest.json")
+    save_manifest(manifest_file, {"inputs": file_hashes([data_file])})
+    manifest = load_manifest(manifest_file)
+    assert files_unchanged(manifest["inputs"])
+
+    with open(data_file, "w") as fp:
+        fp.write("changed")
+    assert not files_unchanged(manifest["inputs"])
+
+    assert load_manifest(str(tmp_path / "missing.json")) is None
+
+
+def test_kifield_manifest(tmp_path, monkeypatch):
+    src = str(tmp_path / "src.csv")
+    dst = str(tmp_path / "dst.csv")
+    manifest_file = str(tmp_path / "manifest.json")
+    with open(src, "w") as fp:
+        fp.write("Refs,value\nR1,1K\nR2,2K\n")
+
+    kifield.kifield(src, dst, backup=False, manifest_filename=manifest_file)
+    assert open(dst).read() == "Refs,value\nR1,1K\nR2,2K\n"
+
+    # Nothing changed, so nothing is even extracted.
+    def extract_part_fields(*args):
+        raise AssertionError("Fields extracted when nothing changed.")
+
+    monkeypatch.setattr(kifield, "extract_part_fields", extract_part_fields)
+    kifield.kifield(src, dst, backup=False, manifest_filename=manifest_file)
+    monkeypatch.undo()
+
+    # Only the changed part is inserted.
+    with open(src, "w") as fp:
+        fp.write("Refs,value\nR1,1K\nR2,2.2K\n")
+    kifield.kifield(src, dst, backup=False, manifest_filename=manifest_file)
+    assert open(dst).read() == "Refs,value\nR1,1K\nR2,2.2K\n"
@@ -0,0 +1,63 @@
+from kifield import kifield
+from kifield.memstats import MemStats, format_report, memstats
+from kifield.stats import stats
+
+
+def measure(func):
+    memstats.enabled = True
+    memstats.clear()
+    memstats.start()
+    try:
+        func()
+    finally:
+        memstats.stop()
+        memstats.enabled = False
+
+
+def test_nested_phases():
+    kept = []
+
+    def run():
+        with stats.phase("insert", "a.sch"):
+            with stats.phase("parse", "a.sch"):
+                kept.append(bytearray(2000000))
+                bytearray(3000000)
+            bytearray(1000000)
+
+    measure(run)
+    parse_calls, parse_peak, parse_retained = memstats.memory[("parse", "a.sch")]
+    insert_calls, insert_peak, insert_retained = memstats.memory[("insert", "a.sch")]
+    assert parse_calls == insert_calls == 1
+    assert 5000000 <= parse_peak < 5500000
+    assert 5000000 <= insert_peak < 5500000  # Includes the peak of the nested phase.
+    assert 2000000 <= parse_retained < 2100000
+    assert 2000000 <= insert_retained < 2100000
+    assert memstats.peak >= 5000000
+    assert any(site["size"] >= 2000000 for site in memstats.summary()["sites"])
+
+
+def test_merge():
+    m = MemStats()
+    m.add_memory(("parse", "a.sch"), 100, 10)
+    m.sites = [("a.py:1", 100, 1)]
+    m.merge(
+        (
+            {("parse", "a.sch"): [1, 300, 20]},
+            [("a.py:1", 300, 2), ("b.py:2", 50, 1)],
+            300,
+        )
+    )
+    assert m.memory[("parse", "a.sch")] == [2, 300, 30]
+    assert m.sites == [("a.py:1", 300, 2), ("b.py:2", 50, 1)]
+    assert m.peak == 300
+    assert "b.py:2" in format_report(m.summary())
+
+
+def test_memstats_from_workers(tmp_path, kicad6_hierarchy):
+    sch = kicad6_hierarchy
+    csv = str(tmp_path / "fields.csv")
+
+    measure(lambda: kifield.kifield([sch], [csv], recurse=True, backup=False, jobs=2))
+    phases = {p["phase"]: p for p in memstats.summary()["phases"]}
+    assert {"extract", "insert", "serialize"} <= set(phases)
+    assert phases["extract"]["peak"] > 0
@@ -0,0 +1,107 @@
+import pickle
+from copy import deepcopy
+
+from kifield.parttable import PartTable
+
+
+def test_parttable_dict_view():
+    table = PartTable(
+        {"C1": {"value": "1uF"}, "R1": {"value": "1K", "footprint": "0603"}}
+    )
+
+    assert list(table) == ["C1", "R1"]
+    assert len(table) == 2
+    assert "R1" in table
+    assert table["C1"] == {"value": "1uF"}
+    assert table["R1"] == {"value": "1K", "footprint": "0603"}
+    assert table.get("X1", {}) == {}
+    assert table.to_dict() == {
+        "C1": {"value": "1uF"},
+        "R1": {"value": "1K", "footprint": "0603"},
+    }
+
+
+def test_parttable_missing_vs_empty():
+    table = PartTable({"C1": {"value": ""}, "R1": {"footprint": "0603"}})
+
+    assert table["C1"] == {"value": ""}
+    assert "footprint" not in table["C1"]
+    assert table["R1"].get("value") is None
+
+
+def test_parttable_update_rows():
+    table = PartTable({"C1": {"value": "1uF"}})
+
+    table["C1"].update({"footprint": "0603"})
+    table["C1"]["value"] = "2uF"
+    del table["C1"]["footprint"]
+    table["R1"] = {"value": "1K"}
+    table["R1"] = table["R1"]
+    del table["R1"]
+
+    assert table.to_dict() == {"C1": {"value": "2uF"}}
+    assert table.field_names() == ["value"]
+
+
+def test_parttable_columns():
+    table = PartTable({"C1": {"value": "1uF\n"}, "R1": {"value": "1K"}})
+
+    table.map_values(lambda v: v.strip())
+
+    assert table.column("value") == {"C1": "1uF", "R1": "1K"}
+
+
+def test_parttable_copies():
+    table = PartTable({"C1": {"value": "1uF"}, "R1": {"footprint": "0603"}})
+
+    fields = deepcopy(table["C1"])
+    fields["value"] = "2uF"
+    assert type(fields) is dict
+    assert table["C1"]["value"] == "1uF"
+
+    assert pickle.loads(pickle.dumps(table)).to_dict() == table.to_dict()
+
+
+def test_parttable_shares_values():
+    table = PartTable()
+    table["C1"] = {"manf": "".join(["Yag", "eo"]), "qty": 1}
+    table["C2"] = {"manf": "".join(["Ya", "geo"]), "qty": 1.0}
+
+    assert table["C1"]["manf"] is table["C2"]["manf"]
+    assert type(table["C2"]["qty"]) is float
+
+    num_values, num_distinct, saved = table.value_stats()
+    assert (num_values, num_distinct) == (4, 3)
+    assert saved > 0
+
+
+def test_parttable_row_changes():
+    table = PartTable()
+    table["C1"] = {"value": "1uF", "footprint": "0603"}
+    table["C2"] = {"value": "".join(["1u", "F"]), "footprint": "0603"}
+    table["C3"] = {"value": "1uF", "footprint": "0603", "dnp": "yes"}
+
+    table["C2"]["value"] = "2uF"
+    del table["C3"]["dnp"]
+    table["C3"].update({"footprint": "0805", "manf": "Yageo"})
+
+    assert table.to_dict() == {
+        "C1": {"value": "1uF", "footprint": "0603"},
+        "C2": {"value": "2uF", "footprint": "0603"},
+        "C3": {"value": "1uF", "footprint": "0805", "manf": "Yageo"},
+    }
+    assert table.field_names() == ["value", "footprint", "manf"]
+    assert table.column("manf") == {"C3": "Yageo"}
+
+
+def test_parttable_shares_rows():
+    table = PartTable()
+    table["C1"] = {"value": "1uF", "footprint": "0603"}
+    table["C2"] = {"value": "".join(["1u", "F"]), "footprint": "0603"}
+    assert table._rows["C1"] is table._rows["C2"]
+
+    table["C2"]["value"] = "2uF"  # Copied on write.
+    assert table["C1"]["value"] == "1uF"
+
+    table["C1"]["value"] = "2uF"  # Changes aren't pooled.
+    assert table._rows["C1"] is not table._rows["C2"]
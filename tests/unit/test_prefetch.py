@@ -0,0 +1,83 @@
+from kifield.common import parse_cache
+from kifield.kifield import files_to_prefetch
+from kifield.prefetch import Prefetcher, open_input
+
+
+def test_prefetch(tmp_path):
+    filenames = []
+    for i in range(4):
+        filename = str(tmp_path / "f{}.txt".format(i))
+        with open(filename, "w") as fp:
+            fp.write("file {}\nline 2\n".format(i))
+        filenames.append(filename)
+
+    with Prefetcher(filenames) as prefetcher:
+        for i, filename in enumerate(filenames):
+            with open_input(filename) as fp:
+                assert fp.readlines() == ["file {}\n".format(i), "line 2\n"]
+            with open_input(filename, "rb") as fp:
+                # Already used, so read from the file.
+                assert fp.read() == "file {}\nline 2\n".format(i).encode()
+    assert prefetcher.num_files == 4
+
+
+def test_prefetch_changed_file(tmp_path):
+    filenames = [str(tmp_path / "a.txt"), str(tmp_path / "b.txt")]
+    for filename in filenames:
+        with open(filename, "w") as fp:
+            fp.write("old")
+
+    with Prefetcher(filenames) as prefetcher:
+        prefetcher.reads[filenames[1]].result()  # Wait for the background read.
+        with open(filenames[1], "w") as fp:
+            fp.write("newer")
+        with open_input(filenames[1]) as fp:
+            assert fp.read() == "newer"
+    assert prefetcher.num_files == 0
+
+
+def test_prefetch_missing_file(tmp_path):
+    filenames = [str(tmp_path / "a.txt"), str(tmp_path / "missing.txt")]
+    with Prefetcher(filenames):
+        try:
+            open_input(filenames[1])
+        except IOError:
+            pass
+        else:
+            assert False
+
+
+def test_prefetch_release(tmp_path):
+    filenames = []
+    for name in ("a.txt", "b.unknown", "c.txt"):
+        filenames.append(str(tmp_path / name))
+        with open(filenames[-1], "w") as fp:
+            fp.write(name)
+
+    with Prefetcher(filenames, ahead=1) as prefetcher:
+        with open_input(filenames[0]) as fp:
+            assert fp.read() == "a.txt"
+        prefetcher.release(filenames[0])
+        prefetcher.release(filenames[1])  # Done without being opened.
+        assert list(prefetcher.reads) == [filenames[2]]
+        with open_input(filenames[2]) as fp:
+            assert fp.read() == "c.txt"
+    assert prefetcher.num_files == 2
+
+
+def test_files_to_prefetch(tmp_path):
+    filenames = [str(tmp_path / "a.csv"), str(tmp_path / "b.kicad_sym")]
+    for filename in filenames:
+        with open(filename, "w") as fp:
+            fp.write("")
+
+    assert files_to_prefetch(filenames, 1) == filenames
+    assert files_to_prefetch(filenames, 2) == []  # Worker processes read their own.
+
+    parse_cache.enabled = True
+    try:
+        parse_cache.store(("lib_V6", filenames[1]), "parsed", [filenames[1]])
+        assert files_to_prefetch(filenames, 1) == filenames[:1]
+    finally:
+        parse_cache.enabled = False
+        parse_cache.clear()
@@ -0,0 +1,88 @@
+import time
+
+from kifield import kifield
+from kifield.profiling import Profiler, profiler
+from kifield.stats import stats
+
+
+def busy(seconds):
+    end = time.time() + seconds
+    while time.time() < end:
+        pass
+
+
+def inside_phase():
+    busy(0.001)
+
+
+def outside_phase():
+    busy(0.001)
+
+
+def profiled_functions(p):
+    return {func for (_, _, func) in p.get_stats().stats}
+
+
+def test_profile_whole_run():
+    p = Profiler()
+    p.deterministic = True
+    p.begin()
+    outside_phase()
+    p.end()
+    assert "outside_phase" in profiled_functions(p)
+
+
+def test_profile_phases():
+    profiler.deterministic = True
+    profiler.phases = ["parse"]
+    profiler.clear()
+    stats.clear()
+    profiler.begin()
+    try:
+        outside_phase()
+        with stats.phase("parse", "a.sch"):
+            inside_phase()
+        with stats.phase("write", "a.sch"):
+            outside_phase()
+    finally:
+        profiler.end()
+        profiler.deterministic = False
+        profiler.phases = None
+    assert stats.times == {}  # Profiling a phase doesn't record its stats.
+    functions = profiled_functions(profiler)
+    assert "inside_phase" in functions
+    assert "outside_phase" not in functions
+
+
+def test_sampling(tmp_path):
+    p = Profiler()
+    p.sampling = True
+    p.begin()
+    busy(0.1)
+    p.end()
+    assert sum(p.samples.values()) > 0
+    assert all(stack.split(";")[-1].startswith("busy ") for stack in p.samples)
+
+    collapsed = str(tmp_path / "collapsed.txt")
+    p.save_collapsed(collapsed)
+    with open(collapsed) as fp:
+        for line in fp:
+            stack, n = line.rsplit(" ", 1)
+            assert p.samples[stack] == int(n)
+
+
+def test_profile_from_workers(tmp_path, kicad6_hierarchy):
+    sch = kicad6_hierarchy
+    csv = str(tmp_path / "fields.csv")
+
+    profiler.deterministic = True
+    profiler.clear()
+    profiler.begin()
+    try:
+        kifield.kifield([sch], [csv], recurse=True, backup=False, jobs=2)
+    finally:
+        profiler.end()
+        profiler.deterministic = False
+    # The sheets are parsed by the workers, whose profiles are merged in.
+    assert len(profiler.profile_stats) > 1
+    assert "read_sch_V6" in profiled_functions(profiler)
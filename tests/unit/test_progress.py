@@ -0,0 +1,94 @@
+import io
+import os
+import threading
+
+import pytest
+
+from kifield import kifield
+from kifield.progress import ProgressBar, RunCancelled, run_progress
+
+
+@pytest.mark.parametrize("jobs", [1, 2])
+def test_progress(tmp_path, jobs, kicad6_hierarchy):
+    sch = kicad6_hierarchy
+    csv = str(tmp_path / "fields.csv")
+    reports = []
+
+    def progress(p):
+        reports.append(
+            (
+                p.stage,
+                p.files_done,
+                p.files_total,
+                p.sheets_done,
+                p.parts_done,
+                p.finished,
+            )
+        )
+
+    kifield.kifield(
+        [sch], [csv], recurse=True, backup=False, jobs=jobs, progress=progress
+    )
+    assert not run_progress.enabled  # Detached after the run.
+
+    extracted = [r for r in reports if r[0] == "extract"]
+    inserted = [r for r in reports if r[0] == "insert"]
+    assert extracted[-1][5] and inserted[-1][5]  # Both stages finished.
+    _, files_done, files_total, sheets_done, parts_done, _ = extracted[-1]
+    assert files_done == files_total == 1
+    assert sheets_done >= 2  # The two leaf sheets.
+    assert parts_done > 0
+    assert inserted[-1][1] == inserted[-1][2] == 1
+
+
+def test_progress_from_workers(tmp_path, kicad5_hierarchy, kicad6_hierarchy):
+    # With more than one job, each schematic is extracted by a worker process,
+    # which counts its sheets for the main process to report.
+    sheets_done = {}
+    for jobs in (1, 2):
+        reports = []
+
+        def progress(p):
+            reports.append((os.getpid(), p.stage, p.sheets_done))
+
+        kifield.kifield(
+            [kicad5_hierarchy, kicad6_hierarchy],
+            [str(tmp_path / "fields{}.csv".format(jobs))],
+            recurse=True,
+            backup=False,
+            jobs=jobs,
+            progress=progress,
+        )
+        assert set(pid for pid, _, _ in reports) == {os.getpid()}
+        sheets_done[jobs] = [s for _, stage, s in reports if stage == "extract"][-1]
+
+    assert sheets_done[2] == sheets_done[1] > 0
+
+
+def test_cancel(tmp_path, kicad6_hierarchy):
+    sch = kicad6_hierarchy
+    csv = str(tmp_path / "fields.csv")
+    cancel = threading.Event()
+    cancel.set()
+    with pytest.raises(RunCancelled):
+        kifield.kifield([sch], [csv], recurse=True, backup=False, cancel=cancel)
+    assert not os.path.exists(csv)
+    assert not run_progress.enabled
+
+
+def test_progress_bar():
+    stream = io.StringIO()
+    bar = ProgressBar(stream=stream)
+    run_progress.attach(bar)
+    try:
+        run_progress.begin("extract", ["a.csv", "b.csv"])
+        run_progress.file_done("a.csv", 3)
+        run_progress.file_done("b.csv", 4)
+        run_progress.end()
+    finally:
+        run_progress.detach()
+    lines = stream.getvalue().split("\r")
+    assert lines[-1].startswith(
+        "extract [####################] 2/2 files, 0 sheets, 7 parts"
+    )
+    assert lines[-1].endswith("\n")
@@ -0,0 +1,58 @@
+from kifield.refs import (
+    RefRange,
+    collapse,
+    explode,
+    join_refs,
+    natural_sort_key,
+    parse_refs,
+    quote,
+    unquote,
+)
+
+
+def test_natural_sort_key():
+    refs = sorted(["C10", "C2", "U1A", "C1", "U1"], key=natural_sort_key)
+    assert refs == ["C1", "C2", "C10", "U1", "U1A"]
+
+
+def test_parse_refs_lazy_range():
+    chunks = parse_refs("R1-R50000, C7")
+    assert chunks == (RefRange("R", 1, 50000), "C7")
+    assert len(chunks[0]) == 50000
+    assert chunks[0][-1] == "R50000"
+    assert "R49999" in chunks[0]
+    assert "R50001" not in chunks[0]
+    assert "R007" not in chunks[0]
+
+
+def test_parse_refs_cached():
+    assert parse_refs("C1-C3") is parse_refs("C1-C3")
+
+
+def test_explode_not_shared():
+    refs = explode("C1-C3")
+    refs.append("C4")
+    assert explode("C1-C3") == ["C1", "C2", "C3"]
+
+
+def test_explode_non_string():
+    assert explode(None) == []
+    assert explode(5) == []
+
+
+def test_collapse_mixed_numbers():
+    collapsed = collapse(["U2", "U1A", "U1", "U3"])
+    assert collapsed == "U1, U1A, U2, U3"
+
+
+def test_quote_unquote():
+    assert quote("abc") == '"abc"'
+    assert quote('"abc"') == '"abc"'
+    assert unquote('"abc"') == "abc"
+    assert unquote("'abc'") == "abc"
+    assert unquote(None) is None
+
+
+def test_join_refs():
+    joined = join_refs(["C10", "C2", "C1", "C3"])
+    assert joined == "C1, C2, C3, C10"
@@ -0,0 +1,120 @@
+import datetime
+import os
+import socket
+import threading
+import time
+
+import openpyxl as pyxl
+import pytest
+
+from kifield.server import (
+    default_address,
+    make_private_dir,
+    parse_address,
+    recv_message,
+    send_message,
+    send_request,
+    serve,
+)
+
+
+def test_parse_address():
+    assert parse_address("7447") == (socket.AF_INET, ("localhost", 7447))
+    assert parse_address("127.0.0.1:80") == (socket.AF_INET, ("127.0.0.1", 80))
+    assert parse_address("/tmp/kifield.sock") == (socket.AF_UNIX, "/tmp/kifield.sock")
+    assert parse_address("unix:kifield.sock") == (socket.AF_UNIX, "kifield.sock")
+
+
+def test_default_address(tmp_path, monkeypatch):
+    monkeypatch.setenv("XDG_RUNTIME_DIR", str(tmp_path))
+    assert default_address() == "unix:" + str(tmp_path / "kifield.sock")
+    monkeypatch.delenv("XDG_RUNTIME_DIR")
+    monkeypatch.setenv("TMPDIR", str(tmp_path))
+    assert default_address() == "unix:" + os.path.join(
+        str(tmp_path), "kifield-{}".format(os.getuid()), "kifield.sock"
+    )
+
+
+def test_make_private_dir(tmp_path):
+    private = str(tmp_path / "private")
+    make_private_dir(private)
+    make_private_dir(private)  # Already there.
+    assert os.stat(private).st_mode & 0o777 == 0o700
+
+    # A directory other users can get into isn't used.
+    os.chmod(private, 0o755)
+    with pytest.raises(IOError):
+        make_private_dir(private)
+
+
+def test_recv_message_size():
+    for max_size, raises in ((2000, False), (100, True)):
+        a, b = socket.socketpair()
+        try:
+            send_message(a, {"data": "x" * 1000})
+            if raises:
+                with pytest.raises(ValueError):
+                    recv_message(b, max_size)
+            else:
+                assert recv_message(b, max_size) == {"data": "x" * 1000}
+        finally:
+            a.close()
+            b.close()
+
+
+def test_server(tmp_path, monkeypatch):
+    address = str(tmp_path / "kifield.sock")
+    server = threading.Thread(target=serve, args=(address,))
+    server.start()
+    try:
+        for _ in range(100):
+            try:
+                assert send_request(address, {"command": "ping"})["result"] == "pong"
+                break
+            except (IOError, OSError):
+                time.sleep(0.05)  # Server not listening yet.
+
+        with open(str(tmp_path / "src.csv"), "w") as fp:
+            fp.write("Refs,value\nR1,1K\n")
+        response = send_request(
+            address,
+            {
+                "command": "kifield",
+                "cwd": str(tmp_path),
+                "args": {"extract_filenames": "src.csv", "insert_filenames": "dst.csv"},
+            },
+        )
+        assert response["error"] is None
+        with open(str(tmp_path / "dst.csv")) as fp:
+            assert fp.read() == "Refs,value\nR1,1K\n"
+
+        response = send_request(address, {"command": "bogus"})
+        assert response["error"] == "ValueError: Unknown command: bogus"
+
+        # Dates in spreadsheet cells come back as strings.
+        wb = pyxl.Workbook()
+        wb.active.append(["Refs", "date"])
+        wb.active.append(["R1", datetime.datetime(2021, 1, 2)])
+        wb.save(str(tmp_path / "dates.xlsx"))
+        response = send_request(
+            address,
+            {
+                "command": "extract",
+                "cwd": str(tmp_path),
+                "args": {"filenames": "dates.xlsx"},
+            },
+        )
+        assert response["error"] is None
+        assert response["result"]["R1"]["date"].startswith("2021-01-02")
+
+        # A client that never sends its request doesn't hold up the others.
+        monkeypatch.setattr("kifield.server.CLIENT_TIMEOUT", 0.1)
+        silent = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        silent.connect(address)
+        try:
+            assert send_request(address, {"command": "ping"})["result"] == "pong"
+        finally:
+            silent.close()
+    finally:
+        send_request(address, {"command": "shutdown"})
+        server.join()
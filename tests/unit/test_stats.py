@@ -0,0 +1,72 @@
+import os
+import time
+
+from kifield import kifield
+from kifield.stats import Stats, format_report, stats
+
+
+def test_nested_phases_are_exclusive():
+    s = Stats()
+    s.enabled = True
+    with s.phase("parse", "a.sch"):
+        with s.phase("read", "a.sch"):
+            time.sleep(0.02)
+    read_calls, read_wall, _ = s.times[("read", "a.sch")]
+    parse_calls, parse_wall, _ = s.times[("parse", "a.sch")]
+    assert read_calls == parse_calls == 1
+    assert read_wall >= 0.02
+    assert parse_wall < 0.02
+
+
+def test_disabled_stats_record_nothing():
+    s = Stats()
+    with s.phase("parse", "a.sch"):
+        s.count("components parsed", 3)
+    assert s.times == {} and s.counters == {}
+
+
+def test_merge():
+    s1, s2 = Stats(), Stats()
+    s1.enabled = s2.enabled = True
+    with s1.phase("write", "a.sch"):
+        s1.count("files written")
+    with s2.phase("write", "a.sch"):
+        s2.count("files written")
+    s1.merge(s2.snapshot())
+    assert s1.times[("write", "a.sch")][0] == 2
+    assert s1.counters == {"files written": 2}
+    assert "files written" in format_report(s1.summary())
+
+
+def test_stats_of_run(tmp_path, kicad5_hierarchy):
+    sch = kicad5_hierarchy
+    csv = str(tmp_path / "fields.csv")
+
+    stats.enabled = True
+    stats.clear()
+    try:
+        kifield.kifield([sch], [csv], recurse=True, backup=False)
+    finally:
+        stats.enabled = False
+    phases = {p["phase"] for p in stats.summary()["phases"]}
+    assert {"read", "parse", "extract", "insert", "write"} <= phases
+    assert stats.counters["components parsed"] == 2  # The leaf sheet is used twice.
+    assert stats.counters["files written"] == 1
+
+
+def test_stats_from_workers(integration_dir):
+    files = [
+        os.path.join(integration_dir, "misc", f)
+        for f in ("amp.csv", "cap_grouping.csv", "rgb7hat.csv")
+    ]
+    results = []
+    stats.enabled = True
+    try:
+        for jobs in (1, 2):
+            stats.clear()
+            kifield.extract_part_fields(files, jobs=jobs)
+            results.append((set(stats.times), stats.counters))
+    finally:
+        stats.enabled = False
+    assert results[0] == results[1]
+    assert results[0][1]["bytes read"] == sum(os.path.getsize(f) for f in files)
@@ -0,0 +1,28 @@
+import os
+import sys
+
+import pytest
+
+from kifield import kifield
+
+INTEGRATION_DIR = os.path.join(os.path.dirname(__file__), "..", "integration")
+sys.path.insert(0, INTEGRATION_DIR)
+from synthesize import make_project
+
+
+@pytest.mark.parametrize("version", [5, 6])
+def test_synthetic_project_matches_bom(tmp_path, version):
+    project, files = make_project(
+        str(tmp_path),
+        version=version,
+        num_sheets=3,
+        depth=2,
+        reuse=2,
+        parts_per_sheet=5,
+    )
+    sch_fields = kifield.extract_part_fields([files["sch"]], recurse=True)
+    bom_fields = kifield.extract_part_fields([files["csv"]])
+    assert len(sch_fields) == project.num_parts == 45
+    assert sch_fields.to_dict() == bom_fields.to_dict()
+    lib_fields = kifield.extract_part_fields([files["lib"]])
+    assert len(lib_fields) == project.num_symbols == 20
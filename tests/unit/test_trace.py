@@ -0,0 +1,78 @@
+import json
+import os
+
+from kifield import kifield
+from kifield.trace import Trace, trace, traced
+
+
+def test_spans():
+    t = Trace()
+    t.enabled = True
+    with t.span("outer", file="a.sch"):
+        with t.span("inner"):
+            pass
+    inner, outer = t.events
+    assert (inner["name"], outer["name"]) == ("inner", "outer")
+    assert outer["args"] == {"file": "a.sch"}
+    assert outer["ts"] <= inner["ts"]
+    assert inner["ts"] + inner["dur"] <= outer["ts"] + outer["dur"]
+
+    trace_json = json.loads(json.dumps(t.to_json()))
+    spans = [e for e in trace_json["traceEvents"] if e["ph"] == "X"]
+    assert min(e["ts"] for e in spans) == 0
+    assert any(e["ph"] == "M" for e in trace_json["traceEvents"])
+
+
+def test_disabled_trace_records_nothing():
+    t = Trace()
+    with t.span("outer"):
+        pass
+    assert t.events == []
+
+
+def test_traced():
+    class Lib(object):
+        filename = "a.lib"
+
+        @traced("Lib.save", file_arg=1)
+        def save(self, filename=None):
+            return filename
+
+    @traced(file_arg=1)
+    def insert(part_fields_dict, filenames):
+        return len(filenames)
+
+    trace.enabled = True
+    trace.clear()
+    try:
+        assert Lib().save() is None
+        assert Lib().save("b.lib") == "b.lib"
+        assert insert({}, ["x.csv", "y.csv"]) == 2
+    finally:
+        trace.enabled = False
+    assert [(e["name"], e["args"]) for e in trace.events] == [
+        ("Lib.save", {"file": "a.lib"}),
+        ("Lib.save", {"file": "b.lib"}),
+        ("insert", {"files": ["x.csv", "y.csv"]}),
+    ]
+
+
+def test_trace_from_workers(tmp_path, kicad6_hierarchy):
+    sch = kicad6_hierarchy
+    csv = str(tmp_path / "fields.csv")
+
+    trace.enabled = True
+    trace.clear()
+    try:
+        kifield.kifield([sch], [csv], recurse=True, backup=False, jobs=2)
+    finally:
+        trace.enabled = False
+    sheets = [e for e in trace.events if e["name"] == "parse sheet"]
+    assert {os.path.basename(e["args"]["file"]) for e in sheets} == {
+        "hierarchical_schematic.kicad_sch",
+        "leaf1.kicad_sch",
+        "leaf2.kicad_sch",
+    }
+    assert any(e["pid"] != os.getpid() for e in sheets)
+    names = {e["name"] for e in trace.events}
+    assert {"extract_part_fields", "insert_part_fields_into_csv", "save"} <= names
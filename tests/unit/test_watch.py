@@ -0,0 +1,107 @@
+import os
+
+import pytest
+
+from kifield import kifield
+from kifield.common import ParseCache, parse_cache
+
+
+def test_parse_cache(tmp_path):
+    filename = str(tmp_path / "a.txt")
+    with open(filename, "w") as fp:
+        fp.write("a")
+
+    key = ("lib_V6", filename)
+    cache = ParseCache()
+    cache.store(key, "parsed a", [filename])
+    assert cache.take(key) is None  # Not enabled.
+
+    cache.enabled = True
+    cache.store(key, "parsed a", [filename])
+    assert cache.take(key) == "parsed a"
+    assert cache.take(key) is None  # Taken, so no longer cached.
+
+    cache.store(key, "parsed a", [filename])
+    with open(filename, "w") as fp:
+        fp.write("changed")
+    assert cache.take(key) is None
+
+
+def test_parse_cache_directories(tmp_path, monkeypatch):
+    for project in ("p1", "p2"):
+        (tmp_path / project).mkdir()
+        with open(str(tmp_path / project / "a.txt"), "w") as fp:
+            fp.write(project)
+
+    cache = ParseCache()
+    cache.enabled = True
+    monkeypatch.chdir(str(tmp_path / "p1"))
+    cache.store(("lib_V6", "a.txt"), "parsed p1", ["a.txt"])
+    monkeypatch.chdir(str(tmp_path / "p2"))
+    assert cache.take(("lib_V6", "a.txt")) is None  # Same name, another file.
+
+    cache.store(("lib_V6", "a.txt"), "parsed p2", ["a.txt"])
+    monkeypatch.chdir(str(tmp_path))
+    # Same file, but its name leads somewhere else from here.
+    assert cache.take(("lib_V6", "p2/a.txt")) is None
+    monkeypatch.chdir(str(tmp_path / "p2"))
+    cache.store(("lib_V6", "a.txt"), "parsed p2", ["a.txt"])
+    assert cache.take(("lib_V6", "./a.txt")) == "parsed p2"
+
+
+def test_sync_with_parsed_schematic(tmp_path, monkeypatch, kicad7_hierarchy):
+    sch = kicad7_hierarchy
+    csv = str(tmp_path / "fields.csv")
+    kifield.kifield(sch, csv, recurse=True, backup=False)
+    with open(csv) as fp:
+        lines = fp.read().splitlines()
+
+    parse_cache.enabled = True
+    try:
+        manifest = kifield.sync_part_fields(csv, sch, recurse=True, backup=False)
+
+        # Change a field and sync again without parsing the schematic.
+        lines[1] += "X"
+        with open(csv, "w") as fp:
+            fp.write("\n".join(lines) + "\n")
+
+        def no_parse(*args, **kwargs):
+            raise AssertionError("Schematic parsed again.")
+
+        monkeypatch.setattr(kifield, "Schematic_V6", no_parse)
+        kifield.sync_part_fields(
+            csv, sch, recurse=True, backup=False, manifest=manifest
+        )
+    finally:
+        parse_cache.enabled = False
+        parse_cache.clear()
+
+    monkeypatch.undo()
+    part_fields_dict = kifield.extract_part_fields(sch, recurse=True)
+    ref, value = lines[1].split(",")[0], lines[1].split(",")[-1]
+    assert value in part_fields_dict[ref].values()
+
+
+@pytest.mark.parametrize("jobs", [1, 2])
+def test_backup_once_per_session(tmp_path, jobs, kicad7_hierarchy):
+    sch = kicad7_hierarchy
+    csv = str(tmp_path / "fields.csv")
+    copy_csv = str(tmp_path / "copy.csv")
+    kifield.kifield(sch, [csv, copy_csv], recurse=True, backup=False)
+    with open(csv) as fp:
+        lines = fp.read().splitlines()
+
+    backup_record = []
+    for _ in range(3):
+        # Change a field and sync it as a watch session would.
+        lines[1] += "X"
+        with open(csv, "w") as fp:
+            fp.write("\n".join(lines) + "\n")
+        kifield.sync_part_fields(
+            csv, [sch, copy_csv], recurse=True, jobs=jobs, backup_record=backup_record
+        )
+
+    backups = sorted(f for f in os.listdir(str(tmp_path)) if f.endswith(".bak"))
+    assert "hierarchical_schematic.kicad_sch.1.bak" in backups
+    assert "copy.csv.1.bak" in backups
+    assert not [f for f in backups if not f.endswith(".1.bak")]
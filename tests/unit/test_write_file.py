@@ -0,0 +1,33 @@
+import os
+
+from kifield.common import backedup_files, file_changes, write_file_if_changed
+
+
+def test_write_file_if_changed(tmp_path):
+    filename = str(tmp_path / "a.txt")
+    with open(filename, "w") as fp:
+        fp.write("old\n")
+    del backedup_files[:]
+    file_changes.clear()
+
+    # Unchanged contents leave the file alone and make no backup.
+    assert not write_file_if_changed(filename, "old\n", backup=True)
+    assert not os.path.exists(filename + ".1.bak")
+    assert file_changes == {filename: False}
+
+    assert write_file_if_changed(filename, "new\n", backup=True)
+    assert open(filename).read() == "new\n"
+    assert open(filename + ".1.bak").read() == "old\n"
+    assert file_changes == {filename: True}
+
+
+def test_write_file_if_changed_line_endings(tmp_path):
+    filename = str(tmp_path / "a.txt")
+    with open(filename, "wb") as fp:
+        fp.write(b"old\r\n")
+    file_changes.clear()
+
+    # The same text with other line endings is rewritten.
+    assert write_file_if_changed(filename, "old\n") == (os.linesep != "\r\n")
+    with open(filename, "rb") as fp:
+        assert fp.read() == "old\n".replace("\n", os.linesep).encode()
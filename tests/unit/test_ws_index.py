@@ -0,0 +1,50 @@
+import openpyxl as pyxl
+
+from kifield import kifield
+
+
+def test_index_ws_refs():
+    wb = pyxl.Workbook()
+    ws = wb.active
+    ws.append(("Refs", "x"))
+    ws.append(("C1-C3, R5", "1"))
+    ws.append((None, "2"))
+    ws.append(("R5", "3"))
+
+    ref_rows = kifield.index_ws_refs(ws, 1, 2)
+
+    assert list(ref_rows.keys()) == ["C1", "C2", "C3", "R5"]
+    assert ref_rows["C2"] == [2]
+    assert ref_rows["R5"] == [2, 4]
+
+
+def test_insert_uses_index():
+    wb = pyxl.Workbook()
+    ws = wb.active
+    ws.append(("Refs", "value"))
+    ws.append(("C1-C2", "1uF"))
+
+    wb = kifield.insert_part_fields_into_wb(
+        {"C2": {"value": "2uF"}, "R1": {"value": "1K"}}, wb
+    )
+    values = tuple(wb.active.values)
+
+    assert values[0] == ("Refs", "value")
+    assert values[1:] == (("C1", "1uF"), ("C2", "2uF"), ("R1", "1K"))
+
+
+def test_insert_ungroups_ref_column():
+    # The references are ungrouped in the reference column even when it isn't
+    # the first one.
+    wb = pyxl.Workbook()
+    ws = wb.active
+    ws.append(("value", "Refs"))
+    ws.append(("a", "C2"))
+    ws.append(("b", "C1, C2"))
+
+    wb = kifield.insert_part_fields_into_wb(
+        {"C1": {"value": "1uF"}, "C2": {"value": "2uF"}}, wb
+    )
+    values = tuple(wb.active.values)
+
+    assert values[1:] == (("2uF", "C2"), ("1uF", "C1"), ("2uF", "C2"))